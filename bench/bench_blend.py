@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.blend import (ADDITIVE_MODE, MeruBlendEngine,  # noqa: E402
+subtree_mask)
+from meru.c3b import (C3bAnimation, C3bAnimKeyFrame, C3bNode,  # noqa: E402
+MeruSkeleton)
+from meru.linear import Mat44, Vec3, Vec4  # noqa: E402
+
+SIZES = [100, 1000, 5000]
+BONE_COUNT = 60
+KEY_RATE = 30
+TICK_RATE = 60
+TICK_COUNT = 30
+
+
+def skeleton(bone_count, seed=1):
+    # Bones hang off random earlier bones, roughly a humanoid's fan out.
+    rng = random.Random(seed)
+    nodes = [C3bNode("bone0", True, Mat44.identity())]
+    for index in range(1, bone_count):
+        node = C3bNode("bone{0}".format(index), False, Mat44.identity())
+        nodes[rng.randrange(max(0, index - 4), index)].children.append(node)
+        nodes.append(node)
+    return MeruSkeleton.from_nodes(nodes[:1])
+
+
+def clip(_id, bone_count, duration, seed):
+    # Baked keys on every bone, translation on the root only.
+    rng = random.Random(seed)
+    animation = C3bAnimation(_id, duration)
+    key_count = int(duration * KEY_RATE) + 1
+    for index in range(bone_count):
+        phase = rng.uniform(0.0, math.pi)
+        for key in range(key_count):
+            key_time = key / KEY_RATE
+            angle = math.sin(phase + key_time * 4.0) * 0.5
+            keyframe = C3bAnimKeyFrame(key_time, rotation=Vec4(0.0,
+                math.sin(angle / 2), 0.0, math.cos(angle / 2)))
+            if index == 0:
+                keyframe.translation = Vec3(key_time, 0.0, 0.0)
+            animation.add_keyframe("bone{0}".format(index), keyframe)
+    return animation
+
+
+def bench(character_count):
+    bones = skeleton(BONE_COUNT)
+    start = time.perf_counter()
+    engine = MeruBlendEngine(bones, [clip("walk", BONE_COUNT, 1.0, 1),
+        clip("run", BONE_COUNT, 0.7, 2), clip("wave", BONE_COUNT, 2.0, 3)])
+    engine.add_layer("walk")
+    engine.add_layer("run")
+    engine.add_layer("wave", ADDITIVE_MODE, subtree_mask(bones, "bone5"))
+    engine.add_instances(character_count)
+    rng = random.Random(4)
+    for layer in engine.layers:
+        layer.times = [rng.uniform(0.0, layer.sampler.duration)
+            for i in range(character_count)]
+        layer.weights = [rng.random() for i in range(character_count)]
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tick in range(TICK_COUNT):
+        engine.tick(1.0 / TICK_RATE)
+    tick_time = (time.perf_counter() - start) / TICK_COUNT
+
+    print("characters={0} bones={1} setup={2:.2f}s tick={3:.1f}ms "
+        "({4:.0f} characters/s, {5:.0f} characters at {6} Hz)".format(
+            character_count, BONE_COUNT, setup_time, tick_time * 1000.0,
+            character_count / tick_time,
+            character_count / tick_time / TICK_RATE, TICK_RATE))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.bvh import MeruBvh  # noqa: E402
+
+SIZES = [10000, 100000, 1000000]
+QUERY_COUNT = 1000
+
+
+def heightfield(triangle_count, seed=1):
+    # A bumpy grid, roughly what terrain and large props look like.
+    side = max(1, int(math.sqrt(triangle_count / 2)))
+    rng = random.Random(seed)
+    heights = [[rng.uniform(0.0, 0.5) + math.sin(x * 0.1) * math.cos(y * 0.1)
+        for x in range(side + 1)] for y in range(side + 1)]
+    coords = []
+    for y in range(side):
+        for x in range(side):
+            a = (x, y, heights[y][x])
+            b = (x + 1, y, heights[y][x + 1])
+            c = (x, y + 1, heights[y + 1][x])
+            d = (x + 1, y + 1, heights[y + 1][x + 1])
+            coords.extend(a + b + c)
+            coords.extend(b + d + c)
+    return coords, side
+
+
+def bench(triangle_count):
+    coords, side = heightfield(triangle_count)
+    start = time.perf_counter()
+    bvh = MeruBvh.from_coords(coords)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(2)
+    origins = []
+    directions = []
+    points = []
+    for i in range(QUERY_COUNT):
+        origins.extend([rng.uniform(0, side), rng.uniform(0, side), 10.0])
+        directions.extend([rng.uniform(-0.2, 0.2), rng.uniform(-0.2, 0.2),
+            -1.0])
+        points.extend([rng.uniform(0, side), rng.uniform(0, side),
+            rng.uniform(-2.0, 2.0)])
+
+    start = time.perf_counter()
+    hits = bvh.intersect_rays(origins, directions)
+    ray_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bvh.closest_points(points)
+    closest_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(QUERY_COUNT):
+        x = points[i * 3]
+        y = points[i * 3 + 1]
+        bvh.query_aabb([x - 1.0, y - 1.0, -5.0, x + 1.0, y + 1.0, 5.0])
+    box_time = time.perf_counter() - start
+
+    print("triangles={0} nodes={1} build={2:.2f}s rays={3:.0f}/s "
+        "hits={4} closest={5:.0f}/s boxes={6:.0f}/s".format(
+            len(coords) // 9, bvh.node_total(), build_time,
+            QUERY_COUNT / ray_time, sum(hit is not None for hit in hits),
+            QUERY_COUNT / closest_time, QUERY_COUNT / box_time))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.c3b import (C3bMaterial, C3bMesh, C3bVertexArray,  # noqa: E402
+C3bVertexAttribute, C3bWriter)
+from meru.diff import diff_files  # noqa: E402
+
+SIZES = [10, 50, 200]
+VERTEX_VALUES = 8
+
+
+def document(megabytes, shininess=0.0, seed=1):
+    # One big vertex array dominates the file, like a dense scanned prop.
+    rng = random.Random(seed)
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_NORMAL"),
+        C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD")]
+    value_count = megabytes * 2 ** 20 // 4 // VERTEX_VALUES * VERTEX_VALUES
+    vertex_array.values = [rng.random() for i in range(value_count)]
+    mesh = C3bMesh("mesh", vertex_array)
+    mesh.indices = [i % 65536 for i in range(30000)]
+    mesh.aabb = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+    material = C3bMaterial("material")
+    material.shininess = shininess
+
+    writer = C3bWriter()
+    writer.add_meshes([mesh])
+    writer.add_materials([material])
+    return writer.to_bytes()
+
+
+def bench(megabytes, directory):
+    _bytes = document(megabytes)
+    paths = []
+    for name, content in [("a", _bytes), ("b", _bytes),
+    ("c", document(megabytes, shininess=1.0))]:
+        path = os.path.join(directory, name + ".c3b")
+        with open(path, "wb") as _file:
+            _file.write(content)
+        paths.append(path)
+    a_path, b_path, c_path = paths
+
+    start = time.perf_counter()
+    for path in [a_path, b_path]:
+        with open(path, "rb") as _file:
+            hashlib.blake2b(_file.read(), digest_size=16).digest()
+    hash_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    equal = diff_files(a_path, b_path)
+    equal_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    changed = diff_files(a_path, c_path)
+    changed_time = time.perf_counter() - start
+
+    print("size={0}MB hash={1:.2f}s identical={2:.2f}s ({3}) "
+        "material_changed={4:.2f}s ({5} changes)".format(megabytes,
+            hash_time, equal_time, "equal" if equal.is_equal() else "differ",
+            changed_time, len(changed.changes)))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            bench(size, directory)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.binary import (Endian, FLOAT32_FORMAT,  # noqa: E402
+parse_array_from_format, parse_typed_array_from_format)
+from meru.c3b import (C3bMesh, C3bParser, C3bVertexArray,  # noqa: E402
+C3bVertexAttribute, C3bWriter)
+
+SIZES = [100000, 1000000, 4000000]
+REPEATS = 3
+
+
+def document(value_count, endianness, seed=1):
+    rng = random.Random(seed)
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(4, "GL_FLOAT", "VERTEX_ATTRIB_POSITION")]
+    vertex_array.values = [rng.random() for i in range(value_count // 4 * 4)]
+    mesh = C3bMesh("mesh", vertex_array)
+    mesh.indices = [i % 65536 for i in range(value_count // 2)]
+    mesh.aabb = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+    writer = C3bWriter(endianness=endianness)
+    writer.add_meshes([mesh])
+    return writer.to_bytes()
+
+
+def struct_parse(frmt, count, _bytes, endianness):
+    # The previous decoder, struct swaps every value while unpacking.
+    prefix = "<" if endianness == Endian.LITTLE else ">"
+    return list(struct.unpack("{0}{1}{2}".format(prefix, count, frmt),
+        _bytes))
+
+
+def timed(func, *args):
+    best = None
+    for i in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(value_count):
+    columns = ["value_count={0}".format(value_count)]
+    for endianness, name in [(Endian.LITTLE, "little"), (Endian.BIG, "big")]:
+        prefix = "<" if endianness == Endian.LITTLE else ">"
+        payload = struct.pack("{0}{1}f".format(prefix, value_count),
+            *[float(i) for i in range(value_count)])
+        _bytes = document(value_count, endianness)
+        columns.append("{0}: struct={1:.3f}s list={2:.3f}s array={3:.3f}s "
+            "read_meshes={4:.3f}s".format(name,
+                timed(struct_parse, FLOAT32_FORMAT, value_count, payload,
+                    endianness),
+                timed(parse_array_from_format, FLOAT32_FORMAT, value_count,
+                    payload, endianness),
+                timed(parse_typed_array_from_format, FLOAT32_FORMAT,
+                    value_count, payload, endianness),
+                timed(C3bParser(_bytes, endianness=endianness).read_meshes,
+                    0)))
+    print(" ".join(columns))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.c3b import C3bMesh, C3bVertexArray, C3bVertexAttribute  # noqa
+from meru.frames import (AREA_WEIGHTING, ANGLE_WEIGHTING,  # noqa: E402
+generate_normals, generate_tangents)
+
+SIZES = [100000, 1000000, 2000000]
+
+
+def uv_sphere(triangle_count):
+    # Rings of quads with a uv seam, so welding and mirrored winding are
+    # both exercised.
+    rings = max(2, int(math.sqrt(triangle_count / 4)))
+    segments = rings * 2
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD")
+    ]
+    for ring in range(rings + 1):
+        theta = math.pi * ring / rings
+        for segment in range(segments + 1):
+            phi = 2.0 * math.pi * segment / segments
+            vertex_array.values.extend([math.sin(theta) * math.cos(phi),
+                math.cos(theta), math.sin(theta) * math.sin(phi),
+                segment / segments, ring / rings])
+    mesh = C3bMesh("sphere", vertex_array)
+    for ring in range(rings):
+        for segment in range(segments):
+            a = ring * (segments + 1) + segment
+            b = a + 1
+            c = a + segments + 1
+            d = c + 1
+            mesh.indices.extend([a, c, b, b, c, d])
+    return mesh
+
+
+def bench(triangle_count):
+    mesh = uv_sphere(triangle_count)
+    triangles = len(mesh.indices) // 3
+    results = []
+    for weighting in [AREA_WEIGHTING, ANGLE_WEIGHTING]:
+        start = time.perf_counter()
+        normals = generate_normals(mesh.vertex_array, [mesh], weighting)
+        normal_time = time.perf_counter() - start
+        start = time.perf_counter()
+        generate_tangents(mesh.vertex_array, [mesh], normals,
+            weighting=weighting)
+        tangent_time = time.perf_counter() - start
+        results.append("{0}: normals={1:.2f}s ({2:.0f}/s) "
+            "tangents={3:.2f}s ({4:.0f}/s)".format(weighting, normal_time,
+            triangles / normal_time, tangent_time, triangles / tangent_time))
+    print("triangles={0} vertices={1} {2}".format(triangles,
+        mesh.vertex_array.vertex_count(), " ".join(results)))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        bench(size)
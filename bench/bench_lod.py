@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.c3b import C3bMesh, C3bVertexArray, C3bVertexAttribute  # noqa
+from meru.lod import MeruDecimator  # noqa: E402
+
+SIZES = [10000, 100000]
+RATIOS = [0.5, 0.25, 0.1]
+
+
+def wavy_grid(triangle_count):
+    # A smoothly curved, normal mapped sheet, about as hard to simplify as
+    # a character's body.
+    side = max(1, int(math.sqrt(triangle_count / 2)))
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_NORMAL"),
+        C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD")
+    ]
+    for y in range(side + 1):
+        for x in range(side + 1):
+            height = math.sin(x * 0.1) * math.cos(y * 0.1) * 3.0
+            vertex_array.values.extend([float(x), float(y), height,
+                0.0, 0.0, 1.0, x / side, y / side])
+    mesh = C3bMesh("grid", vertex_array)
+    for y in range(side):
+        for x in range(side):
+            a = y * (side + 1) + x
+            b = a + 1
+            c = a + side + 1
+            d = c + 1
+            mesh.indices.extend([a, b, c, b, d, c])
+    return mesh
+
+
+def bench(triangle_count):
+    mesh = wavy_grid(triangle_count)
+    start = time.perf_counter()
+    decimator = MeruDecimator(mesh.vertex_array, [mesh])
+    timings = ["setup={0:.2f}s".format(time.perf_counter() - start)]
+    for ratio in RATIOS:
+        start = time.perf_counter()
+        decimator.decimate(int(decimator.source_triangle_count * ratio))
+        timings.append("{0}={1:.2f}s".format(ratio,
+            time.perf_counter() - start))
+    print("triangles={0} {1} remaining={2}".format(
+        decimator.source_triangle_count, " ".join(timings),
+        decimator.triangle_count))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        bench(size)
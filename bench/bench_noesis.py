@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test"))
+
+import meru_noesis  # noqa: E402
+from conftest import build_model  # noqa: E402
+from meru.c3b import C3bMesh  # noqa: E402
+
+VERTEX_COUNTS = [10000, 60000]
+
+
+def large_model(vertex_count):
+    model = build_model()
+    vertex_array = model.meshes[0].vertex_array
+    stride = vertex_array.values_per_vertex()
+    template = vertex_array.values[:4 * stride]
+    vertex_array.values = template * (vertex_count // 4)
+    mesh = C3bMesh("large", vertex_array)
+    for quad in range(min(vertex_count, 65536) // 4):
+        base = quad * 4
+        mesh.indices.extend([base, base + 1, base + 2, base, base + 2,
+            base + 3])
+    mesh.aabb = [0.0, 0.0, 0.0, 1.0, 2.0, 0.0]
+    model.meshes = [mesh]
+    return model.to_bytes()
+
+
+def bench(vertex_count):
+    data = large_model(vertex_count)
+    timings = []
+    for load in (meru_noesis.c3b_load_model_objects,
+    meru_noesis.c3b_load_model):
+        meru_noesis.rapi.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            load(data, [])
+        timings.append(time.perf_counter() - start)
+    print("vertices={0} objects={1:.3f}s buffers={2:.3f}s speedup={3:.1f}x"
+        .format(vertex_count, timings[0], timings[1],
+            timings[0] / timings[1]))
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or VERTEX_COUNTS
+    for count in counts:
+        bench(count)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from meru.c3b import (C3bAnimation, C3bAnimKeyFrame, C3bBone,  # noqa: E402
+C3bNode, C3bNodePart, C3bParser, C3bStringTable, C3bWriter)
+from meru.linear import Mat44, Vec3  # noqa: E402
+
+FILE_COUNT = 200
+BONE_COUNT = 60
+PART_COUNT = 4
+KEYFRAME_COUNT = 10
+
+
+class DecodingTable(C3bStringTable):
+    # Decodes every string again, what _read_string used to do.
+    def lookup(self, raw):
+        return raw.decode("utf-8")
+
+
+def synthetic_file(seed):
+    # Every asset shares the bone naming of one rig, as exported
+    # characters usually do.
+    bone_names = ["Bip01_Spine{0}_Bone".format(i) for i in range(BONE_COUNT)]
+    root = C3bNode(bone_names[0], True, Mat44.identity())
+    for name in bone_names[1:]:
+        root.children.append(C3bNode(name, False, Mat44.identity()))
+    body = C3bNode("body_{0}".format(seed), False, Mat44.identity())
+    for part_index in range(PART_COUNT):
+        part = C3bNodePart("mesh_part{0}".format(part_index), "material")
+        for name in bone_names:
+            part.bones.append(C3bBone(name, Mat44.identity()))
+        body.parts.append(part)
+
+    animation = C3bAnimation("Take 001", 1.0)
+    for name in bone_names:
+        for frame in range(KEYFRAME_COUNT):
+            animation.add_keyframe(name, C3bAnimKeyFrame(
+                frame / KEYFRAME_COUNT, translation=Vec3(0.0, 0.0, 0.0)))
+
+    writer = C3bWriter()
+    writer.add_nodes([root, body])
+    writer.add_animation(animation, "Take 001")
+    return writer.to_bytes()
+
+
+def load(corpus, make_table):
+    loaded = []
+    for _bytes in corpus:
+        parser = C3bParser(_bytes, make_table())
+        loaded.append((parser.read_nodes(0), parser.read_animations(0)))
+    return loaded
+
+
+def bench(name, corpus, make_table):
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = load(corpus, make_table)
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0:<12} retained={1:.1f}MiB peak={2:.1f}MiB time={3:.2f}s".format(
+        name, size / (1 << 20), peak / (1 << 20), elapsed))
+    return loaded
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FILE_COUNT
+    corpus = [synthetic_file(seed) for seed in range(count)]
+    print("files={0} bytes={1}".format(count, sum(map(len, corpus))))
+    bench("decode", corpus, DecodingTable)
+    bench("per-parser", corpus, C3bStringTable)
+    shared = C3bStringTable()
+    bench("shared", corpus, lambda: shared)
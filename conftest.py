@@ -0,0 +1,113 @@
+import pytest
+from meru.c3b import (C3bAnimation, C3bAnimKeyFrame, C3bBone, C3bMaterial,
+C3bMesh, C3bNode, C3bNodePart, C3bTexture, C3bVertexArray, C3bVertexAttribute,
+C3bWriter)
+from meru.binary import Endian
+from meru.linear import Mat44, Vec3, Vec4
+
+IDENTITY = [
+    1.0, 0.0, 0.0, 0.0,
+    0.0, 1.0, 0.0, 0.0,
+    0.0, 0.0, 1.0, 0.0,
+    0.0, 0.0, 0.0, 1.0
+]
+
+
+def translation(x, y, z):
+    return Mat44(IDENTITY[:12] + [x, y, z, 1.0])
+
+
+class C3bModel:
+    def __init__(self):
+        self.meshes = []
+        self.materials = []
+        self.nodes = []
+        self.animation = None
+
+    def to_bytes(self, endianness=None):
+        writer = C3bWriter() if endianness is None else \
+            C3bWriter(endianness=endianness)
+        writer.add_meshes(self.meshes)
+        writer.add_materials(self.materials)
+        writer.add_nodes(self.nodes)
+        writer.add_animation(self.animation, "Take 001")
+        return writer.to_bytes()
+
+
+def build_model():
+    model = C3bModel()
+
+    # A skinned quad split into two mesh parts sharing one vertex array.
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_NORMAL"),
+        C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD"),
+        C3bVertexAttribute(4, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_WEIGHT"),
+        C3bVertexAttribute(4, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_INDEX")
+    ]
+    corners = [(0.0, 0.0), (1.0, 0.0), (1.0, 2.0), (0.0, 2.0)]
+    for x, y in corners:
+        weight = y / 2.0
+        vertex_array.values.extend([x, y, 0.0, 0.0, 0.0, 1.0, x, y / 2.0,
+            1.0 - weight, weight, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0])
+
+    lower = C3bMesh("lower", vertex_array)
+    lower.indices = [0, 1, 2]
+    lower.aabb = [0.0, 0.0, 0.0, 1.0, 2.0, 0.0]
+    upper = C3bMesh("upper", vertex_array)
+    upper.indices = [0, 2, 3]
+    upper.aabb = [0.0, 0.0, 0.0, 1.0, 2.0, 0.0]
+    model.meshes = [lower, upper]
+
+    material = C3bMaterial("skin")
+    material.diffuse = Vec3(0.5, 0.25, 1.0)
+    material.shininess = 2.0
+    texture = C3bTexture("skin_tex", "skin.png", "DIFFUSE", "REPEAT",
+        "CLAMP")
+    material.textures.append(texture)
+    model.materials = [material, C3bMaterial("plain")]
+
+    root_bone = C3bNode("root_bone", True, Mat44(list(IDENTITY)))
+    child_bone = C3bNode("child_bone", False, translation(0.0, 1.0, 0.0))
+    root_bone.children.append(child_bone)
+
+    model_node = C3bNode("body", False, Mat44(list(IDENTITY)))
+    for mesh_id, material_id in [("lower", "skin"), ("upper", "plain")]:
+        part = C3bNodePart(mesh_id, material_id)
+        part.bones.append(C3bBone("root_bone", Mat44(list(IDENTITY))))
+        part.bones.append(C3bBone("child_bone",
+            translation(0.0, -1.0, 0.0)))
+        part.uv_mapping.append([0])
+        model_node.parts.append(part)
+    model.nodes = [root_bone, model_node]
+
+    animation = C3bAnimation("Take 001", 1.0)
+    animation.add_keyframe("root_bone", C3bAnimKeyFrame(0.0,
+        rotation=Vec4(0.0, 0.0, 0.0, 1.0), scale=Vec3(1.0, 1.0, 1.0),
+        translation=Vec3(0.0, 0.0, 0.0)))
+    animation.add_keyframe("root_bone", C3bAnimKeyFrame(1.0,
+        translation=Vec3(2.0, 0.0, 0.0)))
+    animation.add_keyframe("child_bone", C3bAnimKeyFrame(0.0,
+        rotation=Vec4(0.0, 0.0, 0.0, 1.0), translation=Vec3(0.0, 1.0, 0.0)))
+    animation.add_keyframe("child_bone", C3bAnimKeyFrame(1.0,
+        rotation=Vec4(0.0, 0.0, 0.70710678, 0.70710678),
+        translation=Vec3(0.0, 1.0, 0.0)))
+    model.animation = animation
+    return model
+
+
+@pytest.fixture
+def c3b_model():
+    return build_model()
+
+
+@pytest.fixture
+def c3b_bytes():
+    return build_model().to_bytes()
+
+
+@pytest.fixture
+def c3b_big_bytes():
+    # The same document with every value stored big endian.
+    return build_model().to_bytes(Endian.BIG)
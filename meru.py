@@ -1,6 +1,18 @@
 #!/usr/bin/env python3
+import json
+import os
+import sys
 import click
-from meru.c3b import C3bParser, MeruSkeleton
+from meru.c3b import C3bParser, C3bType, MeruSkeleton
+from meru import scan as _scan
+from meru.archive import read_sources
+from meru.c3t import compile_files
+from meru.client import QUERY_COMMANDS, MeruClient
+from meru.dedupe import dedupe_report
+from meru.diff import EQUAL, diff_files
+from meru.export import EXPORT_FORMATS, export_file, export_tree
+from meru.incremental import MeruBuilder
+from meru.lod import DEFAULT_LOD_RATIOS, write_lods
 
 
 CONTEXT_SETTINGS = {
@@ -13,19 +25,35 @@ def main():
     pass
 
 
-@main.command()
-@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
-def header(filenames):
-    for filename in filenames:
-        with open(filename, "rb") as _file:
-            buffer = _file.read()
-            parser = C3bParser(buffer)
-
+def _iter_parsers(filenames, workers=None):
+    # Archives and archive globs expand to their members, which are read
+    # and decompressed on a thread pool ahead of parsing.
+    for filename, buffer, error in read_sources(_scan.iter_sources(filenames),
+    workers):
+        if error is not None:
+            print("ERROR: {0}: {1}".format(filename, error))
+            continue
+        parser = C3bParser(buffer)
         if not parser.verify_signature():
             print("ERROR: {0} is not a c3b file.".format(filename))
             continue
+        yield filename, parser
+
+
+@main.command()
+@click.argument("filenames", type=click.Path(), nargs=-1)
+def header(filenames):
+    # Only as much of every file as its header needs is read.
+    for entry in _scan.scan(filenames):
+        filename = entry.path
+        header = entry.header
+        if header is None:
+            if entry.error == "not a c3b file":
+                print("ERROR: {0} is not a c3b file.".format(filename))
+            else:
+                print("ERROR: {0}: {1}".format(filename, entry.error))
+            continue
 
-        header = parser.read_header()
         print("File: {0}".format(filename))
         print("Version: {0}.{1}".format(header.major_version,
             header.minor_version))
@@ -40,14 +68,9 @@ def header(filenames):
 
 
 @main.command()
-@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
+@click.argument("filenames", type=click.Path(), nargs=-1)
 def meshes(filenames):
-    for filename in filenames:
-        parser = C3bParser.from_file(filename)
-        if not parser.verify_signature():
-            print("ERROR: {0} is not a c3b file.".format(filename))
-            continue
-
+    for filename, parser in _iter_parsers(filenames):
         meshes = parser.read_meshes(0)
         print("File: {0}".format(filename))
         print("MeshCount: {0}".format(len(meshes)))
@@ -68,19 +91,17 @@ def meshes(filenames):
 
 
 @main.command()
-@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
+@click.argument("filenames", type=click.Path(), nargs=-1)
 def materials(filenames):
-    for filename in filenames:
-        parser = C3bParser.from_file(filename)
+    for filename, parser in _iter_parsers(filenames):
         materials = parser.read_materials(0)
         print(materials)
 
 
 @main.command()
-@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
+@click.argument("filenames", type=click.Path(), nargs=-1)
 def nodes(filenames):
-    for filename in filenames:
-        parser = C3bParser.from_file(filename)
+    for filename, parser in _iter_parsers(filenames):
         nodes = parser.read_nodes(0)
         skeleton = MeruSkeleton.from_nodes(nodes)
         print(nodes)
@@ -88,13 +109,200 @@ def nodes(filenames):
 
 
 @main.command()
-@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
+@click.argument("filenames", type=click.Path(), nargs=-1)
 def animations(filenames):
-    for filename in filenames:
-        parser = C3bParser.from_file(filename)
+    for filename, parser in _iter_parsers(filenames):
         animations = parser.read_animations(0)
         print(animations)
 
 
+@main.command()
+@click.argument("paths", type=click.Path(), nargs=-1)
+@click.option("-f", "--format", "_format", default="csv",
+    type=click.Choice(["csv", "ndjson"]), help="Inventory output format.")
+@click.option("-j", "--workers", type=int, default=None,
+    help="Number of reader threads.")
+@click.option("-o", "--output", type=click.File("w"), default="-",
+    help="Inventory destination, defaults to stdout.")
+def scan(paths, _format, workers, output):
+    entries = _scan.scan(paths, workers)
+    if _format == "csv":
+        invalid_count = _scan.write_csv(entries, output)
+    else:
+        invalid_count = _scan.write_ndjson(entries, output)
+    if invalid_count > 0:
+        print("ERROR: {0} invalid c3b files.".format(invalid_count),
+            file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("dedupe-report")
+@click.argument("paths", type=click.Path(), nargs=-1)
+@click.option("-f", "--format", "_format", default="text",
+    type=click.Choice(["text", "json"]), help="Report output format.")
+@click.option("-j", "--workers", type=int, default=None,
+    help="Number of reader threads.")
+def dedupe(paths, _format, workers):
+    report = dedupe_report(paths, workers)
+    if _format == "json":
+        print(json.dumps(report.to_dict(), indent=1))
+        return
+
+    for path, error in report.errors:
+        print("ERROR: {0}: {1}".format(path, error))
+    print("Files: {0}".format(report.file_count))
+    print("Bytes: {0}".format(report.file_bytes))
+    for kind_stats in report.kinds():
+        print()
+        print("Kind: {0}".format(kind_stats.kind))
+        print("Payloads: {0}".format(kind_stats.payloads))
+        print("Unique: {0}".format(kind_stats.unique))
+        print("Bytes: {0}".format(kind_stats.bytes))
+        print("ShareableBytes: {0}".format(kind_stats.shareable_bytes))
+    print()
+    print("ShareableBytes: {0}".format(report.shareable_bytes()))
+
+
+@main.command()
+@click.argument("a", type=click.Path())
+@click.argument("b", type=click.Path())
+@click.option("-f", "--format", "_format", default="text",
+    type=click.Choice(["text", "json"]), help="Diff output format.")
+def diff(a, b, _format):
+    result = diff_files(a, b)
+    if _format == "json":
+        print(json.dumps(result.to_dict(), indent=1))
+    else:
+        for section in result.sections:
+            if section.status != EQUAL:
+                print("Section {0} {1}[{2}] {3}".format(section.status,
+                    C3bType.name(section.type), section.index, section.id))
+        for change in result.changes:
+            line = "{0} {1} {2}".format(change.change.capitalize(),
+                change.kind, change.id)
+            if change.fields:
+                line += ": " + ", ".join(change.fields)
+            print(line)
+        counts = result.section_counts()
+        print("Sections: {0}".format(", ".join("{0} {1}".format(count,
+            status) for status, count in sorted(counts.items()))))
+    if not result.is_equal():
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("filenames", type=click.Path(exists=True, dir_okay=False),
+    nargs=-1)
+@click.option("-r", "--ratio", "ratios", type=float, multiple=True,
+    help="Triangle ratio of a LOD, may be repeated.")
+@click.option("-o", "--output", type=click.Path(file_okay=False),
+    default=None, help="Output directory, defaults to next to each source.")
+def lod(filenames, ratios, output):
+    ratios = list(ratios) or DEFAULT_LOD_RATIOS
+    for filename in filenames:
+        for output_path, lods in write_lods(filename, ratios, output):
+            print("Written: {0} ({1} -> {2} triangles)".format(output_path,
+                sum(lod.source_triangle_count for lod in lods),
+                sum(lod.triangle_count for lod in lods)))
+
+
+def _print_build_result(result):
+    for rel_path in result.added:
+        print("Added: {0}".format(rel_path))
+    for rel_path in result.changed:
+        print("Changed: {0}".format(rel_path))
+    for rel_path in result.removed:
+        print("Removed: {0}".format(rel_path))
+    for rel_path, error in sorted(result.failed.items()):
+        print("ERROR: {0}: {1}".format(rel_path, error))
+    print("Unchanged: {0}".format(result.unchanged))
+
+
+@main.command()
+@click.argument("source", type=click.Path(exists=True))
+@click.argument("output", type=click.Path())
+@click.option("-f", "--format", "_format", default="npz",
+    type=click.Choice(EXPORT_FORMATS), help="Export format.")
+@click.option("-z", "--compress", is_flag=True,
+    help="Deflate the arrays inside .npz files.")
+@click.option("-j", "--workers", type=int, default=None,
+    help="Number of export processes for a source directory.")
+def export(source, output, _format, compress, workers):
+    # A source directory is exported file by file into the output
+    # directory, a single source into output itself.
+    if os.path.isdir(source):
+        _print_build_result(export_tree(source, output, _format, compress,
+            workers))
+        return
+    manifest = export_file(source, output, _format, compress)
+    print("Written: {0} ({1} arrays)".format(output,
+        len(manifest["arrays"])))
+
+
+@main.command()
+@click.argument("source", type=click.Path(exists=True, file_okay=False))
+@click.argument("output", type=click.Path(file_okay=False))
+@click.option("-j", "--workers", type=int, default=None,
+    help="Number of parser processes.")
+@click.option("-w", "--watch", is_flag=True,
+    help="Keep polling the source tree and rebuild changes.")
+@click.option("-i", "--interval", type=float, default=1.0,
+    help="Polling interval in seconds for --watch.")
+def build(source, output, workers, watch, interval):
+    builder = MeruBuilder(source, output, workers=workers)
+    if watch:
+        try:
+            builder.watch(interval, _print_build_result)
+        except KeyboardInterrupt:
+            pass
+    else:
+        _print_build_result(builder.build())
+
+
+@main.command("compile")
+@click.argument("paths", type=click.Path(exists=True), nargs=-1)
+@click.option("-o", "--output", type=click.Path(file_okay=False),
+    default=None, help="Output directory, defaults to next to each source.")
+@click.option("-j", "--workers", type=int, default=None,
+    help="Number of compiler processes.")
+def _compile(paths, output, workers):
+    failed_count = 0
+    for result in compile_files(paths, output, workers):
+        if result.error is None:
+            print("Compiled: {0} -> {1}".format(result.source_path,
+                result.output_path))
+        else:
+            failed_count += 1
+            print("ERROR: {0}: {1}".format(result.source_path, result.error),
+                file=sys.stderr)
+    if failed_count > 0:
+        sys.exit(1)
+
+
+@main.command()
+@click.option("-s", "--socket", "socket_path", type=click.Path(),
+    default=None, help="Unix socket path, defaults to $MERU_SOCKET.")
+@click.option("-m", "--cache-size", type=int, default=256,
+    help="Parsed document cache budget in MiB.")
+def serve(socket_path, cache_size):
+    from meru.serve import serve as _serve
+    try:
+        _serve(socket_path, cache_size << 20)
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command()
+@click.argument("command", type=click.Choice(QUERY_COMMANDS))
+@click.argument("filenames", type=click.Path(exists=True), nargs=-1)
+@click.option("-s", "--socket", "socket_path", type=click.Path(),
+    default=None, help="Unix socket path, defaults to $MERU_SOCKET.")
+def query(command, filenames, socket_path):
+    with MeruClient(socket_path) as client:
+        for filename in filenames:
+            result = client.query(command, filename)
+            print(json.dumps({"path": filename, command: result}))
+
+
 if __name__ == "__main__":
     main()
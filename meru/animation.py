@@ -0,0 +1,142 @@
+import bisect
+import math
+
+from .binary import Endian, FLOAT32_FORMAT, dump_array_from_format
+from .binding import MeruClipBinding
+from .linear import (mat44_decompose, mat44_from_trs, mat44_multiply,
+quat_nlerp, vec_lerp)
+
+DEFAULT_FRAME_RATE = 30.0
+
+
+class MeruTrack:
+    def __init__(self, interpolate):
+        self.times = []
+        self.values = []
+        self.interpolate = interpolate
+
+    def add(self, time, value):
+        self.times.append(time)
+        self.values.append(value)
+
+    def sample(self, time):
+        times = self.times
+        if not times:
+            return None
+        if time <= times[0]:
+            return self.values[0]
+        if time >= times[-1]:
+            return self.values[-1]
+        right = bisect.bisect_right(times, time)
+        left = right - 1
+        span = times[right] - times[left]
+        if span <= 0.0:
+            return self.values[right]
+        return self.interpolate(self.values[left], self.values[right],
+            (time - times[left]) / span)
+
+
+class MeruChannel:
+    def __init__(self, bone_id):
+        self.bone_id = bone_id
+        self.translation = MeruTrack(vec_lerp)
+        self.rotation = MeruTrack(quat_nlerp)
+        self.scale = MeruTrack(vec_lerp)
+
+    @classmethod
+    def from_keyframes(self, bone_id, keyframes):
+        channel = MeruChannel(bone_id)
+        for keyframe in keyframes:
+            if keyframe.translation is not None:
+                channel.translation.add(keyframe.time,
+                    keyframe.translation.unpack())
+            if keyframe.rotation is not None:
+                channel.rotation.add(keyframe.time,
+                    keyframe.rotation.unpack())
+            if keyframe.scale is not None:
+                channel.scale.add(keyframe.time, keyframe.scale.unpack())
+        return channel
+
+    def sample(self, time, bind_pose):
+        translation = self.translation.sample(time)
+        rotation = self.rotation.sample(time)
+        scale = self.scale.sample(time)
+        return (bind_pose[0] if translation is None else translation,
+            bind_pose[1] if rotation is None else rotation,
+            bind_pose[2] if scale is None else scale)
+
+
+def build_channels(animation):
+    return {bone_id: MeruChannel.from_keyframes(bone_id,
+        animation.get_keyframes(bone_id)) for bone_id in animation.get_bones()}
+
+
+def bind_poses(skeleton):
+    return [mat44_decompose(bone.transform.unpack())
+        for bone in skeleton.bones]
+
+
+def frame_times(total_time, frame_rate=DEFAULT_FRAME_RATE):
+    frame_count = max(1, int(math.floor(total_time * frame_rate + 1e-6)) + 1)
+    return [min(total_time, frame / frame_rate)
+        for frame in range(frame_count)]
+
+
+def sample_local_matrices(skeleton, channels, time, poses=None):
+    bone_channels = [channels.get(bone.id) for bone in skeleton.bones]
+    return sample_bound_matrices(skeleton, bone_channels, time, poses)
+
+
+def sample_bound_matrices(skeleton, bone_channels, time, poses=None):
+    # bone_channels is indexed like skeleton.bones, see
+    # MeruClipBinding.bind_channels.
+    if poses is None:
+        poses = bind_poses(skeleton)
+    matrices = []
+    for bone, channel, pose in zip(skeleton.bones, bone_channels, poses):
+        if channel is None:
+            matrices.append(list(bone.transform.unpack()))
+        else:
+            matrices.append(mat44_from_trs(*channel.sample(time, pose)))
+    return matrices
+
+
+def world_matrices(skeleton, local_matrices):
+    # Bones are stored parents first, so every parent's world matrix is
+    # ready by the time its children need it.
+    worlds = []
+    for bone, local in zip(skeleton.bones, local_matrices):
+        if bone.parent is None:
+            worlds.append(local)
+        else:
+            worlds.append(mat44_multiply(worlds[bone.parent.index], local))
+    return worlds
+
+
+def bake_local_matrices(animation, skeleton, frame_rate=DEFAULT_FRAME_RATE,
+binding=None):
+    if binding is None:
+        binding = MeruClipBinding(skeleton, animation)
+    bone_channels = binding.bind_channels(build_channels(animation))
+    poses = bind_poses(skeleton)
+    return [sample_bound_matrices(skeleton, bone_channels, time, poses)
+        for time in frame_times(animation.total_time, frame_rate)]
+
+
+def bake_world_matrices(animation, skeleton, frame_rate=DEFAULT_FRAME_RATE,
+binding=None):
+    return [world_matrices(skeleton, local_matrices) for local_matrices in
+        bake_local_matrices(animation, skeleton, frame_rate, binding)]
+
+
+def pack_mat43_frames(frames, endianness=Endian.LITTLE):
+    # 4x3 matrices as Noesis lays them out: the first three values of
+    # every column, frame by frame and bone by bone.
+    values = []
+    for matrices in frames:
+        for m in matrices:
+            values.extend(m[0:3])
+            values.extend(m[4:7])
+            values.extend(m[8:11])
+            values.extend(m[12:15])
+    return dump_array_from_format(FLOAT32_FORMAT, values, endianness)
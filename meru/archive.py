@@ -0,0 +1,195 @@
+import fnmatch
+import os
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Archive members are addressed as "pack.zip::path/in/archive.c3b", the
+# member part may be a glob.
+ARCHIVE_SEPARATOR = "::"
+ARCHIVE_EXTENSIONS = (".zip",)
+
+
+def split_archive_path(path):
+    if ARCHIVE_SEPARATOR in path:
+        zip_path, member = path.split(ARCHIVE_SEPARATOR, 1)
+        return zip_path, member
+    return path, None
+
+
+def archive_path(zip_path, member):
+    return zip_path + ARCHIVE_SEPARATOR + member
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def is_glob(pattern):
+    return any(char in pattern for char in "*?[")
+
+
+def list_members(zip_path, pattern=None, extensions=None):
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile as error:
+        raise OSError("{0}: {1}".format(zip_path, error))
+    members = []
+    for info in infos:
+        if info.is_dir():
+            continue
+        if pattern is not None:
+            if fnmatch.fnmatchcase(info.filename, pattern):
+                members.append(info.filename)
+        elif extensions is None or \
+        info.filename.lower().endswith(extensions):
+            members.append(info.filename)
+    return members
+
+
+# What a damaged, encrypted or unsupported member raises instead of an
+# OSError, from opening it or from any read.
+MEMBER_ERRORS = (zipfile.BadZipFile, zlib.error, RuntimeError,
+    NotImplementedError, EOFError)
+
+
+def _member_error(zip_path, member, error):
+    return OSError("{0}{1}{2}: {3}".format(zip_path, ARCHIVE_SEPARATOR,
+        member, error))
+
+
+class _MemberFile:
+    # An open member whose read errors come out as OSError, like the ones
+    # of a plain file.
+    def __init__(self, _file, zip_path, member):
+        self._file = _file
+        self.zip_path = zip_path
+        self.member = member
+
+    def read(self, size=-1):
+        try:
+            return self._file.read(size)
+        except MEMBER_ERRORS as error:
+            raise _member_error(self.zip_path, self.member, error)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _open_member(archive, zip_path, member):
+    try:
+        info = archive.getinfo(member)
+    except KeyError:
+        raise FileNotFoundError("No member {0} in {1}.".format(member,
+            zip_path))
+    try:
+        _file = archive.open(info)
+    except MEMBER_ERRORS as error:
+        raise _member_error(zip_path, member, error)
+    return _MemberFile(_file, zip_path, member), info.file_size
+
+
+class MeruSourceReader:
+    # Opens plain files and archive members. Every thread keeps its own
+    # ZipFile per archive, so central directories are read once and
+    # members decompress in parallel without sharing a handle.
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._archives = []
+
+    def open(self, source):
+        zip_path, member = split_archive_path(source)
+        if member is None:
+            _file = open(source, "rb")
+            return _file, os.fstat(_file.fileno()).st_size
+        return _open_member(self._archive(zip_path), zip_path, member)
+
+    def read(self, source, size=None):
+        _file, file_size = self.open(source)
+        with _file:
+            return _file.read() if size is None else _file.read(size)
+
+    def close(self):
+        with self._lock:
+            for archive in self._archives:
+                archive.close()
+            self._archives = []
+        self._local = threading.local()
+
+    def _archive(self, zip_path):
+        archives = getattr(self._local, "archives", None)
+        if archives is None:
+            archives = {}
+            self._local.archives = archives
+        archive = archives.get(zip_path)
+        if archive is None:
+            try:
+                archive = zipfile.ZipFile(zip_path)
+            except zipfile.BadZipFile as error:
+                raise OSError("{0}: {1}".format(zip_path, error))
+            archives[zip_path] = archive
+            with self._lock:
+                self._archives.append(archive)
+        return archive
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_source(source, reader=None):
+    # Returns a readable file object and the uncompressed size. Reading a
+    # prefix of an archive member only inflates that prefix.
+    if reader is not None:
+        return reader.open(source)
+    zip_path, member = split_archive_path(source)
+    if member is None:
+        _file = open(source, "rb")
+        return _file, os.fstat(_file.fileno()).st_size
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            return _open_member(archive, zip_path, member)
+    except zipfile.BadZipFile as error:
+        raise OSError("{0}: {1}".format(zip_path, error))
+
+
+def read_source(source, size=None):
+    _file, file_size = open_source(source)
+    with _file:
+        return _file.read() if size is None else _file.read(size)
+
+
+def read_sources(sources, workers=None):
+    # Yields (source, bytes, error) in order, zlib releases the GIL while
+    # inflating so members decompress concurrently on the thread pool.
+    # Only a few members per worker are read ahead of the consumer.
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+
+    def read(source):
+        try:
+            return source, reader.read(source), None
+        except OSError as error:
+            return source, None, error
+
+    with MeruSourceReader() as reader:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for source in sources:
+                pending.append(executor.submit(read, source))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
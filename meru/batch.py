@@ -0,0 +1,213 @@
+from .bounds import POSITION_ATTRIBUTE, compute_aabb
+from .c3b import (C3bMesh, C3bNode, C3bNodePart, C3bVertexArray,
+C3bVertexAttribute, MeruNodeTable)
+from .linear import MAT44_IDENTITY, Mat44
+
+NORMAL_ATTRIBUTE = "VERTEX_ATTRIB_NORMAL"
+DIRECTION_ATTRIBUTES = ["VERTEX_ATTRIB_TANGENT", "VERTEX_ATTRIB_BINORMAL"]
+
+# Indices are written as uint16, so a batch can address at most this
+# many vertices.
+BATCH_MAX_VERTICES = 1 << 16
+
+
+def attribute_layout(vertex_array):
+    return tuple((attrib.name, attrib.value_count, attrib.type)
+        for attrib in vertex_array.attributes)
+
+
+def _linear_part(m):
+    return [[m[column * 4 + row] for column in range(3)] for row in range(3)]
+
+
+def _normal_part(m):
+    # Inverse transpose of the upper 3x3, scaled by the determinant, which
+    # only changes the length of the normals before they get normalized.
+    a = _linear_part(m)
+    cofactors = [[a[(r + 1) % 3][(c + 1) % 3] * a[(r + 2) % 3][(c + 2) % 3] -
+        a[(r + 1) % 3][(c + 2) % 3] * a[(r + 2) % 3][(c + 1) % 3]
+        for c in range(3)] for r in range(3)]
+    det = sum(a[0][c] * cofactors[0][c] for c in range(3))
+    sign = -1.0 if det < 0.0 else 1.0
+    return [[value * sign for value in row] for row in cofactors], det
+
+
+def _apply(rows, x, y, z, normalize):
+    values = [row[0] * x + row[1] * y + row[2] * z for row in rows]
+    if normalize:
+        length = (values[0] ** 2 + values[1] ** 2 + values[2] ** 2) ** 0.5
+        if length > 0.0:
+            values = [value / length for value in values]
+    return values
+
+
+class _VertexTransformer:
+    def __init__(self, vertex_array, matrix):
+        self.values = vertex_array.values
+        self.stride = vertex_array.values_per_vertex()
+        self.identity = list(matrix) == list(MAT44_IDENTITY)
+        self.matrix = matrix
+        self.linear = _linear_part(matrix)
+        self.normal, det = _normal_part(matrix)
+        self.mirrored = det < 0.0
+
+        self.position = None
+        self.normals = []
+        self.directions = []
+        offset = 0
+        for attrib in vertex_array.attributes:
+            if attrib.value_count >= 3:
+                if attrib.name == POSITION_ATTRIBUTE:
+                    self.position = offset
+                elif attrib.name == NORMAL_ATTRIBUTE:
+                    self.normals.append(offset)
+                elif attrib.name in DIRECTION_ATTRIBUTES:
+                    self.directions.append(offset)
+            offset += attrib.value_count
+
+    def vertex(self, index):
+        start = index * self.stride
+        vertex = list(self.values[start:start + self.stride])
+        if self.identity:
+            return vertex
+        if self.position is not None:
+            m = self.matrix
+            x, y, z = vertex[self.position:self.position + 3]
+            vertex[self.position:self.position + 3] = [
+                m[0] * x + m[4] * y + m[8] * z + m[12],
+                m[1] * x + m[5] * y + m[9] * z + m[13],
+                m[2] * x + m[6] * y + m[10] * z + m[14]]
+        for offset in self.normals:
+            vertex[offset:offset + 3] = _apply(self.normal,
+                *vertex[offset:offset + 3], normalize=True)
+        for offset in self.directions:
+            vertex[offset:offset + 3] = _apply(self.linear,
+                *vertex[offset:offset + 3], normalize=True)
+        return vertex
+
+
+class MeruBatch:
+    def __init__(self, _id, material_id, uv_mapping, vertex_array):
+        self.material_id = material_id
+        self.uv_mapping = uv_mapping
+        self.mesh = C3bMesh(_id, vertex_array)
+        self.parts = []
+        self._vertex_count = 0
+
+    def vertex_count(self):
+        return self._vertex_count
+
+    def add_vertex(self, vertex):
+        self.mesh.vertex_array.values.extend(vertex)
+        self._vertex_count += 1
+        return self._vertex_count - 1
+
+    def add_part(self, node_id, mesh_id):
+        if not self.parts or self.parts[-1] != (node_id, mesh_id):
+            self.parts.append((node_id, mesh_id))
+
+    def to_dict(self):
+        return {
+            "id": self.mesh.id,
+            "material": self.material_id,
+            "parts": len(self.parts),
+            "vertices": self._vertex_count,
+            "triangles": len(self.mesh.indices) // 3
+        }
+
+
+class MeruBatchResult:
+    def __init__(self):
+        self.batches = []
+        self.skipped = []
+        self.source_part_count = 0
+
+    def meshes(self):
+        return [batch.mesh for batch in self.batches]
+
+    def to_node(self, _id="batches"):
+        node = C3bNode(_id, False, Mat44.identity())
+        for batch in self.batches:
+            part = C3bNodePart(batch.mesh.id, batch.material_id)
+            part.uv_mapping = [list(indices) for indices in batch.uv_mapping]
+            node.parts.append(part)
+        return node
+
+    def draw_calls_before(self):
+        return self.source_part_count
+
+    def draw_calls_after(self):
+        return len(self.batches) + len(self.skipped)
+
+
+def _batch_key(part, vertex_array):
+    uv_mapping = tuple(tuple(indices) for indices in part.uv_mapping)
+    return part.material_id, uv_mapping, attribute_layout(vertex_array)
+
+
+def _new_batch(result, key, vertex_array):
+    material_id, uv_mapping, layout = key
+    batch_vertex_array = C3bVertexArray()
+    batch_vertex_array.attributes = [C3bVertexAttribute(attrib.value_count,
+        attrib.type, attrib.name) for attrib in vertex_array.attributes]
+    batch = MeruBatch("{0}_batch{1}".format(material_id, len(result.batches)),
+        material_id, uv_mapping, batch_vertex_array)
+    result.batches.append(batch)
+    return batch
+
+
+def batch_meshes(nodes, meshes, max_vertices=BATCH_MAX_VERTICES):
+    mesh_map = {mesh.id: mesh for mesh in meshes}
+    table = MeruNodeTable.from_nodes(nodes)
+    worlds = table.world_transforms()
+    result = MeruBatchResult()
+    open_batches = {}
+
+    for index, node in enumerate(table.nodes):
+        for part in table.node_parts(index):
+            result.source_part_count += 1
+            mesh = mesh_map.get(part.mesh_id)
+
+            # Skinned parts move at runtime, their transforms cannot be
+            # baked into the vertices.
+            if mesh is None or part.bones:
+                result.skipped.append((node.id, part))
+                continue
+
+            key = _batch_key(part, mesh.vertex_array)
+            transformer = _VertexTransformer(mesh.vertex_array, worlds[index])
+            batch = open_batches.get(key)
+            remap = None
+            indices = mesh.indices
+            for start in range(0, len(indices) - 2, 3):
+                triangle = indices[start:start + 3]
+
+                # Start a new batch rather than overflowing uint16 indices,
+                # parts larger than a whole batch get split as well.
+                added = len(set(triangle)) if remap is None else \
+                    len({vertex for vertex in triangle if vertex not in remap})
+                if batch is None or \
+                batch.vertex_count() + added > max_vertices:
+                    batch = _new_batch(result, key, mesh.vertex_array)
+                    open_batches[key] = batch
+                    remap = None
+                if remap is None:
+                    remap = {}
+                    batch.add_part(node.id, part.mesh_id)
+
+                mapped = []
+                for vertex in triangle:
+                    new_index = remap.get(vertex)
+                    if new_index is None:
+                        new_index = batch.add_vertex(
+                            transformer.vertex(vertex))
+                        remap[vertex] = new_index
+                    mapped.append(new_index)
+                if transformer.mirrored:
+                    mapped = [mapped[0], mapped[2], mapped[1]]
+                batch.mesh.indices.extend(mapped)
+
+    for batch in result.batches:
+        if batch.mesh.vertex_array.has_attribute(POSITION_ATTRIBUTE):
+            batch.mesh.aabb = compute_aabb(batch.mesh.vertex_array)
+    return result
@@ -1,3 +1,4 @@
+import array
 import sys
 import struct
 
@@ -15,6 +16,11 @@ class Endian:
             return self.LITTLE
 
 
+class ShortReadError(ValueError):
+    # The buffer ends before the requested bytes, more data could fix it.
+    pass
+
+
 def parse_from_format(frmt, _bytes, endianess=None):
     if endianess is None:
         endianess = Endian.native()
@@ -29,6 +35,32 @@ def parse_from_format(frmt, _bytes, endianess=None):
     return struct.unpack(combined_format, _bytes)[0]
 
 
+def byteswap_array(values, endianess=None):
+    # Swaps an array in place unless its bytes already are in host order.
+    if endianess is not None and endianess != Endian.native() and \
+    values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+def parse_typed_array_from_format(frmt, count, _bytes, endianess=None):
+    # The whole buffer is read natively in one go and only byte swapped,
+    # in place, when it is not in host order.
+    calced_size = struct.calcsize("<" + frmt) * count
+    _len = len(_bytes)
+    if calced_size != _len:
+        raise ValueError("Length of byte buffer was {0}, expected {1}."
+            .format(_len, calced_size))
+    values = array.array(ARRAY_TYPECODES[frmt])
+    values.frombytes(_bytes)
+    return byteswap_array(values, endianess)
+
+
+def parse_array_from_format(frmt, count, _bytes, endianess=None):
+    return parse_typed_array_from_format(frmt, count, _bytes,
+        endianess).tolist()
+
+
 def dump_from_format(frmt, value, endianess=None):
     if endianess is None:
         endianess = Endian.native()
@@ -37,6 +69,19 @@ def dump_from_format(frmt, value, endianess=None):
     return struct.pack(combined_format, value)
 
 
+def dump_array_from_format(frmt, values, endianess=None):
+    # Arrays of the right type are dumped as they are, anything that needs
+    # converting or swapping is copied first.
+    typecode = ARRAY_TYPECODES[frmt]
+    if isinstance(values, memoryview) and values.format == typecode:
+        values = array.array(typecode, values.tobytes())
+    elif not isinstance(values, array.array) or values.typecode != typecode:
+        values = array.array(typecode, values)
+    elif endianess is not None and endianess != Endian.native():
+        values = array.array(typecode, values)
+    return byteswap_array(values, endianess).tobytes()
+
+
 INT8_FORMAT = "b"
 INT16_FORMAT = "h"
 INT32_FORMAT = "i"
@@ -51,6 +96,23 @@ FLOAT32_FORMAT = "f"
 FLOAT64_FORMAT = "d"
 
 
+def _array_typecode(frmt):
+    # The array typecode whose items have the standard size of the struct
+    # format, int and long sizes vary between platforms.
+    size = struct.calcsize("<" + frmt)
+    for typecode in [frmt, {"i": "l", "I": "L"}.get(frmt, frmt)]:
+        if array.array(typecode).itemsize == size:
+            return typecode
+    raise ValueError("No array type for format {0}.".format(frmt))
+
+
+ARRAY_TYPECODES = {frmt: _array_typecode(frmt) for frmt in [
+    INT8_FORMAT, INT16_FORMAT, INT32_FORMAT, INT64_FORMAT, UINT8_FORMAT,
+    UINT16_FORMAT, UINT32_FORMAT, UINT64_FORMAT, FLOAT32_FORMAT,
+    FLOAT64_FORMAT
+]}
+
+
 def parse_int8(byte):
     return parse_from_format(INT8_FORMAT, byte)
 
@@ -179,15 +241,21 @@ class BinaryReader(BinaryStream):
         if self.remaining() < count:
             msg = "Attempted to read {0} bytes but only {1} are available."\
                 .format(count, self.remaining())
-            raise ValueError(msg)
+            raise ShortReadError(msg)
         _read = self.read(count)
         _read_count = len(_read)
         if _read_count != count:
             msg = "Attempted to read {0} bytes but only {1} were read."\
                 .format(count, _read_count)
-            raise ValueError(msg)
+            raise ShortReadError(msg)
         return _read
 
+    def view(self, start, end):
+        # Zero copy view of a byte range, the position does not move.
+        if start < 0 or start > end or end > self.length():
+            raise IndexError("Range out of bounds.")
+        return memoryview(self._bytes)[start:end]
+
     def read_int8(self):
         return parse_int8(self.strict_read(1))
 
@@ -221,6 +289,23 @@ class BinaryReader(BinaryStream):
     def read_bool(self):
         return parse_bool(self.strict_read(1))
 
+    def read_uint16_array(self, count, endianness=None):
+        return self._read_array(UINT16_FORMAT, count, endianness)
+
+    def read_uint32_array(self, count, endianness=None):
+        return self._read_array(UINT32_FORMAT, count, endianness)
+
+    def read_float32_array(self, count, endianness=None):
+        return self._read_array(FLOAT32_FORMAT, count, endianness)
+
+    def read_typed_array(self, frmt, count, endianness=None):
+        size = struct.calcsize("<" + frmt) * count
+        return parse_typed_array_from_format(frmt, count,
+            self.strict_read(size), endianness)
+
+    def _read_array(self, frmt, count, endianness):
+        return self.read_typed_array(frmt, count, endianness).tolist()
+
     def read_size_prefixed_int8(self):
         count = self.read_int8()
         return self.strict_read(count)
@@ -296,66 +381,63 @@ class BinaryReader(BinaryStream):
 class BinaryWriter(BinaryStream):
     def __init__(self, endianness=Endian.native()):
         self.endianness = endianness
-        super().__init__(bytes())
+        super().__init__(bytearray())
 
     def _to_collection(self, value):
-        if isinstance(value, (list, tuple)):
+        if isinstance(value, (list, tuple, array.array, memoryview)):
             return value
         else:
             return tuple([value])
 
     def to_bytes(self):
-        return self._bytes
+        return bytes(self._bytes)
 
     def write_bytes(self, _bytes):
-        prefix_bytes = self._bytes[:self.pos()]
-        suffix_bytes = self._bytes[self.pos() + len(_bytes):]
-        self._bytes = prefix_bytes + _bytes + suffix_bytes
+        self._bytes[self.pos():self.pos() + len(_bytes)] = _bytes
         self.move(len(_bytes))
 
     def write_int8(self, numbers):
-        self._write_non_endian_values(numbers, dump_int8)
+        self._write_non_endian_values(numbers, INT8_FORMAT)
 
     def write_int16(self, numbers):
-        self._write_values(numbers, dump_int16)
+        self._write_values(numbers, INT16_FORMAT)
 
     def write_int32(self, numbers):
-        self._write_values(numbers, dump_int32)
+        self._write_values(numbers, INT32_FORMAT)
 
     def write_int64(self, numbers):
-        self._write_values(numbers, dump_int64)
+        self._write_values(numbers, INT64_FORMAT)
 
     def write_uint8(self, numbers):
-        self._write_non_endian_values(numbers, dump_uint8)
+        self._write_non_endian_values(numbers, UINT8_FORMAT)
 
     def write_uint16(self, numbers):
-        self._write_values(numbers, dump_uint16)
+        self._write_values(numbers, UINT16_FORMAT)
 
     def write_uint32(self, numbers):
-        self._write_values(numbers, dump_uint32)
+        self._write_values(numbers, UINT32_FORMAT)
 
     def write_uint64(self, numbers):
-        self._write_values(numbers, dump_uint64)
+        self._write_values(numbers, UINT64_FORMAT)
 
     def write_float32(self, numbers):
-        self._write_values(numbers, dump_float32)
+        self._write_values(numbers, FLOAT32_FORMAT)
 
     def write_float64(self, numbers):
-        self._write_values(numbers, dump_float64)
+        self._write_values(numbers, FLOAT64_FORMAT)
 
     def write_bool(self, values):
-        self._write_non_endian_values(values, dump_bool)
-
-    def _write_non_endian_values(self, values, dump_func):
         converted_values = self._to_collection(values)
-        for value in converted_values:
-            self.write_bytes(dump_func(value))
+        self._write_non_endian_values([int(bool(value))
+            for value in converted_values], UINT8_FORMAT)
 
-    def _write_values(self, values, dump_func):
-        converted_values = self._to_collection(values)
-        print(converted_values)
-        for value in converted_values:
-            self.write_bytes(dump_func(value, self.endianness))
+    def _write_non_endian_values(self, values, frmt):
+        self.write_bytes(dump_array_from_format(frmt,
+            self._to_collection(values), None))
+
+    def _write_values(self, values, frmt):
+        self.write_bytes(dump_array_from_format(frmt,
+            self._to_collection(values), self.endianness))
 
     def write_bytes_int8(self, bytes_collection):
         self._write_prefixed_bytes(bytes_collection, self.write_int8)
@@ -0,0 +1,89 @@
+import array
+
+from .linear import MAT44_IDENTITY, mat44_multiply
+
+MISSING_BONE = -1
+
+
+def skeleton_bone_indices(skeleton):
+    return {bone.id: bone.index for bone in skeleton.bones}
+
+
+class MeruClipBinding:
+    def __init__(self, skeleton, animation):
+        bone_indices = skeleton_bone_indices(skeleton)
+        self.animation_id = animation.id
+        self.channel_ids = animation.get_bones()
+
+        # Skeleton bone driven by every channel, and the channel driving
+        # every skeleton bone, MISSING_BONE where there is none.
+        self.channel_bones = array.array("i", [bone_indices.get(bone_id,
+            MISSING_BONE) for bone_id in self.channel_ids])
+        self.bone_channels = array.array("i",
+            [MISSING_BONE] * len(skeleton.bones))
+        for channel_index, bone_index in enumerate(self.channel_bones):
+            if bone_index != MISSING_BONE:
+                self.bone_channels[bone_index] = channel_index
+        self.missing = [bone_id for bone_id, bone_index in
+            zip(self.channel_ids, self.channel_bones)
+            if bone_index == MISSING_BONE]
+
+    def bind_channels(self, channels):
+        # Orders the dict build_channels returns by skeleton bone.
+        ordered = [channels[bone_id] for bone_id in self.channel_ids]
+        return [None if channel_index == MISSING_BONE else
+            ordered[channel_index] for channel_index in self.bone_channels]
+
+
+class MeruPartBinding:
+    def __init__(self, skeleton, node_part):
+        bone_indices = skeleton_bone_indices(skeleton)
+        self.mesh_id = node_part.mesh_id
+
+        # Skeleton bone used by every palette slot of the part.
+        self.palette = array.array("i", [bone_indices.get(bone.name,
+            MISSING_BONE) for bone in node_part.bones])
+        self.inv_bind_poses = [list(bone.inv_bind_pos.unpack())
+            for bone in node_part.bones]
+        self.missing = [bone.name for bone, bone_index in
+            zip(node_part.bones, self.palette) if bone_index == MISSING_BONE]
+
+    def skin_matrices(self, world_matrices):
+        return [list(MAT44_IDENTITY) if bone_index == MISSING_BONE else
+            mat44_multiply(world_matrices[bone_index], inv_bind_pos)
+            for bone_index, inv_bind_pos in zip(self.palette,
+            self.inv_bind_poses)]
+
+
+class MeruBindingCache:
+    def __init__(self):
+        self._bindings = {}
+
+    def clip(self, skeleton, animation):
+        return self._get(MeruClipBinding, skeleton, animation)
+
+    def part(self, skeleton, node_part):
+        return self._get(MeruPartBinding, skeleton, node_part)
+
+    def missing(self):
+        # (source, bone name) pairs, the source being an animation id or
+        # a node part's mesh id.
+        missing = []
+        for skeleton, source, binding in self._bindings.values():
+            source_id = binding.animation_id if \
+                isinstance(binding, MeruClipBinding) else binding.mesh_id
+            missing.extend((source_id, bone_id) for bone_id in binding.missing)
+        return missing
+
+    def clear(self):
+        self._bindings.clear()
+
+    def _get(self, binding_type, skeleton, source):
+        # Entries keep their skeleton and source alive, so the ids in the
+        # key cannot be reused by other objects.
+        key = (binding_type, id(skeleton), id(source))
+        entry = self._bindings.get(key)
+        if entry is None:
+            entry = (skeleton, source, binding_type(skeleton, source))
+            self._bindings[key] = entry
+        return entry[2]
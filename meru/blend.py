@@ -0,0 +1,447 @@
+import bisect
+import math
+import operator
+from functools import partial
+from itertools import repeat
+
+from .animation import bind_poses, build_channels, world_matrices
+from .binding import MeruClipBinding
+from .c3b import C3bType, MeruSkeleton
+from .linear import mat44_from_trs
+from .report import section_count
+
+BLEND_MODE = "blend"
+ADDITIVE_MODE = "additive"
+BLEND_MODES = [BLEND_MODE, ADDITIVE_MODE]
+
+# Poses are kept as columns indexed by instance, so every step below works
+# on all instances at once with map() instead of looping per character.
+_add = operator.add
+_sub = operator.sub
+_mul = operator.mul
+_TINY = 1e-12
+
+TRANSLATION = 0
+ROTATION = 1
+SCALE = 2
+
+
+def read_clips(parser):
+    return [parser.read_animations(index) for index in
+        range(section_count(parser.read_header(), C3bType.ANIMATIONS))]
+
+
+def subtree_mask(skeleton, bone_id, weight=1.0):
+    # Per-bone weights selecting a bone and everything below it, e.g. the
+    # spine for an upper body layer.
+    mask = [0.0] * len(skeleton.bones)
+    for bone in skeleton.bones:
+        parent_weight = 0.0 if bone.parent is None else \
+            mask[bone.parent.index]
+        if bone.id == bone_id or parent_weight > 0.0:
+            mask[bone.index] = weight
+    return mask
+
+
+def _constant(values, count):
+    return [[value] * count for value in values]
+
+
+def _dot4(a, b):
+    return list(map(_add, map(_add, map(_mul, a[0], b[0]),
+        map(_mul, a[1], b[1])), map(_add, map(_mul, a[2], b[2]),
+        map(_mul, a[3], b[3]))))
+
+
+def _normalize4(x, y, z, w):
+    lengths = list(map(max, map(math.hypot, x, y, z, w), repeat(_TINY)))
+    return [list(map(operator.truediv, column, lengths))
+        for column in (x, y, z, w)]
+
+
+def _flip(columns, signs):
+    return [list(map(_mul, column, signs)) for column in columns]
+
+
+def _lerp_columns(a, b, fracs):
+    return [list(map(_add, a_column, map(_mul, map(_sub, b_column,
+        a_column), fracs))) for a_column, b_column in zip(a, b)]
+
+
+def _scale_columns(columns, factors):
+    return [list(map(_mul, column, factors)) for column in columns]
+
+
+def _quat_multiply(a, b):
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+    return [
+        list(map(_sub, map(_add, map(_add, map(_mul, aw, bx),
+            map(_mul, ax, bw)), map(_mul, ay, bz)), map(_mul, az, by))),
+        list(map(_add, map(_add, map(_sub, map(_mul, aw, by),
+            map(_mul, ax, bz)), map(_mul, ay, bw)), map(_mul, az, bx))),
+        list(map(_add, map(_sub, map(_add, map(_mul, aw, bz),
+            map(_mul, ax, by)), map(_mul, ay, bx)), map(_mul, az, bw))),
+        list(map(_sub, map(_sub, map(_sub, map(_mul, aw, bw),
+            map(_mul, ax, bx)), map(_mul, ay, by)), map(_mul, az, bz)))]
+
+
+def _quat_conjugate_multiply(a, b):
+    # conjugate(a) * b for plain tuples.
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+    return (aw * bx - ax * bw - ay * bz + az * by,
+        aw * by + ax * bz - ay * bw - az * bx,
+        aw * bz - ax * by + ay * bx - az * bw,
+        aw * bw + ax * bx + ay * by + az * bz)
+
+
+def _align_keys(keys, previous=(0.0, 0.0, 0.0, 1.0)):
+    # Flips every rotation key onto the previous key's hemisphere, so
+    # sampling can interpolate straight between neighbours.
+    aligned = []
+    for key in keys:
+        if sum(map(_mul, key, previous)) < 0.0:
+            key = tuple(map(operator.neg, key))
+        aligned.append(key)
+        previous = key
+    return aligned
+
+
+class MeruClipSampler:
+    # A clip bound to a skeleton with its key values split into component
+    # columns. Tracks with the same key times share one search per tick.
+    def __init__(self, skeleton, animation, binding=None):
+        if binding is None:
+            binding = MeruClipBinding(skeleton, animation)
+        self.id = animation.id
+        self.duration = animation.total_time
+        self.key_times = []
+        self.tracks = []
+        time_indices = {}
+        bind = bind_poses(skeleton)
+        for channel, bind_pose in zip(binding.bind_channels(
+        build_channels(animation)), bind):
+            if channel is None:
+                self.tracks.append(None)
+                continue
+            tracks = []
+            for component, track in enumerate([channel.translation,
+            channel.rotation, channel.scale]):
+                if not track.times:
+                    tracks.append(None)
+                    continue
+                key = tuple(track.times)
+                if key not in time_indices:
+                    time_indices[key] = len(self.key_times)
+                    self.key_times.append(list(key))
+                values = track.values
+                if component == ROTATION:
+                    values = _align_keys(values, bind_pose[ROTATION])
+                tracks.append((time_indices[key],
+                    [list(column) for column in zip(*values)]))
+            self.tracks.append(tracks)
+
+        # Additive layers play relative to the first frame.
+        first = self.sample([0.0], range(len(skeleton.bones)), bind)
+        self.reference = [[tuple(column[0] for column in component)
+            for component in first[bone_index]]
+            for bone_index in range(len(skeleton.bones))]
+
+    def additive(self):
+        # A copy whose keys are offsets from the first frame: translations
+        # minus it, rotations relative to it and scales divided by it.
+        sampler = MeruClipSampler.__new__(MeruClipSampler)
+        sampler.id = self.id
+        sampler.duration = self.duration
+        sampler.key_times = self.key_times
+        sampler.tracks = []
+        for tracks, reference in zip(self.tracks, self.reference):
+            if tracks is None:
+                sampler.tracks.append(None)
+                continue
+            deltas = []
+            for component, track in enumerate(tracks):
+                if track is None:
+                    deltas.append(None)
+                    continue
+                keys = zip(*track[1])
+                if component == TRANSLATION:
+                    keys = [tuple(map(_sub, key, reference[component]))
+                        for key in keys]
+                elif component == ROTATION:
+                    keys = _align_keys([_quat_conjugate_multiply(
+                        reference[component], key) for key in keys])
+                else:
+                    keys = [tuple(map(operator.truediv, key,
+                        [value if value != 0.0 else 1.0
+                        for value in reference[component]]))
+                        for key in keys]
+                deltas.append((track[0], [list(column)
+                    for column in zip(*keys)]))
+            sampler.tracks.append(deltas)
+        sampler.reference = None
+        return sampler
+
+    def _search(self, times):
+        # (lefts, rights, fractions) per key time list, clamped to the
+        # first and last keys.
+        searches = []
+        for key_times in self.key_times:
+            last = len(key_times) - 1
+            found = list(map(partial(bisect.bisect_right, key_times), times))
+            lefts = list(map(max, map(_sub, found, repeat(1)), repeat(0)))
+            rights = list(map(min, found, repeat(last)))
+            left_times = list(map(key_times.__getitem__, lefts))
+            spans = map(_sub, map(key_times.__getitem__, rights), left_times)
+            fracs = list(map(_mul, map(operator.truediv, map(_sub, times,
+                left_times), map(max, spans, repeat(_TINY))),
+                map(operator.gt, rights, lefts)))
+            searches.append((lefts, rights, fracs))
+        return searches
+
+    def sample(self, times, bones, bind=None):
+        # {bone index: [translation, rotation, scale]} as columns over
+        # times. Whatever the clip does not drive stays in bind pose, or is
+        # None without one.
+        count = len(times)
+        searches = self._search(times)
+        pose = {}
+        for bone_index in bones:
+            tracks = self.tracks[bone_index]
+            components = []
+            for component in range(3):
+                track = None if tracks is None else tracks[component]
+                if track is None:
+                    components.append(None if bind is None else
+                        _constant(bind[bone_index][component], count))
+                    continue
+                lefts, rights, fracs = searches[track[0]]
+                a = [list(map(column.__getitem__, lefts))
+                    for column in track[1]]
+                b = [map(column.__getitem__, rights) for column in track[1]]
+                values = _lerp_columns(a, b, fracs)
+                if component == ROTATION:
+                    values = _normalize4(*values)
+                components.append(values)
+            pose[bone_index] = components
+        return pose
+
+
+class MeruBlendLayer:
+    def __init__(self, sampler, mode, mask, loop):
+        if mode not in BLEND_MODES:
+            raise ValueError("Unknown blend mode {0}.".format(mode))
+        self.sampler = sampler
+        self.mode = mode
+        self.mask = mask
+        self.loop = loop
+        self.bones = [bone_index for bone_index, weight in enumerate(mask)
+            if weight > 0.0]
+
+        # Per instance state.
+        self.times = []
+        self.weights = []
+        self.speeds = []
+
+    def advance(self, delta):
+        times = map(_add, self.times, map(_mul, self.speeds, repeat(delta)))
+        duration = self.sampler.duration
+        if duration <= 0.0:
+            self.times = [0.0] * len(self.times)
+        elif self.loop:
+            self.times = list(map(operator.mod, times, repeat(duration)))
+        else:
+            self.times = list(map(min, times, repeat(duration)))
+
+    def bone_weights(self, bone_index):
+        weight = self.mask[bone_index]
+        if weight == 1.0:
+            return self.weights
+        return list(map(_mul, self.weights, repeat(weight)))
+
+
+class MeruPoseBatch:
+    # Local poses of every instance: per bone [x, y, z] translation,
+    # [x, y, z, w] rotation and [x, y, z] scale columns.
+    def __init__(self, skeleton, poses):
+        self.skeleton = skeleton
+        self.poses = poses
+
+    def local_pose(self, instance):
+        return [tuple(tuple(column[instance] for column in component)
+            for component in bone_pose) for bone_pose in self.poses]
+
+    def local_matrices(self, instance):
+        return [mat44_from_trs(*pose) for pose in self.local_pose(instance)]
+
+    def world_matrices(self, instance):
+        return world_matrices(self.skeleton, self.local_matrices(instance))
+
+
+class MeruBlendEngine:
+    # Blends any number of clips per character. Blend layers are averaged
+    # by weight, additive layers then add their offset from their first
+    # frame on top. Layer masks weight every bone separately.
+    def __init__(self, skeleton, animations):
+        self.skeleton = skeleton
+        self.bind = bind_poses(skeleton)
+        # Clips are kept in section order, several sections may share an id
+        # such as "Take 001".
+        self.samplers = [MeruClipSampler(skeleton, animation)
+            for animation in animations]
+        self._clip_indices = {}
+        for clip_index, animation in enumerate(animations):
+            self._clip_indices.setdefault(animation.id, []).append(
+                clip_index)
+        self._additive_samplers = {}
+        self.layers = []
+        self.instance_count = 0
+
+    @classmethod
+    def from_parser(self, parser, nodes_index=0):
+        # Loads every animations section of the document.
+        skeleton = MeruSkeleton.from_nodes(parser.read_nodes(nodes_index))
+        return MeruBlendEngine(skeleton, read_clips(parser))
+
+    def clip_index(self, clip):
+        # clip is a clip id, or the index of a clip when ids are shared.
+        if isinstance(clip, int):
+            if not 0 <= clip < len(self.samplers):
+                raise IndexError("Clip index {0} out of bounds.".format(clip))
+            return clip
+        indices = self._clip_indices.get(clip)
+        if indices is None:
+            raise KeyError("No clip {0}.".format(clip))
+        if len(indices) > 1:
+            raise ValueError("Clips {0} share the id {1}, pass an index."
+                .format(indices, clip))
+        return indices[0]
+
+    def add_layer(self, clip, mode=BLEND_MODE, mask=None, weight=1.0,
+    loop=True):
+        if mask is None:
+            mask = [1.0] * len(self.skeleton.bones)
+        clip_index = self.clip_index(clip)
+        sampler = self.samplers[clip_index]
+        if mode == ADDITIVE_MODE:
+            if clip_index not in self._additive_samplers:
+                self._additive_samplers[clip_index] = sampler.additive()
+            sampler = self._additive_samplers[clip_index]
+        layer = MeruBlendLayer(sampler, mode, mask, loop)
+        layer.times = [0.0] * self.instance_count
+        layer.weights = [weight] * self.instance_count
+        layer.speeds = [1.0] * self.instance_count
+        self.layers.append(layer)
+        return layer
+
+    def add_instances(self, count=1, weights=None):
+        # weights optionally gives every layer's starting weight.
+        first = self.instance_count
+        for layer_index, layer in enumerate(self.layers):
+            weight = 1.0 if weights is None else weights[layer_index]
+            layer.times.extend([0.0] * count)
+            layer.weights.extend([weight] * count)
+            layer.speeds.extend([1.0] * count)
+        self.instance_count += count
+        return range(first, self.instance_count)
+
+    def tick(self, delta):
+        for layer in self.layers:
+            layer.advance(delta)
+        return self.evaluate()
+
+    def evaluate(self):
+        count = self.instance_count
+        bone_count = len(self.skeleton.bones)
+        sums = [None] * bone_count
+        totals = [None] * bone_count
+
+        for layer in self.layers:
+            if layer.mode != BLEND_MODE or not any(layer.weights):
+                continue
+            pose = layer.sampler.sample(layer.times, layer.bones, self.bind)
+            for bone_index in layer.bones:
+                weights = layer.bone_weights(bone_index)
+                translation, rotation, scale = pose[bone_index]
+                summed = sums[bone_index]
+                if summed is None:
+                    sums[bone_index] = [_scale_columns(component, weights)
+                        for component in pose[bone_index]]
+                    totals[bone_index] = weights
+                    continue
+
+                # Rotations are summed on the hemisphere of the sum so far.
+                dots = _dot4(rotation, summed[ROTATION])
+                if min(dots) < 0.0:
+                    rotation = _flip(rotation, list(map(math.copysign,
+                        repeat(1.0), dots)))
+                sums[bone_index] = [[list(map(_add, total, map(_mul, column,
+                    weights))) for total, column in zip(summed_component,
+                    component)] for summed_component, component in
+                    zip(summed, [translation, rotation, scale])]
+                totals[bone_index] = list(map(_add, totals[bone_index],
+                    weights))
+
+        poses = []
+        for bone_index in range(bone_count):
+            bind = self.bind[bone_index]
+            summed = sums[bone_index]
+            if summed is None:
+                poses.append([_constant(value, count) for value in bind])
+                continue
+
+            # Instances without any weight on the bone fall back to the
+            # bind pose. Rotations only need normalizing.
+            divisors = totals[bone_index]
+            if min(divisors) <= 0.0:
+                empty = list(map(float, map(operator.le, divisors,
+                    repeat(0.0))))
+                divisors = list(map(_add, divisors, empty))
+                summed = [[list(map(_add, column, map(_mul, empty,
+                    repeat(value)))) for column, value in zip(component,
+                    bind_value)] for component, bind_value in
+                    zip(summed, bind)]
+            poses.append([
+                [list(map(operator.truediv, column, divisors))
+                    for column in summed[TRANSLATION]],
+                _normalize4(*summed[ROTATION]),
+                [list(map(operator.truediv, column, divisors))
+                    for column in summed[SCALE]]])
+
+        for layer in self.layers:
+            if layer.mode == ADDITIVE_MODE and any(layer.weights):
+                self._add_layer(layer, poses)
+        return MeruPoseBatch(self.skeleton, poses)
+
+    def _add_layer(self, layer, poses):
+        # The layer's sampler holds offsets from its first frame, scaled
+        # by the weight they blend in from no offset at all.
+        pose = layer.sampler.sample(layer.times, layer.bones)
+        full = min(layer.weights) == 1.0 == max(layer.weights)
+        for bone_index in layer.bones:
+            translation, rotation, scale = pose[bone_index]
+            weights = layer.bone_weights(bone_index)
+            weighted = not full or layer.mask[bone_index] != 1.0
+            target = poses[bone_index]
+            if translation is not None:
+                if weighted:
+                    translation = _scale_columns(translation, weights)
+                target[TRANSLATION] = [list(map(_add, out, column))
+                    for out, column in zip(target[TRANSLATION], translation)]
+            if rotation is not None:
+                if weighted:
+                    if min(rotation[3]) < 0.0:
+                        rotation = _flip(rotation, list(map(math.copysign,
+                            repeat(1.0), rotation[3])))
+                    rotation = _scale_columns(rotation[:3], weights) + \
+                        [list(map(_add, repeat(1.0), map(_mul, weights,
+                        map(_sub, rotation[3], repeat(1.0)))))]
+                target[ROTATION] = _normalize4(*_quat_multiply(
+                    target[ROTATION], rotation))
+            if scale is not None:
+                if weighted:
+                    scale = [list(map(_add, repeat(1.0), map(_mul, weights,
+                        map(_sub, column, repeat(1.0))))) for column in scale]
+                target[SCALE] = [list(map(_mul, out, column))
+                    for out, column in zip(target[SCALE], scale)]
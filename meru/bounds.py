@@ -0,0 +1,229 @@
+import math
+
+from .binding import MISSING_BONE, MeruPartBinding
+from .linear import MAT44_IDENTITY, mat44_multiply
+
+POSITION_ATTRIBUTE = "VERTEX_ATTRIB_POSITION"
+BLEND_WEIGHT_ATTRIBUTE = "VERTEX_ATTRIB_BLEND_WEIGHT"
+BLEND_INDEX_ATTRIBUTE = "VERTEX_ATTRIB_BLEND_INDEX"
+AABB_TOLERANCE = 1e-5
+
+# Boxes are flat [min_x, min_y, min_z, max_x, max_y, max_z] lists, an
+# empty box has its minimum above its maximum.
+EMPTY_AABB = (math.inf, math.inf, math.inf, -math.inf, -math.inf, -math.inf)
+
+
+class MeruAabbMismatch:
+    def __init__(self, mesh_id, stored, computed):
+        self.mesh_id = mesh_id
+        self.stored = stored
+        self.computed = computed
+
+
+def is_empty(aabb):
+    return aabb[0] > aabb[3]
+
+
+def merge_aabbs(aabbs):
+    merged = list(EMPTY_AABB)
+    for aabb in aabbs:
+        if is_empty(aabb):
+            continue
+        merged = [min(merged[0], aabb[0]), min(merged[1], aabb[1]),
+            min(merged[2], aabb[2]), max(merged[3], aabb[3]),
+            max(merged[4], aabb[4]), max(merged[5], aabb[5])]
+    return merged
+
+
+def _position_columns(vertex_array):
+    return [vertex_array.get_attribute_column(POSITION_ATTRIBUTE, axis)
+        for axis in range(3)]
+
+
+def compute_aabb(vertex_array, indices=None):
+    columns = _position_columns(vertex_array)
+    if indices is not None:
+        used = sorted(set(indices))
+        columns = [[column[index] for index in used] for column in columns]
+    if not columns[0]:
+        return list(EMPTY_AABB)
+    return [min(columns[0]), min(columns[1]), min(columns[2]),
+        max(columns[0]), max(columns[1]), max(columns[2])]
+
+
+def compute_mesh_aabbs(meshes):
+    return [compute_aabb(mesh.vertex_array, mesh.indices) for mesh in meshes]
+
+
+def recompute_mesh_aabbs(meshes):
+    for mesh, aabb in zip(meshes, compute_mesh_aabbs(meshes)):
+        mesh.aabb = aabb
+
+
+def validate_mesh_aabbs(meshes, tolerance=AABB_TOLERANCE):
+    mismatches = []
+    for mesh, computed in zip(meshes, compute_mesh_aabbs(meshes)):
+        stored = list(mesh.aabb)
+        if len(stored) != 6 or any(abs(a - b) > tolerance
+        for a, b in zip(stored, computed)):
+            mismatches.append(MeruAabbMismatch(mesh.id, stored, computed))
+    return mismatches
+
+
+def transform_aabb(aabb, matrix):
+    if is_empty(aabb):
+        return list(aabb)
+
+    # Arvo's method, each output axis picks whichever box extreme
+    # maximizes or minimizes every matrix term.
+    result = [matrix[12], matrix[13], matrix[14],
+        matrix[12], matrix[13], matrix[14]]
+    for row in range(3):
+        for column in range(3):
+            factor = matrix[column * 4 + row]
+            a = factor * aabb[column]
+            b = factor * aabb[column + 3]
+            if a < b:
+                result[row] += a
+                result[row + 3] += b
+            else:
+                result[row] += b
+                result[row + 3] += a
+    return result
+
+
+def transform_aabbs(aabb, matrices):
+    return [transform_aabb(aabb, matrix) for matrix in matrices]
+
+
+def _influence_boxes(vertex_array, indices, palette_size):
+    # Bind space box of the vertices every palette slot influences.
+    columns = _position_columns(vertex_array)
+    weights = [vertex_array.get_attribute_column(BLEND_WEIGHT_ATTRIBUTE, i)
+        for i in range(4)]
+    slots = [vertex_array.get_attribute_column(BLEND_INDEX_ATTRIBUTE, i)
+        for i in range(4)]
+
+    members = [[] for i in range(palette_size)]
+    for vertex in sorted(set(indices)):
+        for influence in range(4):
+            if weights[influence][vertex] > 0.0:
+                slot = int(slots[influence][vertex])
+                if 0 <= slot < palette_size:
+                    members[slot].append(vertex)
+
+    boxes = []
+    for vertices in members:
+        if not vertices:
+            boxes.append(list(EMPTY_AABB))
+            continue
+        xs = [columns[0][vertex] for vertex in vertices]
+        ys = [columns[1][vertex] for vertex in vertices]
+        zs = [columns[2][vertex] for vertex in vertices]
+        boxes.append([min(xs), min(ys), min(zs), max(xs), max(ys), max(zs)])
+    return boxes
+
+
+def skinned_bounds(mesh, node_part, skeleton, world_frames, binding=None):
+    if binding is None:
+        binding = MeruPartBinding(skeleton, node_part)
+    boxes = _influence_boxes(mesh.vertex_array, mesh.indices,
+        len(binding.palette))
+
+    # Each slot's box is moved by its skin matrix; the union bounds every
+    # blend of those transforms, so the result is conservative.
+    frames = []
+    for worlds in world_frames:
+        transformed = []
+        for bone_index, inv_bind_pos, box in zip(binding.palette,
+        binding.inv_bind_poses, boxes):
+            if bone_index == MISSING_BONE or is_empty(box):
+                continue
+            skin = mat44_multiply(worlds[bone_index], inv_bind_pos)
+            transformed.append(transform_aabb(box, skin))
+        frames.append(merge_aabbs(transformed))
+    return frames
+
+
+class MeruNodeBounds:
+    def __init__(self, node, world_transform):
+        self.node = node
+        self.world_transform = world_transform
+        self.aabb = list(EMPTY_AABB)
+        self.subtree_aabb = list(EMPTY_AABB)
+        self.children = []
+
+
+def node_bounds(nodes, meshes, root_transform=MAT44_IDENTITY):
+    mesh_aabbs = {}
+    for mesh in meshes:
+        mesh_aabbs[mesh.id] = mesh.aabb if len(mesh.aabb) == 6 else \
+            compute_aabb(mesh.vertex_array, mesh.indices)
+
+    # Walk down computing world transforms, then fold the boxes back up
+    # in reverse visiting order.
+    roots = []
+    visited = []
+    stack = [(node, list(root_transform), None) for node in reversed(nodes)]
+    while stack:
+        node, parent_transform, parent = stack.pop()
+        world = mat44_multiply(parent_transform, node.transform.unpack())
+        bounds = MeruNodeBounds(node, world)
+        bounds.aabb = merge_aabbs([transform_aabb(mesh_aabbs[part.mesh_id],
+            world) for part in node.parts if part.mesh_id in mesh_aabbs])
+        if parent is None:
+            roots.append(bounds)
+        else:
+            parent.children.append(bounds)
+        visited.append(bounds)
+        for child in reversed(node.children):
+            stack.append((child, world, bounds))
+
+    for bounds in reversed(visited):
+        bounds.subtree_aabb = merge_aabbs([bounds.aabb] +
+            [child.subtree_aabb for child in bounds.children])
+    return roots
+
+
+def frustum_planes(view_projection):
+    # Gribb/Hartmann plane extraction, planes face inwards.
+    m = view_projection
+    rows = [(m[i], m[4 + i], m[8 + i], m[12 + i]) for i in range(4)]
+    planes = []
+    for row in range(3):
+        for sign in (1.0, -1.0):
+            plane = [rows[3][i] + sign * rows[row][i] for i in range(4)]
+            length = math.sqrt(plane[0] ** 2 + plane[1] ** 2 + plane[2] ** 2)
+            if length > 0.0:
+                plane = [value / length for value in plane]
+            planes.append(plane)
+    return planes
+
+
+def cull_aabbs(planes, aabbs):
+    # aabbs is a flat list with six values per box. Boxes are tested
+    # plane by plane as whole columns; only survivors reach the next plane.
+    visible = list(range(len(aabbs) // 6))
+    min_x = aabbs[0::6]
+    min_y = aabbs[1::6]
+    min_z = aabbs[2::6]
+    max_x = aabbs[3::6]
+    max_y = aabbs[4::6]
+    max_z = aabbs[5::6]
+    for a, b, c, d in planes:
+        # The corner furthest along the plane normal decides.
+        xs = max_x if a >= 0.0 else min_x
+        ys = max_y if b >= 0.0 else min_y
+        zs = max_z if c >= 0.0 else min_z
+        visible = [i for i in visible
+            if a * xs[i] + b * ys[i] + c * zs[i] + d >= 0.0]
+        if not visible:
+            break
+    return visible
+
+
+def cull_instances(planes, aabb, instance_matrices):
+    flat = []
+    for box in transform_aabbs(aabb, instance_matrices):
+        flat.extend(box)
+    return cull_aabbs(planes, flat)
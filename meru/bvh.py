@@ -0,0 +1,515 @@
+import array
+import math
+import struct
+import sys
+
+BVH_MAGIC = b"MBVH"
+BVH_VERSION = 1
+BVH_LEAF_SIZE = 4
+BVH_BIN_COUNT = 16
+BVH_EPSILON = 1e-9
+
+# Stand-in for 1 / 0 in the slab test, a finite value keeps 0 * inverse
+# from turning into nan for rays starting on a box plane.
+BVH_INVERSE_ZERO = 1e300
+
+# Relative cost of a ray/box test against a ray/triangle test for the
+# surface area heuristic.
+BVH_TRAVERSAL_COST = 1.0
+BVH_INTERSECTION_COST = 1.0
+
+
+class MeruRayHit:
+    def __init__(self, t, triangle, u, v):
+        self.t = t
+        self.triangle = triangle
+        self.u = u
+        self.v = v
+
+
+def _surface_area(min_x, min_y, min_z, max_x, max_y, max_z):
+    dx = max_x - min_x
+    dy = max_y - min_y
+    dz = max_z - min_z
+    if dx < 0:
+        return 0.0
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+
+def _closest_point_on_triangle(px, py, pz, coords, base):
+    # Ericson, Real-Time Collision Detection 5.1.5.
+    ax, ay, az = coords[base], coords[base + 1], coords[base + 2]
+    bx, by, bz = coords[base + 3], coords[base + 4], coords[base + 5]
+    cx, cy, cz = coords[base + 6], coords[base + 7], coords[base + 8]
+    abx, aby, abz = bx - ax, by - ay, bz - az
+    acx, acy, acz = cx - ax, cy - ay, cz - az
+    apx, apy, apz = px - ax, py - ay, pz - az
+    d1 = abx * apx + aby * apy + abz * apz
+    d2 = acx * apx + acy * apy + acz * apz
+    if d1 <= 0.0 and d2 <= 0.0:
+        return ax, ay, az
+
+    bpx, bpy, bpz = px - bx, py - by, pz - bz
+    d3 = abx * bpx + aby * bpy + abz * bpz
+    d4 = acx * bpx + acy * bpy + acz * bpz
+    if d3 >= 0.0 and d4 <= d3:
+        return bx, by, bz
+
+    vc = d1 * d4 - d3 * d2
+    if vc <= 0.0 and d1 >= 0.0 and d3 <= 0.0:
+        v = d1 / (d1 - d3)
+        return ax + v * abx, ay + v * aby, az + v * abz
+
+    cpx, cpy, cpz = px - cx, py - cy, pz - cz
+    d5 = abx * cpx + aby * cpy + abz * cpz
+    d6 = acx * cpx + acy * cpy + acz * cpz
+    if d6 >= 0.0 and d5 <= d6:
+        return cx, cy, cz
+
+    vb = d5 * d2 - d1 * d6
+    if vb <= 0.0 and d2 >= 0.0 and d6 <= 0.0:
+        w = d2 / (d2 - d6)
+        return ax + w * acx, ay + w * acy, az + w * acz
+
+    va = d3 * d6 - d5 * d4
+    if va <= 0.0 and (d4 - d3) >= 0.0 and (d5 - d6) >= 0.0:
+        w = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        return (bx + w * (cx - bx), by + w * (cy - by), bz + w * (cz - bz))
+
+    denom = 1.0 / (va + vb + vc)
+    v = vb * denom
+    w = vc * denom
+    return (ax + abx * v + acx * w, ay + aby * v + acy * w,
+        az + abz * v + acz * w)
+
+
+class MeruBvh:
+    def __init__(self):
+        # Flat node arrays, node i's bounds are node_bounds[i * 6:i * 6 + 6].
+        # Leaves have a non-zero count and reference node_start into
+        # triangle_order, interior nodes keep their left child at i + 1 and
+        # their right child in node_right.
+        self.node_bounds = array.array("d")
+        self.node_right = array.array("i")
+        self.node_start = array.array("i")
+        self.node_count = array.array("i")
+        self.triangle_order = array.array("i")
+
+        # Triangle corners, nine coordinates per triangle in input order.
+        self.coords = array.array("d")
+        self.mesh_offsets = array.array("i", [0])
+
+    def triangle_count(self):
+        return len(self.coords) // 9
+
+    def node_total(self):
+        return len(self.node_count)
+
+    def locate(self, triangle):
+        # Maps a global triangle id back to (mesh index, local triangle).
+        low = 0
+        high = len(self.mesh_offsets) - 1
+        while low < high - 1:
+            middle = (low + high) // 2
+            if self.mesh_offsets[middle] <= triangle:
+                low = middle
+            else:
+                high = middle
+        return low, triangle - self.mesh_offsets[low]
+
+    @classmethod
+    def from_meshes(self, meshes, leaf_size=BVH_LEAF_SIZE,
+    bin_count=BVH_BIN_COUNT):
+        coords = array.array("d")
+        offsets = array.array("i", [0])
+        for mesh in meshes:
+            indices = mesh.indices[:len(mesh.indices) // 3 * 3]
+            corners = array.array("d", [0.0]) * (len(indices) * 3)
+            for axis in range(3):
+                column = mesh.vertex_array.get_attribute_column(
+                    "VERTEX_ATTRIB_POSITION", axis)
+                corners[axis::3] = array.array("d",
+                    [column[index] for index in indices])
+            coords.extend(corners)
+            offsets.append(len(coords) // 9)
+        bvh = self.from_coords(coords, leaf_size, bin_count)
+        bvh.mesh_offsets = offsets
+        return bvh
+
+    @classmethod
+    def from_coords(self, coords, leaf_size=BVH_LEAF_SIZE,
+    bin_count=BVH_BIN_COUNT):
+        bvh = MeruBvh()
+        bvh.coords = array.array("d", coords)
+        bvh.mesh_offsets = array.array("i", [0, bvh.triangle_count()])
+        bvh._build(leaf_size, bin_count)
+        return bvh
+
+    def _build(self, leaf_size, bin_count):
+        coords = self.coords
+        triangle_count = self.triangle_count()
+        self.triangle_order = array.array("i", range(triangle_count))
+        order = self.triangle_order
+
+        # Per triangle bounds and centroids as flat columns.
+        x0, y0, z0 = coords[0::9], coords[1::9], coords[2::9]
+        x1, y1, z1 = coords[3::9], coords[4::9], coords[5::9]
+        x2, y2, z2 = coords[6::9], coords[7::9], coords[8::9]
+        min_x = array.array("d", map(min, x0, x1, x2))
+        min_y = array.array("d", map(min, y0, y1, y2))
+        min_z = array.array("d", map(min, z0, z1, z2))
+        max_x = array.array("d", map(max, x0, x1, x2))
+        max_y = array.array("d", map(max, y0, y1, y2))
+        max_z = array.array("d", map(max, z0, z1, z2))
+        del x0, y0, z0, x1, y1, z1, x2, y2, z2
+        centroids = (
+            array.array("d", [(a + b) * 0.5 for a, b in zip(min_x, max_x)]),
+            array.array("d", [(a + b) * 0.5 for a, b in zip(min_y, max_y)]),
+            array.array("d", [(a + b) * 0.5 for a, b in zip(min_z, max_z)]))
+        bounds = (min_x, min_y, min_z, max_x, max_y, max_z)
+
+        if triangle_count == 0:
+            return
+
+        stack = [(0, triangle_count, -1)]
+        while stack:
+            start, end, parent = stack.pop()
+            node = len(self.node_count)
+            if parent >= 0:
+                self.node_right[parent] = node
+
+            members = order[start:end]
+            node_bounds = [
+                min([min_x[i] for i in members]),
+                min([min_y[i] for i in members]),
+                min([min_z[i] for i in members]),
+                max([max_x[i] for i in members]),
+                max([max_y[i] for i in members]),
+                max([max_z[i] for i in members])]
+            self.node_bounds.extend(node_bounds)
+            self.node_right.append(-1)
+            self.node_start.append(start)
+            self.node_count.append(end - start)
+
+            count = end - start
+            if count <= leaf_size:
+                continue
+            split = self._find_split(members, centroids, bounds, node_bounds,
+                bin_count)
+            if split is None:
+                continue
+
+            left, right = split
+            order[start:end] = array.array("i", left + right)
+            self.node_count[node] = 0
+            middle = start + len(left)
+            stack.append((middle, end, node))
+            stack.append((start, middle, -1))
+
+    def _find_split(self, members, centroids, bounds, node_bounds,
+    bin_count):
+        count = len(members)
+        parent_area = _surface_area(*node_bounds)
+        if parent_area <= 0.0:
+            return None
+        min_x, min_y, min_z, max_x, max_y, max_z = bounds
+
+        # Bin along the axis with the widest centroid spread only.
+        best_extent = 0.0
+        for axis in range(3):
+            centroid_axis = centroids[axis]
+            axis_values = [centroid_axis[i] for i in members]
+            axis_low = min(axis_values)
+            extent = max(axis_values) - axis_low
+            if extent > best_extent:
+                best_extent = extent
+                values = axis_values
+                low = axis_low
+        if best_extent <= BVH_EPSILON:
+            return None
+
+        scale = bin_count / best_extent
+        last_bin = bin_count - 1
+        bins = [[] for i in range(bin_count)]
+        for i, value in zip(members, values):
+            bins[min(last_bin, int((value - low) * scale))].append(i)
+        bin_bounds = []
+        for members_in_bin in bins:
+            if members_in_bin:
+                bin_bounds.append([
+                    min([min_x[i] for i in members_in_bin]),
+                    min([min_y[i] for i in members_in_bin]),
+                    min([min_z[i] for i in members_in_bin]),
+                    max([max_x[i] for i in members_in_bin]),
+                    max([max_y[i] for i in members_in_bin]),
+                    max([max_z[i] for i in members_in_bin])])
+            else:
+                bin_bounds.append([math.inf, math.inf, math.inf, -math.inf,
+                    -math.inf, -math.inf])
+
+        # Sweep from the right to get suffix areas, then from the left
+        # evaluating the SAH for every bin boundary.
+        right_areas = [0.0] * bin_count
+        right_counts = [0] * bin_count
+        box = [math.inf, math.inf, math.inf, -math.inf, -math.inf, -math.inf]
+        total = 0
+        for index in range(last_bin, 0, -1):
+            box = self._merge(box, bin_bounds[index])
+            total += len(bins[index])
+            right_areas[index] = _surface_area(*box)
+            right_counts[index] = total
+
+        best_split = -1
+        best_cost = count * BVH_INTERSECTION_COST
+        box = [math.inf, math.inf, math.inf, -math.inf, -math.inf, -math.inf]
+        total = 0
+        for index in range(last_bin):
+            box = self._merge(box, bin_bounds[index])
+            total += len(bins[index])
+            if total == 0 or right_counts[index + 1] == 0:
+                continue
+            cost = BVH_TRAVERSAL_COST + BVH_INTERSECTION_COST * (
+                total * _surface_area(*box) +
+                right_counts[index + 1] * right_areas[index + 1]
+            ) / parent_area
+            if cost < best_cost:
+                best_cost = cost
+                best_split = index
+        if best_split < 0:
+            return None
+
+        left = []
+        right = []
+        for index, members_in_bin in enumerate(bins):
+            if index <= best_split:
+                left.extend(members_in_bin)
+            else:
+                right.extend(members_in_bin)
+        return left, right
+
+    @staticmethod
+    def _merge(box, other):
+        return [min(box[0], other[0]), min(box[1], other[1]),
+            min(box[2], other[2]), max(box[3], other[3]),
+            max(box[4], other[4]), max(box[5], other[5])]
+
+    def intersect_ray(self, origin, direction, t_max=math.inf,
+    any_hit=False):
+        return self.intersect_rays(origin, direction, t_max, any_hit)[0]
+
+    def intersect_rays(self, origins, directions, t_max=math.inf,
+    any_hit=False):
+        hits = []
+        if not self.node_count:
+            return [None] * (len(origins) // 3)
+
+        bounds = self.node_bounds
+        right = self.node_right
+        starts = self.node_start
+        counts = self.node_count
+        order = self.triangle_order
+        coords = self.coords
+        for ray in range(len(origins) // 3):
+            ox, oy, oz = origins[ray * 3:ray * 3 + 3]
+            dx, dy, dz = directions[ray * 3:ray * 3 + 3]
+            inv_x = 1.0 / dx if dx != 0.0 else BVH_INVERSE_ZERO
+            inv_y = 1.0 / dy if dy != 0.0 else BVH_INVERSE_ZERO
+            inv_z = 1.0 / dz if dz != 0.0 else BVH_INVERSE_ZERO
+            closest = t_max
+            hit = None
+
+            stack = [0]
+            while stack:
+                node = stack.pop()
+                base = node * 6
+                # Slab test.
+                t0 = (bounds[base] - ox) * inv_x
+                t1 = (bounds[base + 3] - ox) * inv_x
+                near = min(t0, t1)
+                far = max(t0, t1)
+                t0 = (bounds[base + 1] - oy) * inv_y
+                t1 = (bounds[base + 4] - oy) * inv_y
+                near = max(near, min(t0, t1))
+                far = min(far, max(t0, t1))
+                t0 = (bounds[base + 2] - oz) * inv_z
+                t1 = (bounds[base + 5] - oz) * inv_z
+                near = max(near, min(t0, t1))
+                far = min(far, max(t0, t1))
+                if near > far or far < 0.0 or near > closest:
+                    continue
+
+                count = counts[node]
+                if count == 0:
+                    stack.append(right[node])
+                    stack.append(node + 1)
+                    continue
+
+                for position in range(starts[node], starts[node] + count):
+                    triangle = order[position]
+                    c = triangle * 9
+                    # Moller-Trumbore.
+                    e1x = coords[c + 3] - coords[c]
+                    e1y = coords[c + 4] - coords[c + 1]
+                    e1z = coords[c + 5] - coords[c + 2]
+                    e2x = coords[c + 6] - coords[c]
+                    e2y = coords[c + 7] - coords[c + 1]
+                    e2z = coords[c + 8] - coords[c + 2]
+                    px = dy * e2z - dz * e2y
+                    py = dz * e2x - dx * e2z
+                    pz = dx * e2y - dy * e2x
+                    det = e1x * px + e1y * py + e1z * pz
+                    if -BVH_EPSILON < det < BVH_EPSILON:
+                        continue
+                    inv_det = 1.0 / det
+                    sx = ox - coords[c]
+                    sy = oy - coords[c + 1]
+                    sz = oz - coords[c + 2]
+                    u = (sx * px + sy * py + sz * pz) * inv_det
+                    if u < 0.0 or u > 1.0:
+                        continue
+                    qx = sy * e1z - sz * e1y
+                    qy = sz * e1x - sx * e1z
+                    qz = sx * e1y - sy * e1x
+                    v = (dx * qx + dy * qy + dz * qz) * inv_det
+                    if v < 0.0 or u + v > 1.0:
+                        continue
+                    t = (e2x * qx + e2y * qy + e2z * qz) * inv_det
+                    if 0.0 <= t < closest:
+                        closest = t
+                        hit = MeruRayHit(t, triangle, u, v)
+                if any_hit and hit is not None:
+                    break
+            hits.append(hit)
+        return hits
+
+    def closest_point(self, point, max_distance=math.inf):
+        return self.closest_points(point, max_distance)[0]
+
+    def closest_points(self, points, max_distance=math.inf):
+        results = []
+        bounds = self.node_bounds
+        right = self.node_right
+        starts = self.node_start
+        counts = self.node_count
+        order = self.triangle_order
+        coords = self.coords
+        for index in range(len(points) // 3):
+            px, py, pz = points[index * 3:index * 3 + 3]
+            best_distance = max_distance * max_distance
+            best = None
+
+            stack = [(0.0, 0)] if counts else []
+            while stack:
+                box_distance, node = stack.pop()
+                if box_distance >= best_distance:
+                    continue
+
+                count = counts[node]
+                if count == 0:
+                    # Descend into the nearer child first so the search
+                    # radius shrinks early.
+                    children = []
+                    for child in (node + 1, right[node]):
+                        base = child * 6
+                        dx = max(bounds[base] - px, 0.0,
+                            px - bounds[base + 3])
+                        dy = max(bounds[base + 1] - py, 0.0,
+                            py - bounds[base + 4])
+                        dz = max(bounds[base + 2] - pz, 0.0,
+                            pz - bounds[base + 5])
+                        children.append((dx * dx + dy * dy + dz * dz, child))
+                    if children[0][0] < children[1][0]:
+                        children.reverse()
+                    stack.extend(children)
+                    continue
+                for position in range(starts[node], starts[node] + count):
+                    triangle = order[position]
+                    cx, cy, cz = _closest_point_on_triangle(px, py, pz,
+                        coords, triangle * 9)
+                    distance = ((cx - px) ** 2 + (cy - py) ** 2 +
+                        (cz - pz) ** 2)
+                    if distance < best_distance:
+                        best_distance = distance
+                        best = (math.sqrt(distance), triangle, (cx, cy, cz))
+            results.append(best)
+        return results
+
+    def query_aabb(self, box):
+        found = []
+        if not self.node_count:
+            return found
+        min_x, min_y, min_z, max_x, max_y, max_z = box
+        bounds = self.node_bounds
+        coords = self.coords
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            base = node * 6
+            if (bounds[base] > max_x or bounds[base + 3] < min_x or
+            bounds[base + 1] > max_y or bounds[base + 4] < min_y or
+            bounds[base + 2] > max_z or bounds[base + 5] < min_z):
+                continue
+            count = self.node_count[node]
+            if count == 0:
+                stack.append(self.node_right[node])
+                stack.append(node + 1)
+                continue
+            start = self.node_start[node]
+            for triangle in self.triangle_order[start:start + count]:
+                c = triangle * 9
+                xs = coords[c:c + 9:3]
+                ys = coords[c + 1:c + 9:3]
+                zs = coords[c + 2:c + 9:3]
+                if (min(xs) <= max_x and max(xs) >= min_x and
+                min(ys) <= max_y and max(ys) >= min_y and
+                min(zs) <= max_z and max(zs) >= min_z):
+                    found.append(triangle)
+        return sorted(found)
+
+    def to_bytes(self):
+        arrays = [self.node_bounds, self.node_right, self.node_start,
+            self.node_count, self.triangle_order, self.coords,
+            self.mesh_offsets]
+        header = BVH_MAGIC + struct.pack("<I7I", BVH_VERSION,
+            *[len(values) for values in arrays])
+        chunks = [header]
+        for values in arrays:
+            if sys.byteorder == "big":
+                values = array.array(values.typecode, values)
+                values.byteswap()
+            chunks.append(values.tobytes())
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(self, _bytes):
+        if _bytes[:4] != BVH_MAGIC:
+            raise ValueError("Not a serialized bvh.")
+        version = struct.unpack_from("<I", _bytes, 4)[0]
+        if version != BVH_VERSION:
+            raise ValueError("Unsupported bvh version {0}.".format(version))
+        lengths = struct.unpack_from("<7I", _bytes, 8)
+
+        bvh = MeruBvh()
+        names = ["node_bounds", "node_right", "node_start", "node_count",
+            "triangle_order", "coords", "mesh_offsets"]
+        offset = 8 + 7 * 4
+        for name, length in zip(names, lengths):
+            values = array.array(getattr(bvh, name).typecode)
+            size = values.itemsize * length
+            values.frombytes(_bytes[offset:offset + size])
+            if len(values) != length:
+                raise ValueError("Truncated bvh.")
+            if sys.byteorder == "big":
+                values.byteswap()
+            setattr(bvh, name, values)
+            offset += size
+        return bvh
+
+    def save(self, filename):
+        with open(filename, "wb") as _file:
+            _file.write(self.to_bytes())
+
+    @classmethod
+    def load(self, filename):
+        with open(filename, "rb") as _file:
+            return self.from_bytes(_file.read())
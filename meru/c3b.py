@@ -1,5 +1,13 @@
-from .binary import BinaryReader, Endian
-from .linear import Mat44, Vec4, Vec3, Vec2
+import array
+import hashlib
+import sys
+import weakref
+import zipfile
+
+from .binary import (ARRAY_TYPECODES, BinaryReader, BinaryWriter, Endian,
+FLOAT32_FORMAT, UINT8_FORMAT, UINT16_FORMAT, dump_array_from_format,
+parse_typed_array_from_format)
+from .linear import MAT44_IDENTITY, Mat44, Vec4, Vec3, Vec2, mat44_multiply
 
 C3B_SIGNATURE = "C3B\0"
 C3B_SIGNATURE_LENGTH = 4
@@ -27,11 +35,22 @@ class C3bType:
         SCENE, NODES, ANIMATIONS, ANIMATION, ANIMATION_CHANNEL, MODEL,
         MATERIALS, EFFECT, CAMERA, LIGHT, MESHES, MESH_PART, MESH_SKIN
     ]
+    NAMES = {
+        SCENE: "SCENE", NODES: "NODES", ANIMATIONS: "ANIMATIONS",
+        ANIMATION: "ANIMATION", ANIMATION_CHANNEL: "ANIMATION_CHANNEL",
+        MODEL: "MODEL", MATERIALS: "MATERIALS", EFFECT: "EFFECT",
+        CAMERA: "CAMERA", LIGHT: "LIGHT", MESHES: "MESHES",
+        MESH_PART: "MESH_PART", MESH_SKIN: "MESH_SKIN"
+    }
 
     @classmethod
     def is_valid(self, value):
         return value in self.TYPES
 
+    @classmethod
+    def name(self, value):
+        return self.NAMES.get(value, str(value))
+
 
 class C3bReference:
     def __init__(self, id, _type, offset):
@@ -56,11 +75,15 @@ class C3bMesh:
         self.indices = []
         self.aabb = []
 
+    def indices_to_bytes(self, endianness=Endian.LITTLE):
+        return dump_array_from_format(UINT16_FORMAT, self.indices, endianness)
+
 
 class C3bVertexArray:
     def __init__(self):
         self.attributes = []
         self.values = []
+        self.typed = False
 
     def values_per_vertex(self):
         value_count = 0
@@ -71,16 +94,64 @@ class C3bVertexArray:
     def vertex_count(self):
         return int(len(self.values) / self.values_per_vertex())
 
-    def get_attribute_vertices(self, attrib_name):
+    def has_attribute(self, attrib_name):
+        return any(attrib.name == attrib_name for attrib in self.attributes)
+
+    def get_attribute_offset(self, attrib_name):
         value_offset = 0
         for attrib in self.attributes:
             if attrib.name == attrib_name:
-                matched_attrib = attrib
-                break
-            else:
-                value_offset += attrib.value_count
-        else:
-            raise ValueError("No attribute named {0}.".format(attrib_name))
+                return attrib, value_offset
+            value_offset += attrib.value_count
+        raise ValueError("No attribute named {0}.".format(attrib_name))
+
+    def get_attribute_column(self, attrib_name, component):
+        attrib, value_offset = self.get_attribute_offset(attrib_name)
+        assert component < attrib.value_count
+        stride = self.values_per_vertex()
+        return self.values[value_offset + component::stride]
+
+    def apply_attribute_types(self):
+        # Float arrays cannot hold the converted ints, values become a list
+        # when any attribute is integral.
+        self.typed = True
+        if not any(attrib.is_integral() for attrib in self.attributes):
+            return
+        if not isinstance(self.values, list):
+            self.values = list(self.values)
+        stride = self.values_per_vertex()
+        value_offset = 0
+        for attrib in self.attributes:
+            if attrib.is_integral():
+                for component in range(attrib.value_count):
+                    start = value_offset + component
+                    self.values[start::stride] = [int(value)
+                        for value in self.values[start::stride]]
+            value_offset += attrib.value_count
+
+    def stride(self):
+        return self.values_per_vertex() * 4
+
+    def get_attribute_byte_offset(self, attrib_name):
+        return self.get_attribute_offset(attrib_name)[1] * 4
+
+    def to_bytes(self, endianness=Endian.LITTLE):
+        return dump_array_from_format(FLOAT32_FORMAT, self.values, endianness)
+
+    def get_attribute_bytes(self, attrib_name, frmt=FLOAT32_FORMAT,
+    endianness=Endian.LITTLE):
+        attrib, value_offset = self.get_attribute_offset(attrib_name)
+        stride = self.values_per_vertex()
+        values = [0] * (self.vertex_count() * attrib.value_count)
+        for component in range(attrib.value_count):
+            column = self.values[value_offset + component::stride]
+            if frmt != FLOAT32_FORMAT:
+                column = [int(value) for value in column]
+            values[component::attrib.value_count] = column
+        return dump_array_from_format(frmt, values, endianness)
+
+    def get_attribute_vertices(self, attrib_name):
+        matched_attrib, value_offset = self.get_attribute_offset(attrib_name)
 
         attrib_vertices = []
         stride = self.values_per_vertex()
@@ -108,6 +179,10 @@ class C3bVertexArray:
         return self._get_vec4("VERTEX_ATTRIB_BLEND_WEIGHT")
 
     def get_blend_indices(self):
+        attrib, value_offset = self.get_attribute_offset(
+            "VERTEX_ATTRIB_BLEND_INDEX")
+        if self.typed and attrib.is_integral():
+            return self._get_vec4("VERTEX_ATTRIB_BLEND_INDEX")
         formatted_indices = []
         for _vec4 in self._get_vec4("VERTEX_ATTRIB_BLEND_INDEX"):
             formatted_indices.append(Vec4(int(_vec4.x), int(_vec4.y),
@@ -129,15 +204,29 @@ class C3bVertexArray:
 
 
 class C3bVertexAttribute:
+    INTEGRAL_TYPES = [
+        "GL_BYTE", "GL_UNSIGNED_BYTE", "GL_SHORT", "GL_UNSIGNED_SHORT",
+        "GL_INT", "GL_UNSIGNED_INT"
+    ]
+
     def __init__(self, value_count, _type, name):
         self.value_count = value_count
         self.type = _type
         self.name = name
 
+    def is_integral(self):
+        return self.type in self.INTEGRAL_TYPES
+
 
 class C3bMaterial:
     def __init__(self, _id):
         self.id = _id
+        self.diffuse = Vec3(1.0, 1.0, 1.0)
+        self.ambient = Vec3(1.0, 1.0, 1.0)
+        self.emissive = Vec3(0.0, 0.0, 0.0)
+        self.opacity = 1.0
+        self.specular = Vec3(0.0, 0.0, 0.0)
+        self.shininess = 0.0
         self.textures = []
 
 
@@ -148,6 +237,8 @@ class C3bTexture:
         self.type = _type
         self.wrap_u = wrap_u
         self.wrap_v = wrap_v
+        self.uv_translation = Vec2(0.0, 0.0)
+        self.uv_scale = Vec2(1.0, 1.0)
 
 
 class C3bNode:
@@ -181,11 +272,18 @@ class MeruSkeleton:
         return filtered[0]
 
     def _parse_bone(self, node, parent):
-        bone = MeruBone(node.id, self._next_index(), node.transform, parent)
-        self.bones.append(bone)
-        for child in node.children:
-            self._parse_bone(child, bone)
-        return bone
+        root = None
+        stack = [(node, parent)]
+        while stack:
+            node, parent = stack.pop()
+            bone = MeruBone(node.id, self._next_index(), node.transform,
+                parent)
+            self.bones.append(bone)
+            if root is None:
+                root = bone
+            for child in reversed(node.children):
+                stack.append((child, bone))
+        return root
 
     def _next_index(self):
         index = self._index
@@ -193,6 +291,111 @@ class MeruSkeleton:
         return index
 
 
+class MeruNodeTable:
+    def __init__(self):
+        self.nodes = []
+        self.parents = array.array("i")
+        self.first_children = array.array("i")
+        self.next_siblings = array.array("i")
+        self.depths = array.array("i")
+        self.subtree_ends = array.array("i")
+        self.parts = []
+        self.part_starts = array.array("i")
+        self.part_counts = array.array("i")
+        self.indices = {}
+
+    @classmethod
+    def from_nodes(self, nodes):
+        table = MeruNodeTable()
+        last_children = []
+        last_root = -1
+
+        # Nodes are added depth first, so every subtree occupies the
+        # index range [index, subtree_ends[index]).
+        stack = [(node, -1, 0) for node in reversed(nodes)]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(table.nodes)
+            table.nodes.append(node)
+            table.parents.append(parent)
+            table.first_children.append(-1)
+            table.next_siblings.append(-1)
+            table.depths.append(depth)
+            table.subtree_ends.append(index + 1)
+            table.part_starts.append(len(table.parts))
+            table.part_counts.append(len(node.parts))
+            table.parts.extend(node.parts)
+            if node.id not in table.indices:
+                table.indices[node.id] = index
+            last_children.append(-1)
+
+            previous = last_root if parent < 0 else last_children[parent]
+            if previous >= 0:
+                table.next_siblings[previous] = index
+            elif parent >= 0:
+                table.first_children[parent] = index
+            if parent < 0:
+                last_root = index
+            else:
+                last_children[parent] = index
+
+            for child in reversed(node.children):
+                stack.append((child, index, depth + 1))
+
+        for index in range(len(table.nodes) - 1, -1, -1):
+            parent = table.parents[index]
+            if parent >= 0 and table.subtree_ends[index] > \
+            table.subtree_ends[parent]:
+                table.subtree_ends[parent] = table.subtree_ends[index]
+        return table
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def find(self, _id):
+        return self.indices.get(_id, -1)
+
+    def get(self, _id):
+        index = self.indices.get(_id)
+        return None if index is None else self.nodes[index]
+
+    def children(self, index):
+        child = self.first_children[index]
+        while child >= 0:
+            yield child
+            child = self.next_siblings[child]
+
+    def roots(self):
+        return [index for index, parent in enumerate(self.parents)
+            if parent < 0]
+
+    def ancestors(self, index):
+        parent = self.parents[index]
+        while parent >= 0:
+            yield parent
+            parent = self.parents[parent]
+
+    def is_ancestor(self, ancestor, index):
+        return ancestor < index < self.subtree_ends[ancestor]
+
+    def node_parts(self, index):
+        start = self.part_starts[index]
+        return self.parts[start:start + self.part_counts[index]]
+
+    def skeleton_roots(self):
+        return [index for index in self.roots()
+            if self.nodes[index].is_skeleton]
+
+    def world_transforms(self, root_transform=MAT44_IDENTITY):
+        # Parents always precede their children.
+        worlds = []
+        for node, parent in zip(self.nodes, self.parents):
+            parent_world = root_transform if parent < 0 else worlds[parent]
+            worlds.append(mat44_multiply(parent_world,
+                node.transform.unpack()))
+        return worlds
+
+
 class MeruBone:
     def __init__(self, _id, index, transform, parent=None):
         self.id = _id
@@ -206,6 +409,7 @@ class C3bNodePart:
         self.mesh_id = mesh_id
         self.material_id = material_id
         self.bones = []
+        self.uv_mapping = []
 
 
 class C3bBone:
@@ -219,17 +423,36 @@ class C3bAnimFlag:
     HAS_SCALE = (1 << 1)
     HAS_TRANSLATION = (1 << 2)
 
+    @classmethod
+    def value_count(self, flag):
+        return (4 if flag & self.HAS_ROTATION else 0) + \
+            (3 if flag & self.HAS_SCALE else 0) + \
+            (3 if flag & self.HAS_TRANSLATION else 0)
+
+
+# Float values following a keyframe, by its flag byte.
+KEYFRAME_VALUE_COUNTS = [C3bAnimFlag.value_count(flag) for flag in range(256)]
+
 
 class C3bAnimation:
     def __init__(self, _id, total_time):
         self.id = _id
         self.total_time = total_time
+        self.frozen = False
         self._bones = {}
 
     def get_bones(self):
         return list(self._bones.keys())
 
+    def freeze(self):
+        # Keyframe lists become tuples and no keyframes can be added.
+        self._bones = {bone_id: tuple(keyframes)
+            for bone_id, keyframes in self._bones.items()}
+        self.frozen = True
+
     def add_keyframe(self, bone_id, keyframe):
+        if self.frozen:
+            raise C3bError("Animation {0} is frozen.".format(self.id))
         if bone_id not in self._bones:
             self._bones[bone_id] = []
         self._bones[bone_id].append(keyframe)
@@ -247,21 +470,121 @@ class C3bAnimKeyFrame:
         self.translation = translation
 
 
+class C3bStringTable:
+    def __init__(self):
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def lookup(self, raw):
+        # Interning already makes equal names share one object across
+        # tables, the table itself saves the decode and intern of every
+        # name repeated within the documents it reads, such as bone names
+        # in each part and channel. Readers over a bytearray or memoryview
+        # hand out unhashable slices, hence the bytes() key.
+        raw = bytes(raw)
+        string = self._strings.get(raw)
+        if string is None:
+            string = sys.intern(raw.decode("utf-8"))
+            self._strings[raw] = string
+        return string
+
+    def clear(self):
+        self._strings.clear()
+
+
+# Pass to C3bParser to share decoded strings between every parser in the
+# process, call clear() to release them.
+SHARED_STRING_TABLE = C3bStringTable()
+
+
+class C3bContentKey:
+    VERTEX_ARRAY = "vertex_array"
+    ANIMATION = "animation"
+
+    @classmethod
+    def from_payload(self, kind, payload, endianness):
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        return (kind, endianness, len(payload), digest)
+
+    @classmethod
+    def size(self, key):
+        return key[2]
+
+
+class C3bContentStore:
+    # Decoded vertex arrays and animations keyed by a digest of the raw
+    # bytes they were decoded from. Entries are weak, so an object is
+    # dropped as soon as no loaded model uses it. Shared objects must not
+    # be modified: vertex values are read-only views and animations are
+    # frozen, the keyframes and their vectors are left to the caller.
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.shared_bytes = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, key):
+        _object = self._objects.get(key)
+        if _object is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.shared_bytes += C3bContentKey.size(key)
+        return _object
+
+    def put(self, key, _object):
+        self._objects[key] = _object
+
+    def clear(self):
+        self._objects.clear()
+
+
+def _frozen_values(values):
+    # A read-only view costs nothing on top of the float array, only values
+    # holding ints for integral attributes fall back to a tuple.
+    if isinstance(values, array.array):
+        return memoryview(values).toreadonly()
+    return tuple(values)
+
+
+# Pass to C3bParser to share identical vertex arrays and animations between
+# every model loaded in the process.
+SHARED_CONTENT_STORE = C3bContentStore()
+
+
 class C3bParser:
-    def __init__(self, _bytes):
+    def __init__(self, _bytes, strings=None, store=None,
+    endianness=Endian.LITTLE):
         self._reader = BinaryReader(_bytes)
-        self.endianness = Endian.LITTLE
+        self._strings = strings if strings is not None else C3bStringTable()
+        self._store = store
+        self._store_keys = set()
+        self.endianness = endianness
 
     @classmethod
-    def from_file(self, filename):
+    def from_file(self, filename, strings=None, store=None,
+    endianness=Endian.LITTLE):
         with open(filename, "rb") as _file:
             buffer = _file.read()
-            parser = C3bParser(buffer)
+            parser = C3bParser(buffer, strings, store, endianness)
         return parser
 
+    @classmethod
+    def from_archive(self, zip_path, member, strings=None, store=None,
+    endianness=Endian.LITTLE):
+        with zipfile.ZipFile(zip_path) as archive:
+            return C3bParser(archive.read(member), strings, store,
+                endianness)
+
     def verify_signature(self):
         self._reader.seek(0)
-        return self._reader.read_string(C3B_SIGNATURE_LENGTH) == C3B_SIGNATURE
+        signature = self._reader.read(C3B_SIGNATURE_LENGTH)
+        return signature == C3B_SIGNATURE.encode("ascii")
 
     def read_header(self):
         self._reader.seek(4)
@@ -279,7 +602,30 @@ class C3bParser:
             references.append(C3bReference(_id, _type, offset))
         return C3bHeader(major_version, minor_version, references)
 
-    def read_meshes(self, index):
+    def section_extents(self):
+        # (reference, start, end) for every reference, a section ends where
+        # the next one in the file starts.
+        references = self.read_header().references
+        offsets = sorted(set(ref.offset for ref in references))
+        ends = dict(zip(offsets, offsets[1:] + [self._reader.length()]))
+        return [(ref, ref.offset, ends[ref.offset]) for ref in references]
+
+    def section_digests(self):
+        # (reference, digest) for every reference, hashing each section's
+        # bytes in place.
+        return [(ref, hashlib.blake2b(self._reader.view(start, end),
+            digest_size=16).digest())
+            for ref, start, end in self.section_extents()]
+
+    def read_meshes(self, index, typed=None, memory=None):
+        # Attributes declaring an integral type get int values unless typed
+        # is False. With a memory, vertex values and indices are copied
+        # straight into its shared segments as float32 and the meshes hold
+        # descriptors of them. Only typed reads go through the store.
+        if typed and memory is not None:
+            raise ValueError("Shared vertex values cannot be typed.")
+        if typed is None:
+            typed = memory is None
         self.seek_type(C3bType.MESHES, index)
         meshes = []
 
@@ -287,6 +633,7 @@ class C3bParser:
         vertex_arr_count = self._read_uint()
         for vertex_arr_index in range(vertex_arr_count):
             vertex_array = C3bVertexArray()
+            start = self._reader.pos()
 
             # Read attributes
             attrib_count = self._read_uint()
@@ -297,11 +644,38 @@ class C3bParser:
                 vertex_array.attributes.append(
                     C3bVertexAttribute(value_count, _type, name))
 
-            # Read vertices
+            # Read vertices, values are always stored as float32 whatever
+            # type the attribute declares.
             value_count = self._read_uint()
-            for value_index in range(value_count):
-                vertex_value = self._reader.read_float32(self.endianness)
-                vertex_array.values.append(vertex_value)
+            key = None
+            shared = None
+            if self._store is not None and typed:
+                end = self._reader.pos() + value_count * 4
+                key = self._content_key(C3bContentKey.VERTEX_ARRAY, start,
+                    end)
+                shared = self._store.get(key)
+            if shared is not None:
+                # A copy within this document gets its own vertex array
+                # over the shared values, so writing it back keeps both.
+                if key in self._store_keys:
+                    vertex_array.values = shared.values
+                    vertex_array.typed = True
+                else:
+                    vertex_array = shared
+                self._reader.seek(end)
+            elif memory is None:
+                vertex_array.values = self._reader.read_typed_array(
+                    FLOAT32_FORMAT, value_count, self.endianness)
+                if typed:
+                    vertex_array.apply_attribute_types()
+                if key is not None:
+                    vertex_array.values = _frozen_values(vertex_array.values)
+                    self._store.put(key, vertex_array)
+            else:
+                vertex_array.values = memory.read_array(self._reader, "f",
+                    value_count, self.endianness)
+            if key is not None:
+                self._store_keys.add(key)
 
             # Read meshes
             mesh_count = self._read_uint()
@@ -311,15 +685,17 @@ class C3bParser:
 
                 # Read indices
                 index_count = self._read_uint()
-                for i in range(index_count):
-                    _index = self._reader.read_uint16(self.endianness)
-                    mesh.indices.append(_index)
+                if memory is None:
+                    mesh.indices = self._reader.read_typed_array(
+                        UINT16_FORMAT, index_count, self.endianness)
+                else:
+                    mesh.indices = memory.read_array(self._reader, "H",
+                        index_count, self.endianness)
 
                 # Read axis aligned bounding box
-                for aabb in range(6):
-                    aabb_coord = self._reader.read_float32(Endian.LITTLE)
-                    mesh.aabb.append(aabb_coord)
-            meshes.append(mesh)
+                mesh.aabb = self._reader.read_float32_array(6,
+                    self.endianness)
+                meshes.append(mesh)
         return meshes
 
     def read_materials(self, index):
@@ -331,23 +707,26 @@ class C3bParser:
             _id = self._read_string()
             material = C3bMaterial(_id)
 
-            # Skip diffuse(3 float), ambient(3 float), emissive(3 float),
-            # opacity(1 float), specular(3 float), shininess(1 float)
-            self._reader.strict_read(14 * 4)
+            material.diffuse = self._read_vec3()
+            material.ambient = self._read_vec3()
+            material.emissive = self._read_vec3()
+            material.opacity = self._reader.read_float32(self.endianness)
+            material.specular = self._read_vec3()
+            material.shininess = self._reader.read_float32(self.endianness)
 
             texture_count = self._read_uint()
             for texture_index in range(texture_count):
                 texture_id = self._read_string()
                 texture_filename = self._read_string()
-
-                # Skip UV data (4 float), handled by vertex attribute?
-                self._reader.read(4 * 4)
-
+                uv_translation = self._read_vec2()
+                uv_scale = self._read_vec2()
                 texture_type = self._read_string()
                 texture_wrap_u = self._read_string()
                 texture_wrap_v = self._read_string()
                 texture = C3bTexture(texture_id, texture_filename,
                     texture_type, texture_wrap_u, texture_wrap_v)
+                texture.uv_translation = uv_translation
+                texture.uv_scale = uv_scale
                 material.textures.append(texture)
             materials.append(material)
         return materials
@@ -358,10 +737,27 @@ class C3bParser:
         nodes = []
         node_count = self._read_uint()
         for i in range(node_count):
-            nodes.append(self._read_node(node_count == 1))
+            root, child_count = self._read_node()
+            nodes.append(root)
+
+            # Children follow their parent depth first, the stack holds
+            # how many children every open node still has to read.
+            stack = [[root, child_count]]
+            while stack:
+                pending = stack[-1]
+                if pending[1] == 0:
+                    stack.pop()
+                    continue
+                pending[1] -= 1
+                node, child_count = self._read_node()
+                pending[0].children.append(node)
+                stack.append([node, child_count])
         return nodes
 
-    def _read_node(self, single_sprite):
+    def read_node_table(self, index):
+        return MeruNodeTable.from_nodes(self.read_nodes(index))
+
+    def _read_node(self):
         _id = self._read_string()
         is_skeleton = self._reader.read_bool()
         transform = self._read_mat44()
@@ -382,19 +778,35 @@ class C3bParser:
 
             uv_map_count = self._read_uint()
             for uv_map_index in range(uv_map_count):
+                texture_indices = []
                 texture_index_count = self._read_uint()
                 for texture_index in range(texture_index_count):
-                    # Skip
-                    self._read_uint()
+                    texture_indices.append(self._read_uint())
+                node_part.uv_mapping.append(texture_indices)
             node.parts.append(node_part)
 
         child_count = self._read_uint()
-        for child_index in range(child_count):
-            child = self._read_node(single_sprite)
-            node.children.append(child)
-        return node
+        return node, child_count
 
     def read_animations(self, index):
+        if self._store is None:
+            return self._read_animation(index)
+
+        # The whole section is hashed, a stored animation is returned
+        # without decoding anything.
+        self.seek_type(C3bType.ANIMATIONS, index)
+        start = self._reader.pos()
+        end = [extent_end for ref, extent_start, extent_end in
+            self.section_extents() if extent_start == start][0]
+        key = self._content_key(C3bContentKey.ANIMATION, start, end)
+        anim = self._store.get(key)
+        if anim is None:
+            anim = self._read_animation(index)
+            anim.freeze()
+            self._store.put(key, anim)
+        return anim
+
+    def _read_animation(self, index):
         self.seek_type(C3bType.ANIMATIONS, index)
         _id = self._read_string()
         total_time = self._reader.read_float32(self.endianness)
@@ -407,7 +819,7 @@ class C3bParser:
 
             for keyframe_index in range(keyframe_count):
                 keyframe_time = self._reader.read_float32(self.endianness)
-                keyframe_flag = self._reader.read_uint8(self.endianness)
+                keyframe_flag = self._reader.read_uint8()
                 keyframe = C3bAnimKeyFrame(keyframe_time)
 
                 if ((keyframe_flag & C3bAnimFlag.HAS_ROTATION) ==
@@ -424,14 +836,60 @@ class C3bParser:
                 anim.add_keyframe(bone_name, keyframe)
         return anim
 
+    def read_animation_arrays(self, index, memory=None):
+        # Keyframes as flat arrays per bone instead of keyframe objects:
+        # times, flags and the rotation, scale and translation values each
+        # key has, in that order. The raw bytes of each are gathered per
+        # bone and decoded in one go, with a memory straight into its
+        # shared segments as descriptors.
+        self.seek_type(C3bType.ANIMATIONS, index)
+        _id = self._read_string()
+        total_time = self._reader.read_float32(self.endianness)
+
+        bones = []
+        bone_node_count = self._read_uint()
+        for bone_node_index in range(bone_node_count):
+            bone_name = self._read_string()
+            keyframe_count = self._read_uint()
+            times = bytearray()
+            flags = bytearray()
+            values = bytearray()
+            for keyframe_index in range(keyframe_count):
+                key = self._reader.strict_read(5)
+                times += key[:4]
+                flags.append(key[4])
+                values += self._reader.strict_read(
+                    4 * KEYFRAME_VALUE_COUNTS[key[4]])
+            bones.append((bone_name,
+                self._decode_array(FLOAT32_FORMAT, times, memory),
+                self._decode_array(UINT8_FORMAT, flags, memory),
+                self._decode_array(FLOAT32_FORMAT, values, memory)))
+        return _id, total_time, bones
+
+    def _decode_array(self, frmt, _bytes, memory):
+        typecode = ARRAY_TYPECODES[frmt]
+        count = len(_bytes) // array.array(typecode).itemsize
+        if memory is not None:
+            return memory.from_bytes(typecode, count, _bytes,
+                self.endianness)
+        return parse_typed_array_from_format(frmt, count, _bytes,
+            self.endianness)
+
     def seek_type(self, _type, index):
         refs = self.read_header().references
         filtered = list(filter(lambda ref: ref.type == _type, refs))
         if index >= len(filtered):
             raise IndexError("{0} index out of bounds, max {1}."
-                .format(_type.name, len(filtered) - 1))
+                .format(C3bType.name(_type), len(filtered) - 1))
         self._reader.seek(filtered[index].offset)
 
+    def _content_key(self, kind, start, end):
+        position = self._reader.pos()
+        self._reader.seek(start)
+        payload = self._reader.strict_read(end - start)
+        self._reader.seek(position)
+        return C3bContentKey.from_payload(kind, payload, self.endianness)
+
     def _read_uint(self):
         return self._reader.read_uint32(self.endianness)
 
@@ -439,22 +897,196 @@ class C3bParser:
         return self._reader.read_uint16(self.endianness)
 
     def _read_string(self):
-        return self._reader.read_prefixed_string_uint32(self.endianness)
+        length = self._read_uint()
+        return self._strings.lookup(self._reader.strict_read(length))
+
+    def _read_floats(self, count):
+        return self._reader.read_typed_array(FLOAT32_FORMAT, count,
+            self.endianness)
 
     def _read_mat44(self):
-        values = []
-        for i in range(16):
-            values.append(self._reader.read_float32(self.endianness))
-        return Mat44(values)
+        return Mat44(self._read_floats(16).tolist())
+
+    def _read_vec2(self):
+        return Vec2(*self._read_floats(2))
 
     def _read_vec3(self):
-        values = []
-        for i in range(3):
-            values.append(self._reader.read_float32(self.endianness))
-        return Vec3(values[0], values[1], values[2])
+        return Vec3(*self._read_floats(3))
 
     def _read_vec4(self):
-        values = []
-        for i in range(4):
-            values.append(self._reader.read_float32(self.endianness))
-        return Vec4(values[0], values[1], values[2], values[3])
+        return Vec4(*self._read_floats(4))
+
+
+class C3bWriter:
+    def __init__(self, major_version=0, minor_version=9,
+    endianness=Endian.LITTLE):
+        self.major_version = major_version
+        self.minor_version = minor_version
+        self.endianness = endianness
+        self._sections = []
+
+    @classmethod
+    def from_parser(self, parser, meshes=None):
+        # meshes optionally replaces the meshes read from each meshes
+        # section, in section order.
+        header = parser.read_header()
+        writer = C3bWriter(header.major_version, header.minor_version,
+            parser.endianness)
+        type_indices = {}
+        for ref in header.references:
+            index = type_indices.get(ref.type, 0)
+            type_indices[ref.type] = index + 1
+            if ref.type == C3bType.MESHES:
+                writer.add_meshes(parser.read_meshes(index)
+                    if meshes is None else meshes[index], ref.id)
+            elif ref.type == C3bType.MATERIALS:
+                writer.add_materials(parser.read_materials(index), ref.id)
+            elif ref.type == C3bType.NODES:
+                writer.add_nodes(parser.read_nodes(index), ref.id)
+            elif ref.type == C3bType.ANIMATIONS:
+                writer.add_animation(parser.read_animations(index), ref.id)
+            else:
+                raise C3bError("Cannot write {0} sections."
+                    .format(C3bType.name(ref.type)))
+        return writer
+
+    def add_meshes(self, meshes, _id=""):
+        writer = self._section_writer()
+        vertex_arrays = []
+        vertex_array_meshes = {}
+        for mesh in meshes:
+            key = id(mesh.vertex_array)
+            if key not in vertex_array_meshes:
+                vertex_arrays.append(mesh.vertex_array)
+                vertex_array_meshes[key] = []
+            vertex_array_meshes[key].append(mesh)
+
+        writer.write_uint32(len(vertex_arrays))
+        for vertex_array in vertex_arrays:
+            writer.write_uint32(len(vertex_array.attributes))
+            for attrib in vertex_array.attributes:
+                writer.write_uint32(attrib.value_count)
+                writer.write_string_uint32(attrib.type)
+                writer.write_string_uint32(attrib.name)
+            writer.write_uint32(len(vertex_array.values))
+            writer.write_float32(vertex_array.values)
+
+            _meshes = vertex_array_meshes[id(vertex_array)]
+            writer.write_uint32(len(_meshes))
+            for mesh in _meshes:
+                if len(mesh.aabb) != 6:
+                    raise C3bError("Mesh {0} has no aabb.".format(mesh.id))
+                writer.write_string_uint32(mesh.id)
+                writer.write_uint32(len(mesh.indices))
+                writer.write_uint16(mesh.indices)
+                writer.write_float32(mesh.aabb)
+        self._add_section(_id, C3bType.MESHES, writer)
+
+    def add_materials(self, materials, _id=""):
+        writer = self._section_writer()
+        writer.write_uint32(len(materials))
+        for material in materials:
+            writer.write_string_uint32(material.id)
+            writer.write_float32(material.diffuse.unpack() +
+                material.ambient.unpack() + material.emissive.unpack() +
+                (material.opacity,) + material.specular.unpack() +
+                (material.shininess,))
+            writer.write_uint32(len(material.textures))
+            for texture in material.textures:
+                writer.write_string_uint32(texture.id)
+                writer.write_string_uint32(texture.filename)
+                writer.write_float32(texture.uv_translation.unpack() +
+                    texture.uv_scale.unpack())
+                writer.write_string_uint32(texture.type)
+                writer.write_string_uint32(texture.wrap_u)
+                writer.write_string_uint32(texture.wrap_v)
+        self._add_section(_id, C3bType.MATERIALS, writer)
+
+    def add_nodes(self, nodes, _id=""):
+        writer = self._section_writer()
+        writer.write_uint32(len(nodes))
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            self._write_node(writer, node)
+            stack.extend(reversed(node.children))
+        self._add_section(_id, C3bType.NODES, writer)
+
+    def _write_node(self, writer, node):
+        writer.write_string_uint32(node.id)
+        writer.write_bool(node.is_skeleton)
+        writer.write_float32(node.transform.unpack())
+        writer.write_uint32(len(node.parts))
+        for part in node.parts:
+            writer.write_string_uint32(part.mesh_id)
+            writer.write_string_uint32(part.material_id)
+            writer.write_uint32(len(part.bones))
+            for bone in part.bones:
+                writer.write_string_uint32(bone.name)
+                writer.write_float32(bone.inv_bind_pos.unpack())
+            writer.write_uint32(len(part.uv_mapping))
+            for texture_indices in part.uv_mapping:
+                writer.write_uint32(len(texture_indices))
+                writer.write_uint32(texture_indices)
+        writer.write_uint32(len(node.children))
+
+    def add_animation(self, animation, _id=""):
+        writer = self._section_writer()
+        writer.write_string_uint32(animation.id)
+        writer.write_float32(animation.total_time)
+        bones = animation.get_bones()
+        writer.write_uint32(len(bones))
+        for bone in bones:
+            keyframes = animation.get_keyframes(bone)
+            writer.write_string_uint32(bone)
+            writer.write_uint32(len(keyframes))
+            for keyframe in keyframes:
+                flag = 0
+                values = []
+                if keyframe.rotation is not None:
+                    flag |= C3bAnimFlag.HAS_ROTATION
+                    values.extend(keyframe.rotation.unpack())
+                if keyframe.scale is not None:
+                    flag |= C3bAnimFlag.HAS_SCALE
+                    values.extend(keyframe.scale.unpack())
+                if keyframe.translation is not None:
+                    flag |= C3bAnimFlag.HAS_TRANSLATION
+                    values.extend(keyframe.translation.unpack())
+                writer.write_float32(keyframe.time)
+                writer.write_uint8(flag)
+                writer.write_float32(values)
+        self._add_section(_id, C3bType.ANIMATIONS, writer)
+
+    def to_bytes(self):
+        # Sections follow the reference table back to back, so every
+        # offset is known once the encoded ids are.
+        header_length = C3B_SIGNATURE_LENGTH + 2 + 4
+        encoded_ids = []
+        for _id, _type, _bytes in self._sections:
+            encoded_id = _id.encode("utf-8")
+            encoded_ids.append(encoded_id)
+            header_length += 4 + len(encoded_id) + 4 + 4
+
+        writer = self._section_writer()
+        writer.write_bytes(C3B_SIGNATURE.encode("ascii"))
+        writer.write_int8([self.major_version, self.minor_version])
+        writer.write_uint32(len(self._sections))
+        offset = header_length
+        for encoded_id, (_id, _type, _bytes) in zip(encoded_ids,
+        self._sections):
+            writer.write_bytes_uint32(encoded_id)
+            writer.write_uint32([_type, offset])
+            offset += len(_bytes)
+        for _id, _type, _bytes in self._sections:
+            writer.write_bytes(_bytes)
+        return writer.to_bytes()
+
+    def to_file(self, filename):
+        with open(filename, "wb") as _file:
+            _file.write(self.to_bytes())
+
+    def _section_writer(self):
+        return BinaryWriter(self.endianness)
+
+    def _add_section(self, _id, _type, writer):
+        self._sections.append((_id, _type, writer.to_bytes()))
@@ -0,0 +1,406 @@
+import array
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from json.decoder import scanstring
+
+from .binary import Endian
+from .bounds import POSITION_ATTRIBUTE, compute_aabb
+from .c3b import (C3bAnimation, C3bAnimKeyFrame, C3bBone, C3bError,
+C3bMaterial, C3bMesh, C3bNode, C3bNodePart, C3bTexture, C3bVertexArray,
+C3bVertexAttribute, C3bWriter)
+from .linear import Mat44, Vec2, Vec3, Vec4
+from .scan import iter_files
+
+C3T_EXTENSIONS = (".c3t",)
+C3T_CHUNK_SIZE = 1 << 16
+C3T_WHITESPACE = re.compile(r"[ \t\n\r]*")
+C3T_SCALAR = re.compile(r"-?[0-9][0-9.eE+\-]*|true|false|null")
+C3T_LITERALS = {"true": True, "false": False, "null": None}
+
+
+class C3tTokenizer:
+    def __init__(self, stream, chunk_size=C3T_CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def peek(self):
+        while True:
+            self._pos = C3T_WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise C3bError("Expected '{0}', found '{1}'.".format(char, found))
+        self._pos += 1
+
+    def read_string(self):
+        self.expect("\"")
+        while True:
+            try:
+                value, self._pos = scanstring(self._buffer, self._pos)
+                return value
+            except ValueError:
+                # The closing quote may still be in the next chunk.
+                if not self._fill():
+                    raise C3bError("Unterminated string.")
+
+    def read_scalar(self):
+        self.peek()
+        while True:
+            # A token touching the end of the buffer may be cut in half.
+            match = C3T_SCALAR.match(self._buffer, self._pos)
+            if match is None:
+                cut = len(self._buffer) - self._pos < len("false")
+            else:
+                cut = match.end() == len(self._buffer)
+            if cut and self._fill():
+                continue
+            if match is None:
+                raise C3bError("Unexpected '{0}'.".format(self.peek()))
+            self._pos = match.end()
+            token = match.group()
+            if token in C3T_LITERALS:
+                return C3T_LITERALS[token]
+            if any(char in token for char in ".eE"):
+                return float(token)
+            return int(token)
+
+    def read_value(self):
+        char = self.peek()
+        if char == "{":
+            return {key: self.read_value() for key in self.iter_object()}
+        if char == "[":
+            return [self.read_value() for index in self.iter_array()]
+        if char == "\"":
+            return self.read_string()
+        return self.read_scalar()
+
+    def iter_object(self):
+        # Yields every key, the caller has to consume its value before
+        # asking for the next one.
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            if self._next_separator("}"):
+                return
+
+    def iter_array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._next_separator("]"):
+                return
+
+    def read_number_array(self, typecode="f"):
+        # Numbers are converted a chunk at a time straight into a typed
+        # array, the whole array never exists as a list of Python objects.
+        convert = float if typecode in "fd" else int
+        values = array.array(typecode)
+        self.expect("[")
+        while True:
+            buffer = self._buffer
+            end = buffer.find("]", self._pos)
+            closed = end >= 0
+            if not closed:
+                end = buffer.rfind(",", self._pos)
+            if end >= 0:
+                text = buffer[self._pos:end]
+                if closed and not text.strip():
+                    if len(values) > 0:
+                        raise C3bError("Trailing comma in array.")
+                else:
+                    try:
+                        values.extend(map(convert, text.split(",")))
+                    except (ValueError, OverflowError) as error:
+                        raise C3bError("Invalid array value: {0}."
+                            .format(error))
+                self._pos = end + 1
+                if closed:
+                    return values
+            if not self._fill():
+                raise C3bError("Unterminated array.")
+
+    def _next_separator(self, closing):
+        char = self.peek()
+        self._pos += 1
+        if char == closing:
+            return True
+        if char != ",":
+            raise C3bError("Expected ',' or '{0}', found '{1}'."
+                .format(closing, char))
+        return False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+class C3tModel:
+    def __init__(self):
+        self.major_version = 0
+        self.minor_version = 9
+        self.id = ""
+        self.meshes = []
+        self.materials = []
+        self.nodes = []
+        self.animations = []
+
+    def to_writer(self, endianness=Endian.LITTLE):
+        writer = C3bWriter(self.major_version, self.minor_version,
+            endianness)
+        if self.meshes:
+            writer.add_meshes(self.meshes)
+        if self.materials:
+            writer.add_materials(self.materials)
+        if self.nodes:
+            writer.add_nodes(self.nodes)
+        for animation in self.animations:
+            writer.add_animation(animation, animation.id)
+        return writer
+
+
+class C3tParser:
+    def __init__(self, stream, chunk_size=C3T_CHUNK_SIZE):
+        self._tokenizer = C3tTokenizer(stream, chunk_size)
+
+    @classmethod
+    def read_file(self, filename, chunk_size=C3T_CHUNK_SIZE):
+        with open(filename, "r", encoding="utf-8") as _file:
+            return C3tParser(_file, chunk_size).read()
+
+    def read(self):
+        tokenizer = self._tokenizer
+        model = C3tModel()
+        for key in tokenizer.iter_object():
+            if key == "version":
+                model.major_version, model.minor_version = _parse_version(
+                    tokenizer.read_value())
+            elif key == "id":
+                model.id = tokenizer.read_string()
+            elif key == "meshes":
+                for index in tokenizer.iter_array():
+                    model.meshes.extend(self._read_mesh())
+            elif key == "materials":
+                model.materials = [_to_material(data)
+                    for data in tokenizer.read_value()]
+            elif key == "nodes":
+                model.nodes = [_to_node(data)
+                    for data in tokenizer.read_value()]
+            elif key == "animations":
+                for index in tokenizer.iter_array():
+                    model.animations.append(self._read_animation())
+            else:
+                tokenizer.read_value()
+        return model
+
+    def _read_mesh(self):
+        tokenizer = self._tokenizer
+        vertex_array = C3bVertexArray()
+        vertex_array.values = array.array("f")
+        meshes = []
+        for key in tokenizer.iter_object():
+            if key == "attributes":
+                for data in tokenizer.read_value():
+                    vertex_array.attributes.append(C3bVertexAttribute(
+                        data["size"], data["type"], data["attribute"]))
+            elif key == "vertices":
+                vertex_array.values = tokenizer.read_number_array("f")
+            elif key == "parts":
+                for index in tokenizer.iter_array():
+                    meshes.append(self._read_mesh_part(vertex_array))
+            else:
+                tokenizer.read_value()
+
+        # Attributes may follow the parts, so missing boxes are only
+        # filled in once the whole mesh has been read.
+        for mesh in meshes:
+            if len(mesh.aabb) != 6 and \
+            vertex_array.has_attribute(POSITION_ATTRIBUTE):
+                mesh.aabb = compute_aabb(vertex_array, mesh.indices)
+        return meshes
+
+    def _read_mesh_part(self, vertex_array):
+        tokenizer = self._tokenizer
+        mesh = C3bMesh("", vertex_array)
+        for key in tokenizer.iter_object():
+            if key == "id":
+                mesh.id = tokenizer.read_string()
+            elif key == "indices":
+                mesh.indices = tokenizer.read_number_array("H")
+            elif key == "aabb":
+                mesh.aabb = tokenizer.read_value()
+            else:
+                tokenizer.read_value()
+        return mesh
+
+    def _read_animation(self):
+        tokenizer = self._tokenizer
+        animation = C3bAnimation("", 0.0)
+        for key in tokenizer.iter_object():
+            if key == "id":
+                animation.id = tokenizer.read_string()
+            elif key == "length":
+                animation.total_time = float(tokenizer.read_scalar())
+            elif key == "bones":
+                for index in tokenizer.iter_array():
+                    data = tokenizer.read_value()
+                    for keyframe in data.get("keyframes", []):
+                        animation.add_keyframe(data["boneId"],
+                            _to_keyframe(keyframe))
+            else:
+                tokenizer.read_value()
+        return animation
+
+
+def _parse_version(value):
+    if isinstance(value, str):
+        value = value.split(".")
+    if len(value) != 2:
+        raise C3bError("Invalid version {0}.".format(value))
+    return int(value[0]), int(value[1])
+
+
+def _to_vec3(values, default):
+    if values is None:
+        return default
+    return Vec3(values[0], values[1], values[2])
+
+
+def _to_mat44(values):
+    if values is None:
+        return Mat44.identity()
+    return Mat44(list(values))
+
+
+def _to_material(data):
+    material = C3bMaterial(data.get("id", ""))
+    material.diffuse = _to_vec3(data.get("diffuse"), material.diffuse)
+    material.ambient = _to_vec3(data.get("ambient"), material.ambient)
+    material.emissive = _to_vec3(data.get("emissive"), material.emissive)
+    material.opacity = data.get("opacity", material.opacity)
+    material.specular = _to_vec3(data.get("specular"), material.specular)
+    material.shininess = data.get("shininess", material.shininess)
+    for texture_data in data.get("textures", []):
+        texture = C3bTexture(texture_data.get("id", ""),
+            texture_data.get("filename", ""),
+            texture_data.get("type", "UNKNOWN"),
+            texture_data.get("wrapModeU", "REPEAT"),
+            texture_data.get("wrapModeV", "REPEAT"))
+        if "uvtranslation" in texture_data:
+            texture.uv_translation = Vec2(*texture_data["uvtranslation"])
+        if "uvscaling" in texture_data:
+            texture.uv_scale = Vec2(*texture_data["uvscaling"])
+        material.textures.append(texture)
+    return material
+
+
+def _to_node(data):
+    node = C3bNode(data.get("id", ""), data.get("skeleton", False),
+        _to_mat44(data.get("transform")))
+    for part_data in data.get("parts", []):
+        part = C3bNodePart(part_data.get("meshpartid", ""),
+            part_data.get("materialid", ""))
+        for bone_data in part_data.get("bones", []):
+            part.bones.append(C3bBone(bone_data["node"],
+                _to_mat44(bone_data.get("transform"))))
+        part.uv_mapping = part_data.get("uvMapping", [])
+        node.parts.append(part)
+    for child_data in data.get("children", []):
+        node.children.append(_to_node(child_data))
+    return node
+
+
+def _to_keyframe(data):
+    keyframe = C3bAnimKeyFrame(float(data.get("keytime", 0.0)))
+    if "rotation" in data:
+        keyframe.rotation = Vec4(*data["rotation"])
+    if "scale" in data:
+        keyframe.scale = Vec3(*data["scale"])
+    if "translation" in data:
+        keyframe.translation = Vec3(*data["translation"])
+    return keyframe
+
+
+class MeruCompileResult:
+    def __init__(self, source_path, output_path, error=None):
+        self.source_path = source_path
+        self.output_path = output_path
+        self.error = error
+
+
+def compile_file(source_path, output_path, endianness=Endian.LITTLE):
+    writer = C3tParser.read_file(source_path).to_writer(endianness)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    temp_path = output_path + ".tmp"
+    writer.to_file(temp_path)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def compile_jobs(paths, output_dir=None):
+    # Files inside a listed directory keep their relative path under
+    # output_dir, otherwise the c3b is written next to its source.
+    jobs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for source_path in iter_files([path], C3T_EXTENSIONS):
+                rel_path = os.path.relpath(source_path, path)
+                root = path if output_dir is None else output_dir
+                jobs.append((source_path, _c3b_path(root, rel_path)))
+        else:
+            root = os.path.dirname(path) if output_dir is None \
+                else output_dir
+            jobs.append((path, _c3b_path(root, os.path.basename(path))))
+    return jobs
+
+
+def _c3b_path(root, rel_path):
+    return os.path.join(root, os.path.splitext(rel_path)[0] + ".c3b")
+
+
+def _compile_job(source_path, output_path, endianness):
+    try:
+        compile_file(source_path, output_path, endianness)
+        return MeruCompileResult(source_path, output_path)
+    except Exception as error:
+        return MeruCompileResult(source_path, output_path, str(error))
+
+
+def compile_files(paths, output_dir=None, workers=None,
+endianness=Endian.LITTLE):
+    jobs = compile_jobs(paths, output_dir)
+    if workers == 1 or len(jobs) < 2:
+        return [_compile_job(source_path, output_path, endianness)
+            for source_path, output_path in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_compile_job, source_path, output_path,
+            endianness) for source_path, output_path in jobs]
+        return [future.result() for future in futures]
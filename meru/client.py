@@ -0,0 +1,132 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Kept free of the parser imports so short-lived client processes start
+# fast, the parser is only imported when falling back to a local parse.
+
+SOCKET_ENV = "MERU_SOCKET"
+CLIENT_TIMEOUT = 30.0
+QUERY_COMMANDS = ["header", "meshes", "materials", "nodes", "animations"]
+
+
+class MeruServerError(Exception):
+    pass
+
+
+def default_socket_path():
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(),
+        "meru-{0}.sock".format(os.getuid()))
+
+
+def local_query(command, path):
+    from .c3b import C3bError, C3bParser
+    from .report import REPORTS
+
+    if command not in REPORTS:
+        raise MeruServerError("Unknown command {0}.".format(command))
+    parser = C3bParser.from_file(path)
+    if not parser.verify_signature():
+        raise C3bError("{0} is not a c3b file.".format(path))
+    return REPORTS[command](parser)
+
+
+class MeruClient:
+    def __init__(self, socket_path=None, timeout=CLIENT_TIMEOUT,
+    fallback=True):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self.fallback = fallback
+        self._socket = None
+        self._file = None
+
+    def connected(self):
+        if self._socket is None:
+            try:
+                self._connect()
+            except OSError:
+                return False
+        return True
+
+    def request(self, request):
+        if not self.connected():
+            raise MeruServerError("No server at {0}.".format(
+                self.socket_path))
+        try:
+            self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as error:
+            self.close()
+            raise MeruServerError(str(error))
+        if not line:
+            self.close()
+            raise MeruServerError("Server closed the connection.")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise MeruServerError(response["error"])
+        return response["result"]
+
+    def query(self, command, path):
+        path = os.path.abspath(path)
+        if self.fallback and not self.connected():
+            return local_query(command, path)
+        return self.request({"command": command, "path": path})
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        _socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        _socket.settimeout(self.timeout)
+        try:
+            _socket.connect(self.socket_path)
+        except OSError:
+            _socket.close()
+            raise
+        self._socket = _socket
+        self._file = _socket.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main(argv=None):
+    # python -m meru.client [--socket PATH] COMMAND PATH...
+    args = list(sys.argv[1:] if argv is None else argv)
+    socket_path = None
+    if len(args) >= 2 and args[0] == "--socket":
+        socket_path = args[1]
+        args = args[2:]
+    if len(args) < 2 or args[0] not in QUERY_COMMANDS:
+        print("usage: python -m meru.client [--socket PATH] {{{0}}} PATH..."
+            .format(",".join(QUERY_COMMANDS)), file=sys.stderr)
+        return 2
+
+    status = 0
+    with MeruClient(socket_path) as client:
+        for path in args[1:]:
+            try:
+                result = client.query(args[0], path)
+            except Exception as error:
+                print("ERROR: {0}: {1}".format(path, error), file=sys.stderr)
+                status = 1
+                continue
+            print(json.dumps({"path": path, args[0]: result}))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
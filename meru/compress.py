@@ -0,0 +1,321 @@
+import array
+import math
+
+from .animation import MeruTrack, build_channels
+from .c3b import C3bAnimation, C3bAnimKeyFrame
+from .linear import Vec3, Vec4, quat_nlerp, vec_lerp
+
+POSITION_TOLERANCE = 1e-4
+ROTATION_TOLERANCE = 1e-4
+SCALE_TOLERANCE = 1e-4
+
+ENCODING_FLOAT32 = "float32"
+ENCODING_SMALLEST_THREE = "smallest_three"
+ENCODING_UINT16 = "uint16"
+
+# Smallest three stores the three smaller quaternion components in 15 bits
+# each, the index of the dropped largest one goes in the spare top bits.
+SMALLEST_THREE_MAX = (1 << 15) - 1
+SMALLEST_THREE_RANGE = math.sqrt(0.5)
+UINT16_MAX = (1 << 16) - 1
+
+# Keyframe payload as c3b stores it, a float time and a uint8 flag plus
+# the float components present.
+KEYFRAME_SIZE = 4 + 1
+COMPONENT_COUNTS = {"translation": 3, "rotation": 4, "scale": 3}
+TRACK_NAMES = ["translation", "rotation", "scale"]
+
+
+def vec_error(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def quat_error(a, b):
+    # Angle in radians between the two rotations, q and -q are equal.
+    length = math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+    if length == 0.0:
+        return 0.0
+    dot = abs(sum(x * y for x, y in zip(a, b))) / length
+    return 2.0 * math.acos(min(1.0, dot))
+
+
+TRACK_INTERPOLATION = {
+    "translation": (vec_lerp, vec_error),
+    "rotation": (quat_nlerp, quat_error),
+    "scale": (vec_lerp, vec_error)
+}
+
+
+def _segment_fits(times, values, start, end, interpolate, error, tolerance):
+    span = times[end] - times[start]
+    for index in range(start + 1, end):
+        t = (times[index] - times[start]) / span if span > 0.0 else 0.0
+        value = interpolate(values[start], values[end], t)
+        if error(value, values[index]) > tolerance:
+            return False
+    return True
+
+
+def reduce_keys(times, values, interpolate, error, tolerance):
+    count = len(times)
+    if count == 0:
+        return []
+    if all(error(values[0], value) <= tolerance for value in values):
+        return [0]
+
+    # Greedily stretch every segment over as many keys as interpolation
+    # between its two ends reproduces within tolerance.
+    kept = [0]
+    start = 0
+    while start < count - 1:
+        end = start + 1
+        while end + 1 < count and _segment_fits(times, values, start,
+        end + 1, interpolate, error, tolerance):
+            end += 1
+        kept.append(end)
+        start = end
+    return kept
+
+
+def encode_smallest_three(rotations):
+    data = array.array("H")
+    for rotation in rotations:
+        length = math.sqrt(sum(value * value for value in rotation))
+        if length == 0.0:
+            rotation = (0.0, 0.0, 0.0, 1.0)
+            length = 1.0
+        largest = max(range(4), key=lambda i: abs(rotation[i]))
+        sign = -1.0 if rotation[largest] < 0.0 else 1.0
+        words = []
+        for i in range(4):
+            if i == largest:
+                continue
+            value = rotation[i] * sign / length
+            normalized = (value / SMALLEST_THREE_RANGE + 1.0) * 0.5
+            words.append(min(SMALLEST_THREE_MAX, max(0,
+                int(round(normalized * SMALLEST_THREE_MAX)))))
+        words[0] |= (largest >> 1) << 15
+        words[1] |= (largest & 1) << 15
+        data.extend(words)
+    return data
+
+
+def decode_smallest_three(data):
+    rotations = []
+    for offset in range(0, len(data), 3):
+        words = data[offset:offset + 3]
+        largest = ((words[0] >> 15) << 1) | (words[1] >> 15)
+        values = [((word & SMALLEST_THREE_MAX) / SMALLEST_THREE_MAX * 2.0 -
+            1.0) * SMALLEST_THREE_RANGE for word in words]
+        missing = math.sqrt(max(0.0, 1.0 - sum(v * v for v in values)))
+        values.insert(largest, missing)
+        rotations.append(tuple(values))
+    return rotations
+
+
+def encode_uint16(values, component_count):
+    # Every component is mapped onto its own [min, max] range, the range
+    # is stored as float32 minimums followed by extents.
+    columns = [[value[i] for value in values] for i in range(component_count)]
+    ranges = array.array("f", [min(column) for column in columns] +
+        [max(column) - min(column) for column in columns])
+    data = array.array("H")
+    for value in values:
+        for i in range(component_count):
+            extent = ranges[component_count + i]
+            if extent > 0.0:
+                normalized = (value[i] - ranges[i]) / extent
+                data.append(min(UINT16_MAX, max(0,
+                    int(round(normalized * UINT16_MAX)))))
+            else:
+                data.append(0)
+    return data, ranges
+
+
+def decode_uint16(data, ranges, component_count):
+    values = []
+    for offset in range(0, len(data), component_count):
+        values.append(tuple(ranges[i] + data[offset + i] / UINT16_MAX *
+            ranges[component_count + i] for i in range(component_count)))
+    return values
+
+
+class MeruCompressedTrack:
+    def __init__(self, name, encoding, times, data, ranges=None):
+        self.name = name
+        self.encoding = encoding
+        self.times = times
+        self.data = data
+        self.ranges = ranges if ranges is not None else array.array("f")
+
+    @classmethod
+    def encode(self, name, times, values, encoding=ENCODING_FLOAT32):
+        component_count = COMPONENT_COUNTS[name]
+        times = array.array("f", times)
+        if encoding == ENCODING_SMALLEST_THREE:
+            return MeruCompressedTrack(name, encoding, times,
+                encode_smallest_three(values))
+        if encoding == ENCODING_UINT16:
+            data, ranges = encode_uint16(values, component_count)
+            return MeruCompressedTrack(name, encoding, times, data, ranges)
+        data = array.array("f")
+        for value in values:
+            data.extend(value)
+        return MeruCompressedTrack(name, encoding, times, data)
+
+    def key_count(self):
+        return len(self.times)
+
+    def size(self):
+        return (len(self.times) * self.times.itemsize +
+            len(self.data) * self.data.itemsize +
+            len(self.ranges) * self.ranges.itemsize)
+
+    def decode(self):
+        component_count = COMPONENT_COUNTS[self.name]
+        if self.encoding == ENCODING_SMALLEST_THREE:
+            return decode_smallest_three(self.data)
+        if self.encoding == ENCODING_UINT16:
+            return decode_uint16(self.data, self.ranges, component_count)
+        return [tuple(self.data[offset:offset + component_count])
+            for offset in range(0, len(self.data), component_count)]
+
+    def to_track(self):
+        track = MeruTrack(TRACK_INTERPOLATION[self.name][0])
+        track.times = list(self.times)
+        track.values = self.decode()
+        return track
+
+
+class MeruCompressedChannel:
+    def __init__(self, bone_id):
+        self.bone_id = bone_id
+        self.translation = None
+        self.rotation = None
+        self.scale = None
+
+    def tracks(self):
+        return [track for track in (self.translation, self.rotation,
+            self.scale) if track is not None]
+
+
+class MeruCompressionReport:
+    def __init__(self, animation_id):
+        self.animation_id = animation_id
+        self.source_size = 0
+        self.compressed_size = 0
+        self.source_key_count = 0
+        self.key_count = 0
+        self.max_position_error = 0.0
+        self.max_rotation_error = 0.0
+        self.max_scale_error = 0.0
+
+    def ratio(self):
+        if self.compressed_size == 0:
+            return 1.0
+        return self.source_size / self.compressed_size
+
+    def to_dict(self):
+        return {
+            "id": self.animation_id,
+            "source_size": self.source_size,
+            "compressed_size": self.compressed_size,
+            "ratio": self.ratio(),
+            "source_keys": self.source_key_count,
+            "keys": self.key_count,
+            "max_position_error": self.max_position_error,
+            "max_rotation_error": self.max_rotation_error,
+            "max_scale_error": self.max_scale_error
+        }
+
+
+class MeruCompressedAnimation:
+    VECTOR_TYPES = {"translation": Vec3, "rotation": Vec4, "scale": Vec3}
+
+    def __init__(self, _id, total_time):
+        self.id = _id
+        self.total_time = total_time
+        self.channels = {}
+        self.report = MeruCompressionReport(_id)
+
+    def size(self):
+        return sum(track.size() for channel in self.channels.values()
+            for track in channel.tracks())
+
+    def to_animation(self):
+        # Tracks are merged back into keyframes by time, a keyframe only
+        # carries the components that kept a key at that time.
+        animation = C3bAnimation(self.id, self.total_time)
+        for bone_id, channel in self.channels.items():
+            keyframes = {}
+            for track in channel.tracks():
+                vector_type = self.VECTOR_TYPES[track.name]
+                for time, value in zip(track.times, track.decode()):
+                    keyframe = keyframes.get(time)
+                    if keyframe is None:
+                        keyframe = C3bAnimKeyFrame(time)
+                        keyframes[time] = keyframe
+                    setattr(keyframe, track.name, vector_type(*value))
+            for time in sorted(keyframes):
+                animation.add_keyframe(bone_id, keyframes[time])
+        return animation
+
+
+def _source_size(animation):
+    size = 0
+    for bone_id in animation.get_bones():
+        for keyframe in animation.get_keyframes(bone_id):
+            size += KEYFRAME_SIZE
+            for name in TRACK_NAMES:
+                if getattr(keyframe, name) is not None:
+                    size += COMPONENT_COUNTS[name] * 4
+    return size
+
+
+def compress_animation(animation, position_tolerance=POSITION_TOLERANCE,
+rotation_tolerance=ROTATION_TOLERANCE, scale_tolerance=SCALE_TOLERANCE,
+quantize=False):
+    tolerances = {
+        "translation": position_tolerance,
+        "rotation": rotation_tolerance,
+        "scale": scale_tolerance
+    }
+    encodings = {
+        "translation": ENCODING_UINT16 if quantize else ENCODING_FLOAT32,
+        "rotation": ENCODING_SMALLEST_THREE if quantize else
+            ENCODING_FLOAT32,
+        "scale": ENCODING_FLOAT32
+    }
+    compressed = MeruCompressedAnimation(animation.id, animation.total_time)
+    report = compressed.report
+    report.source_size = _source_size(animation)
+    max_errors = {name: 0.0 for name in TRACK_NAMES}
+
+    for bone_id, channel in build_channels(animation).items():
+        compressed_channel = MeruCompressedChannel(bone_id)
+        for name in TRACK_NAMES:
+            track = getattr(channel, name)
+            if not track.times:
+                continue
+            interpolate, error = TRACK_INTERPOLATION[name]
+            kept = reduce_keys(track.times, track.values, interpolate, error,
+                tolerances[name])
+            compressed_track = MeruCompressedTrack.encode(name,
+                [track.times[i] for i in kept],
+                [track.values[i] for i in kept], encodings[name])
+            setattr(compressed_channel, name, compressed_track)
+
+            # Measure against every source key, after quantization.
+            sampler = compressed_track.to_track()
+            for time, value in zip(track.times, track.values):
+                max_errors[name] = max(max_errors[name],
+                    error(sampler.sample(time), value))
+            report.source_key_count += len(track.times)
+            report.key_count += len(kept)
+        compressed.channels[bone_id] = compressed_channel
+
+    report.compressed_size = compressed.size()
+    report.max_position_error = max_errors["translation"]
+    report.max_rotation_error = max_errors["rotation"]
+    report.max_scale_error = max_errors["scale"]
+    return compressed
@@ -0,0 +1,101 @@
+from .archive import read_sources
+from .c3b import C3bContentKey, C3bError, C3bParser, C3bType
+from .scan import iter_sources
+
+DEDUPE_KINDS = [C3bContentKey.VERTEX_ARRAY, C3bContentKey.ANIMATION]
+
+
+class MeruDedupeRecorder:
+    # Stands in for a C3bContentStore, counts every payload key without
+    # keeping the decoded objects alive.
+    def __init__(self):
+        self.counts = {}
+
+    def get(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return None
+
+    def put(self, key, _object):
+        pass
+
+
+class MeruDedupeKindStats:
+    def __init__(self, kind):
+        self.kind = kind
+        self.payloads = 0
+        self.unique = 0
+        self.bytes = 0
+        self.shareable_bytes = 0
+
+    def to_dict(self):
+        return {
+            "payloads": self.payloads,
+            "unique": self.unique,
+            "bytes": self.bytes,
+            "shareable_bytes": self.shareable_bytes
+        }
+
+
+class MeruDedupeReport:
+    def __init__(self):
+        self.file_count = 0
+        self.file_bytes = 0
+        self.errors = []
+        self._counts = {}
+
+    def add(self, path, _bytes):
+        # Counts are only merged once the whole file parsed.
+        recorder = MeruDedupeRecorder()
+        parser = C3bParser(_bytes, store=recorder)
+        if not parser.verify_signature():
+            raise C3bError("{0} is not a c3b file.".format(path))
+        type_counts = {}
+        for ref in parser.read_header().references:
+            type_counts[ref.type] = type_counts.get(ref.type, 0) + 1
+        for index in range(type_counts.get(C3bType.MESHES, 0)):
+            parser.read_meshes(index)
+        for index in range(type_counts.get(C3bType.ANIMATIONS, 0)):
+            parser.read_animations(index)
+        for key, count in recorder.counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+        self.file_count += 1
+        self.file_bytes += len(_bytes)
+
+    def kinds(self):
+        # Every copy after the first of a payload could be shared.
+        stats = {kind: MeruDedupeKindStats(kind) for kind in DEDUPE_KINDS}
+        for key, count in self._counts.items():
+            kind_stats = stats[key[0]]
+            size = C3bContentKey.size(key)
+            kind_stats.payloads += count
+            kind_stats.unique += 1
+            kind_stats.bytes += size * count
+            kind_stats.shareable_bytes += size * (count - 1)
+        return [stats[kind] for kind in DEDUPE_KINDS]
+
+    def shareable_bytes(self):
+        return sum(kind_stats.shareable_bytes for kind_stats in self.kinds())
+
+    def to_dict(self):
+        return {
+            "files": self.file_count,
+            "bytes": self.file_bytes,
+            "shareable_bytes": self.shareable_bytes(),
+            "kinds": {kind_stats.kind: kind_stats.to_dict()
+                for kind_stats in self.kinds()},
+            "errors": [{"path": path, "error": error}
+                for path, error in self.errors]
+        }
+
+
+def dedupe_report(paths, workers=None):
+    report = MeruDedupeReport()
+    for path, _bytes, error in read_sources(iter_sources(paths), workers):
+        if error is None:
+            try:
+                report.add(path, _bytes)
+            except (C3bError, ValueError, IndexError) as parse_error:
+                error = parse_error
+        if error is not None:
+            report.errors.append((path, str(error)))
+    return report
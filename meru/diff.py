@@ -0,0 +1,314 @@
+from .archive import read_source
+from .c3b import C3bError, C3bParser, C3bType
+
+MESH_CHANGE = "mesh"
+MATERIAL_CHANGE = "material"
+NODE_CHANGE = "node"
+ANIMATION_CHANGE = "animation"
+CHANNEL_CHANGE = "channel"
+SECTION_CHANGE = "section"
+HEADER_CHANGE = "header"
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+EQUAL = "equal"
+
+MATERIAL_FIELDS = [
+    "diffuse", "ambient", "emissive", "opacity", "specular", "shininess"
+]
+KEYFRAME_FIELDS = ["rotation", "scale", "translation"]
+
+
+class MeruChange:
+    def __init__(self, kind, _id, change, fields=None):
+        self.kind = kind
+        self.id = _id
+        self.change = change
+        self.fields = fields if fields is not None else []
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "id": self.id,
+            "change": self.change,
+            "fields": self.fields
+        }
+
+
+class MeruSectionStatus:
+    def __init__(self, _type, index, _id, status):
+        self.type = _type
+        self.index = index
+        self.id = _id
+        self.status = status
+
+    def to_dict(self):
+        return {
+            "type": C3bType.name(self.type),
+            "index": self.index,
+            "id": self.id,
+            "status": self.status
+        }
+
+
+class MeruDiff:
+    def __init__(self):
+        self.sections = []
+        self.changes = []
+
+    def is_equal(self):
+        return not self.changes and \
+            all(section.status == EQUAL for section in self.sections)
+
+    def section_counts(self):
+        counts = {}
+        for section in self.sections:
+            counts[section.status] = counts.get(section.status, 0) + 1
+        return counts
+
+    def to_dict(self):
+        return {
+            "equal": self.is_equal(),
+            "sections": [section.to_dict() for section in self.sections],
+            "changes": [change.to_dict() for change in self.changes]
+        }
+
+
+def _unpack(value):
+    return None if value is None else tuple(value.unpack())
+
+
+def _diff_items(kind, a_items, b_items, fields_func):
+    # Items are matched by id, fields_func lists what differs between two
+    # items with the same id.
+    changes = []
+    a_by_id = {_id: item for _id, item in a_items}
+    b_by_id = {_id: item for _id, item in b_items}
+    for _id, item in a_items:
+        if _id not in b_by_id:
+            changes.append(MeruChange(kind, _id, REMOVED))
+            continue
+        fields = fields_func(item, b_by_id[_id])
+        if fields:
+            changes.append(MeruChange(kind, _id, CHANGED, fields))
+    for _id, item in b_items:
+        if _id not in a_by_id:
+            changes.append(MeruChange(kind, _id, ADDED))
+    return changes
+
+
+def _attribute_layout(vertex_array):
+    return [(attrib.name, attrib.type, attrib.value_count)
+        for attrib in vertex_array.attributes]
+
+
+def _mesh_fields(a, b):
+    fields = []
+    if _attribute_layout(a.vertex_array) != \
+    _attribute_layout(b.vertex_array):
+        fields.append("attributes")
+    if list(a.vertex_array.values) != list(b.vertex_array.values):
+        fields.append("vertices")
+    if list(a.indices) != list(b.indices):
+        fields.append("indices")
+    if list(a.aabb) != list(b.aabb):
+        fields.append("aabb")
+    return fields
+
+
+def _texture_key(texture):
+    return (texture.id, texture.filename, texture.type, texture.wrap_u,
+        texture.wrap_v, _unpack(texture.uv_translation),
+        _unpack(texture.uv_scale))
+
+
+def _material_fields(a, b):
+    fields = []
+    for name in MATERIAL_FIELDS:
+        a_value = getattr(a, name)
+        b_value = getattr(b, name)
+        if isinstance(a_value, float):
+            changed = a_value != b_value
+        else:
+            changed = _unpack(a_value) != _unpack(b_value)
+        if changed:
+            fields.append(name)
+    if list(map(_texture_key, a.textures)) != \
+    list(map(_texture_key, b.textures)):
+        fields.append("textures")
+    return fields
+
+
+def _flatten_nodes(nodes):
+    # (id, (parent id, node)) for every node depth first.
+    flat = []
+    stack = [(None, node) for node in reversed(nodes)]
+    while stack:
+        parent_id, node = stack.pop()
+        flat.append((node.id, (parent_id, node)))
+        stack.extend((node.id, child) for child in reversed(node.children))
+    return flat
+
+
+def _part_key(part):
+    return (part.mesh_id, part.material_id,
+        [(bone.name, _unpack(bone.inv_bind_pos)) for bone in part.bones],
+        [list(texture_indices) for texture_indices in part.uv_mapping])
+
+
+def _node_fields(a, b):
+    a_parent, a_node = a
+    b_parent, b_node = b
+    fields = []
+    if a_parent != b_parent:
+        fields.append("parent")
+    if a_node.is_skeleton != b_node.is_skeleton:
+        fields.append("skeleton")
+    if _unpack(a_node.transform) != _unpack(b_node.transform):
+        fields.append("transform")
+    if list(map(_part_key, a_node.parts)) != \
+    list(map(_part_key, b_node.parts)):
+        fields.append("parts")
+    if [child.id for child in a_node.children] != \
+    [child.id for child in b_node.children]:
+        fields.append("children")
+    return fields
+
+
+def _channel_fields(a, b):
+    if len(a) != len(b):
+        return ["keyframes"]
+    fields = []
+    if [keyframe.time for keyframe in a] != [keyframe.time for keyframe in b]:
+        fields.append("times")
+    for name in KEYFRAME_FIELDS:
+        if [_unpack(getattr(keyframe, name)) for keyframe in a] != \
+        [_unpack(getattr(keyframe, name)) for keyframe in b]:
+            fields.append(name)
+    return fields
+
+
+def _channels(anim):
+    if anim is None:
+        return []
+    return [("{0}/{1}".format(anim.id, bone), anim.get_keyframes(bone))
+        for bone in anim.get_bones()]
+
+
+def _diff_animations(a, b):
+    changes = []
+    if a is None or b is None or a.id != b.id:
+        changes.extend(_diff_items(ANIMATION_CHANGE,
+            [(a.id, a)] if a is not None else [],
+            [(b.id, b)] if b is not None else [], lambda x, y: []))
+    elif a.total_time != b.total_time:
+        changes.append(MeruChange(ANIMATION_CHANGE, a.id, CHANGED,
+            ["total_time"]))
+    changes.extend(_diff_items(CHANNEL_CHANGE, _channels(a), _channels(b),
+        _channel_fields))
+    return changes
+
+
+def _diff_section(_type, a_parser, a_index, b_parser, b_index):
+    # An index of None means the section only exists in the other file.
+    def read(parser, index, read_func):
+        return read_func(parser, index) if index is not None else []
+
+    if _type == C3bType.MESHES:
+        return _diff_items(MESH_CHANGE,
+            [(mesh.id, mesh) for mesh in read(a_parser, a_index,
+                C3bParser.read_meshes)],
+            [(mesh.id, mesh) for mesh in read(b_parser, b_index,
+                C3bParser.read_meshes)], _mesh_fields)
+    if _type == C3bType.MATERIALS:
+        return _diff_items(MATERIAL_CHANGE,
+            [(material.id, material) for material in read(a_parser,
+                a_index, C3bParser.read_materials)],
+            [(material.id, material) for material in read(b_parser,
+                b_index, C3bParser.read_materials)], _material_fields)
+    if _type == C3bType.NODES:
+        return _diff_items(NODE_CHANGE,
+            _flatten_nodes(read(a_parser, a_index, C3bParser.read_nodes)),
+            _flatten_nodes(read(b_parser, b_index, C3bParser.read_nodes)),
+            _node_fields)
+    if _type == C3bType.ANIMATIONS:
+        return _diff_animations(
+            a_parser.read_animations(a_index) if a_index is not None
+                else None,
+            b_parser.read_animations(b_index) if b_index is not None
+                else None)
+    return None
+
+
+def _diff_headers(a_header, b_header):
+    # References are compared per matched section, only the versions are
+    # left to the header.
+    fields = []
+    if a_header.major_version != b_header.major_version:
+        fields.append("major_version")
+    if a_header.minor_version != b_header.minor_version:
+        fields.append("minor_version")
+    if fields:
+        return [MeruChange(HEADER_CHANGE, "header", CHANGED, fields)]
+    return []
+
+
+def _indexed_digests(parser):
+    # Sections are matched by type and their index among sections of that
+    # type, the same way the read_* methods address them.
+    digests = {}
+    order = []
+    type_indices = {}
+    for ref, digest in parser.section_digests():
+        index = type_indices.get(ref.type, 0)
+        type_indices[ref.type] = index + 1
+        digests[(ref.type, index)] = (ref, digest)
+        order.append((ref.type, index))
+    return digests, order
+
+
+def diff_parsers(a_parser, b_parser):
+    # Only sections whose bytes differ get decoded.
+    diff = MeruDiff()
+    diff.changes.extend(_diff_headers(a_parser.read_header(),
+        b_parser.read_header()))
+    a_digests, a_order = _indexed_digests(a_parser)
+    b_digests, b_order = _indexed_digests(b_parser)
+    keys = a_order + [key for key in b_order if key not in a_digests]
+    for _type, index in keys:
+        a_ref, a_digest = a_digests.get((_type, index), (None, None))
+        b_ref, b_digest = b_digests.get((_type, index), (None, None))
+        if a_ref is None:
+            status = ADDED
+        elif b_ref is None:
+            status = REMOVED
+        else:
+            status = EQUAL if a_digest == b_digest else CHANGED
+        _id = b_ref.id if a_ref is None else a_ref.id
+        diff.sections.append(MeruSectionStatus(_type, index, _id, status))
+        section_id = "{0}/{1}".format(C3bType.name(_type), index)
+        if a_ref is not None and b_ref is not None and a_ref.id != b_ref.id:
+            diff.changes.append(MeruChange(SECTION_CHANGE, section_id,
+                CHANGED, ["id"]))
+        if status == EQUAL:
+            continue
+
+        changes = _diff_section(_type,
+            a_parser, index if a_ref is not None else None,
+            b_parser, index if b_ref is not None else None)
+        if changes is None:
+            changes = [MeruChange(SECTION_CHANGE, section_id, status)]
+        diff.changes.extend(changes)
+    return diff
+
+
+def _read_parser(path):
+    parser = C3bParser(read_source(path))
+    if not parser.verify_signature():
+        raise C3bError("{0} is not a c3b file.".format(path))
+    return parser
+
+
+def diff_files(a_path, b_path):
+    return diff_parsers(_read_parser(a_path), _read_parser(b_path))
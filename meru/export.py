@@ -0,0 +1,326 @@
+import array
+import json
+import os
+import struct
+import sys
+import zipfile
+from functools import partial
+
+from .c3b import (C3bAnimFlag, C3bError, C3bParser, C3bType,
+MeruNodeTable)
+from .incremental import MeruBuilder
+
+NPZ_FORMAT = "npz"
+FLAT_FORMAT = "flat"
+EXPORT_FORMATS = [NPZ_FORMAT, FLAT_FORMAT]
+EXPORT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_ALIGNMENT = 64
+
+# Arrays are always written little endian, whatever the host is.
+DTYPES = {
+    "B": "|u1",
+    "H": "<u2",
+    "i": "<i4",
+    "f": "<f4"
+}
+
+KEYFRAME_CHANNELS = [
+    ("rotation", C3bAnimFlag.HAS_ROTATION, 4),
+    ("scale", C3bAnimFlag.HAS_SCALE, 3),
+    ("translation", C3bAnimFlag.HAS_TRANSLATION, 3)
+]
+
+
+def npy_header(typecode, shape):
+    # Version 1.0 header, padded so the data starts 64 byte aligned.
+    shape_str = "({0},)".format(shape[0]) if len(shape) == 1 else \
+        "({0})".format(", ".join(str(size) for size in shape))
+    header = "{{'descr': '{0}', 'fortran_order': False, 'shape': {1}, }}"\
+        .format(DTYPES[typecode], shape_str)
+    length = len(NPY_MAGIC) + 2 + len(header) + 1
+    header += " " * (-length % NPY_ALIGNMENT) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(header)) + \
+        header.encode("latin1")
+
+
+def _write_values(_file, values):
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    values.tofile(_file)
+
+
+class MeruArrayWriter:
+    # Base of the export targets, every array is written out as soon as it
+    # is added and only its description is kept.
+    def __init__(self):
+        self.arrays = {}
+
+    def add_array(self, name, typecode, values, shape=None):
+        if not isinstance(values, array.array) or \
+        values.typecode != typecode:
+            values = array.array(typecode, values)
+        if shape is None:
+            shape = [len(values)]
+        self.arrays[name] = {
+            "dtype": DTYPES[typecode],
+            "shape": list(shape)
+        }
+        self._write(name, typecode, values, shape)
+
+    def close(self, manifest):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class MeruNpzWriter(MeruArrayWriter):
+    # A .npz is a zip of .npy files, numpy.load reads it as is. The
+    # manifest goes into the same archive.
+    def __init__(self, path, compress=False):
+        super().__init__()
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED
+            if compress else zipfile.ZIP_STORED, allowZip64=True)
+
+    def _write(self, name, typecode, values, shape):
+        with self._zip.open(name + ".npy", "w", force_zip64=True) as _file:
+            _file.write(npy_header(typecode, shape))
+            _write_values(_file, values)
+
+    def close(self, manifest):
+        self._zip.writestr(MANIFEST_FILENAME, json.dumps(manifest, indent=1))
+        self._zip.close()
+
+    def __exit__(self, *args):
+        if self._zip.fp is not None:
+            self._zip.close()
+
+
+class MeruFlatWriter(MeruArrayWriter):
+    # One raw little endian file per array under the output directory,
+    # shapes and types are in the manifest next to them.
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def _write(self, name, typecode, values, shape):
+        filename = name + ".bin"
+        self.arrays[name]["file"] = filename
+        path = os.path.join(self.directory, *filename.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as _file:
+            _write_values(_file, values)
+
+    def close(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, MANIFEST_FILENAME), "w") as \
+        _file:
+            json.dump(manifest, _file, indent=1)
+
+
+def _attribute_values(vertex_array, attrib, offset):
+    # De-interleaves one attribute into its own contiguous array.
+    stride = vertex_array.values_per_vertex()
+    vertex_count = vertex_array.vertex_count()
+    values = array.array("f", bytes(4 * vertex_count * attrib.value_count))
+    for component in range(attrib.value_count):
+        values[component::attrib.value_count] = array.array("f",
+            vertex_array.values[offset + component::stride])
+    return values
+
+
+def _export_meshes(parser, index, writer):
+    prefix = "meshes{0}".format(index)
+    vertex_arrays = []
+    meshes = []
+    vertex_array_indices = {}
+    for mesh in parser.read_meshes(index):
+        vertex_array = mesh.vertex_array
+        key = id(vertex_array)
+        if key not in vertex_array_indices:
+            vertex_array_indices[key] = len(vertex_arrays)
+            name = "{0}/vertex_array{1}".format(prefix, len(vertex_arrays))
+            attributes = []
+            offset = 0
+            for attrib in vertex_array.attributes:
+                writer.add_array(name + "/" + attrib.name, "f",
+                    _attribute_values(vertex_array, attrib, offset),
+                    [vertex_array.vertex_count(), attrib.value_count])
+                attributes.append({
+                    "name": attrib.name,
+                    "type": attrib.type,
+                    "array": name + "/" + attrib.name
+                })
+                offset += attrib.value_count
+            vertex_arrays.append({
+                "vertex_count": vertex_array.vertex_count(),
+                "attributes": attributes
+            })
+
+        name = "{0}/mesh{1}/indices".format(prefix, len(meshes))
+        writer.add_array(name, "H", mesh.indices)
+        meshes.append({
+            "id": mesh.id,
+            "vertex_array": vertex_array_indices[key],
+            "indices": name,
+            "aabb": list(mesh.aabb)
+        })
+    return {"vertex_arrays": vertex_arrays, "meshes": meshes}
+
+
+def _export_nodes(parser, index, writer):
+    # Nodes are flattened depth first, parents index into the same order
+    # with -1 for roots.
+    prefix = "nodes{0}".format(index)
+    table = MeruNodeTable.from_nodes(parser.read_nodes(index))
+    writer.add_array(prefix + "/parents", "i", table.parents)
+    transforms = array.array("f")
+    for node in table.nodes:
+        transforms.extend(node.transform.unpack())
+    writer.add_array(prefix + "/transforms", "f", transforms,
+        [len(table), 4, 4])
+
+    parts = []
+    for node_index, node in enumerate(table.nodes):
+        for part_index, part in enumerate(node.parts):
+            part_report = {
+                "node": node_index,
+                "mesh_id": part.mesh_id,
+                "material_id": part.material_id,
+                "bones": [bone.name for bone in part.bones],
+                "uv_mapping": [list(indices) for indices in part.uv_mapping]
+            }
+            if part.bones:
+                name = "{0}/node{1}/part{2}/bind_matrices".format(prefix,
+                    node_index, part_index)
+                matrices = array.array("f")
+                for bone in part.bones:
+                    matrices.extend(bone.inv_bind_pos.unpack())
+                writer.add_array(name, "f", matrices,
+                    [len(part.bones), 4, 4])
+                part_report["bind_matrices"] = name
+            parts.append(part_report)
+    return {
+        "ids": [node.id for node in table.nodes],
+        "skeleton": [node.is_skeleton for node in table.nodes],
+        "parents": prefix + "/parents",
+        "transforms": prefix + "/transforms",
+        "parts": parts
+    }
+
+
+def _export_animation(parser, index, writer):
+    # Every channel gets its key times and flags, and one array per
+    # component holding the values of the keys whose flag has it.
+    prefix = "animations{0}".format(index)
+    _id, total_time, bones = parser.read_animation_arrays(index)
+    channels = []
+    for bone_index, (bone, times, flags, values) in enumerate(bones):
+        name = "{0}/channel{1}".format(prefix, bone_index)
+        writer.add_array(name + "/times", "f", times)
+        writer.add_array(name + "/flags", "B", flags)
+        components = {channel: array.array("f")
+            for channel, flag, count in KEYFRAME_CHANNELS}
+        position = 0
+        for keyframe_flag in flags:
+            for channel, flag, count in KEYFRAME_CHANNELS:
+                if keyframe_flag & flag:
+                    components[channel].extend(
+                        values[position:position + count])
+                    position += count
+        channel_report = {"bone": bone, "times": name + "/times",
+            "flags": name + "/flags"}
+        for channel, flag, count in KEYFRAME_CHANNELS:
+            channel_name = "{0}/{1}".format(name, channel)
+            writer.add_array(channel_name, "f", components[channel],
+                [len(components[channel]) // count, count])
+            channel_report[channel] = channel_name
+        channels.append(channel_report)
+    return {"id": _id, "total_time": total_time, "channels": channels}
+
+
+SECTION_EXPORTS = {
+    C3bType.MESHES: ("meshes", _export_meshes),
+    C3bType.NODES: ("nodes", _export_nodes),
+    C3bType.ANIMATIONS: ("animations", _export_animation)
+}
+
+
+def export_document(parser, writer, source=None):
+    # Sections are decoded and written one at a time, so peak memory is
+    # bounded by the largest section rather than the document.
+    if not parser.verify_signature():
+        raise C3bError("{0} is not a c3b file.".format(source))
+    manifest = {"version": EXPORT_VERSION, "source": source}
+    for key, export in SECTION_EXPORTS.values():
+        manifest[key] = []
+    type_indices = {}
+    for ref in parser.read_header().references:
+        index = type_indices.get(ref.type, 0)
+        type_indices[ref.type] = index + 1
+        if ref.type in SECTION_EXPORTS:
+            key, export = SECTION_EXPORTS[ref.type]
+            section = export(parser, index, writer)
+            section["reference"] = ref.id
+            manifest[key].append(section)
+    manifest["arrays"] = writer.arrays
+    writer.close(manifest)
+    return manifest
+
+
+def _writer(_format, output, compress=False):
+    if _format == NPZ_FORMAT:
+        return MeruNpzWriter(output, compress)
+    if _format == FLAT_FORMAT:
+        return MeruFlatWriter(output)
+    raise ValueError("Unknown export format {0}.".format(_format))
+
+
+def export_path(rel_path, _format):
+    stem = os.path.splitext(rel_path)[0]
+    return stem + ".npz" if _format == NPZ_FORMAT else stem
+
+
+def export_bytes(source, _bytes, output, _format=NPZ_FORMAT,
+compress=False):
+    with _writer(_format, output, compress) as writer:
+        return export_document(C3bParser(_bytes), writer, source)
+
+
+def export_file(path, output, _format=NPZ_FORMAT, compress=False):
+    with open(path, "rb") as _file:
+        _bytes = _file.read()
+    return export_bytes(path, _bytes, output, _format, compress)
+
+
+def write_export(source_path, _bytes, output_dir, rel_path,
+_format=NPZ_FORMAT, compress=False):
+    # MeruBuilder process, a flat export lists every file it wrote so
+    # stale arrays get removed with their source.
+    output = export_path(rel_path, _format)
+    output_path = os.path.join(output_dir, output)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    manifest = export_bytes(source_path, _bytes, output_path, _format,
+        compress)
+    if _format == NPZ_FORMAT:
+        return [output]
+    return [os.path.join(output, *description["file"].split("/"))
+        for description in manifest["arrays"].values()] + \
+        [os.path.join(output, MANIFEST_FILENAME)]
+
+
+def export_tree(source_dir, output_dir, _format=NPZ_FORMAT, compress=False,
+workers=None):
+    # Only sources that changed since the last export are exported again,
+    # on a process pool.
+    builder = MeruBuilder(source_dir, output_dir, partial(write_export,
+        _format=_format, compress=compress), workers=workers)
+    return builder.build()
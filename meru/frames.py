@@ -0,0 +1,278 @@
+import math
+import operator
+from bisect import bisect_left
+from functools import partial
+from itertools import accumulate, repeat
+
+from .batch import NORMAL_ATTRIBUTE
+from .bounds import POSITION_ATTRIBUTE
+from .c3b import C3bVertexAttribute
+from .optimize import group_by_vertex_array
+
+TEX_COORD_ATTRIBUTE = "VERTEX_ATTRIB_TEX_COORD"
+TANGENT_ATTRIBUTE = "VERTEX_ATTRIB_TANGENT"
+BINORMAL_ATTRIBUTE = "VERTEX_ATTRIB_BINORMAL"
+
+AREA_WEIGHTING = "area"
+ANGLE_WEIGHTING = "angle"
+
+# Everything below works on whole columns with map() and slicing, so the
+# loops run inside the interpreter's C code instead of once per triangle
+# in Python.
+_add = operator.add
+_sub = operator.sub
+_mul = operator.mul
+_TINY = 1e-30
+
+
+def attribute_columns(vertex_array, name):
+    attrib, offset = vertex_array.get_attribute_offset(name)
+    stride = vertex_array.values_per_vertex()
+    values = vertex_array.values
+    return [list(values[offset + component::stride])
+        for component in range(attrib.value_count)]
+
+
+def set_attribute_columns(vertex_array, name, columns, _type="GL_FLOAT"):
+    # Overwrites the attribute when the vertex array has it, appends it to
+    # every vertex otherwise.
+    stride = vertex_array.values_per_vertex()
+    if vertex_array.has_attribute(name):
+        attrib, offset = vertex_array.get_attribute_offset(name)
+        if attrib.value_count != len(columns):
+            raise ValueError("{0} has {1} values, not {2}.".format(name,
+                attrib.value_count, len(columns)))
+        values = list(vertex_array.values)
+        for component, column in enumerate(columns):
+            values[offset + component::stride] = column
+        vertex_array.values = values
+        return
+
+    vertex_count = vertex_array.vertex_count()
+    new_stride = stride + len(columns)
+    values = [0.0] * (vertex_count * new_stride)
+    old_values = vertex_array.values
+    for component in range(stride):
+        values[component::new_stride] = old_values[component::stride]
+    for component, column in enumerate(columns):
+        values[stride + component::new_stride] = column
+    vertex_array.attributes = list(vertex_array.attributes) + \
+        [C3bVertexAttribute(len(columns), _type, name)]
+    vertex_array.values = values
+
+
+class _Scatter:
+    # Sums per-corner values into their vertices. Corners are sorted by
+    # vertex once, every sum is then a difference of two prefix sums.
+    def __init__(self, targets, size):
+        self.order = sorted(range(len(targets)), key=targets.__getitem__)
+        sorted_targets = list(map(targets.__getitem__, self.order))
+        bounds = list(map(partial(bisect_left, sorted_targets),
+            range(size + 1)))
+        self.starts = bounds[:-1]
+        self.ends = bounds[1:]
+
+    def add(self, values):
+        prefix = [0.0]
+        prefix.extend(accumulate(map(values.__getitem__, self.order)))
+        return list(map(_sub, map(prefix.__getitem__, self.ends),
+            map(prefix.__getitem__, self.starts)))
+
+
+def _corners(meshes):
+    indices = []
+    for mesh in meshes:
+        indices.extend(mesh.indices[:len(mesh.indices) // 3 * 3])
+    return indices
+
+
+def _gather(column, indices):
+    return list(map(column.__getitem__, indices))
+
+
+def _per_corner(a, b, c):
+    values = [0.0] * (len(a) * 3)
+    values[0::3] = a
+    values[1::3] = b
+    values[2::3] = c
+    return values
+
+
+def _cross(ax, ay, az, bx, by, bz):
+    return (list(map(_sub, map(_mul, ay, bz), map(_mul, az, by))),
+        list(map(_sub, map(_mul, az, bx), map(_mul, ax, bz))),
+        list(map(_sub, map(_mul, ax, by), map(_mul, ay, bx))))
+
+
+def _dot(ax, ay, az, bx, by, bz):
+    return list(map(_add, map(_add, map(_mul, ax, bx), map(_mul, ay, by)),
+        map(_mul, az, bz)))
+
+
+def _scale(column, factors):
+    return list(map(_mul, column, factors))
+
+
+def _normalize(x, y, z):
+    lengths = list(map(max, map(math.hypot, x, y, z), repeat(_TINY)))
+    return (list(map(operator.truediv, x, lengths)),
+        list(map(operator.truediv, y, lengths)),
+        list(map(operator.truediv, z, lengths)))
+
+
+def _edges(positions, indices):
+    # Edges from the first corner of every triangle to the other two, as
+    # [x, y, z] columns.
+    first = [_gather(column, indices[0::3]) for column in positions]
+    return [[list(map(_sub, _gather(column, indices[corner::3]), origin))
+        for column, origin in zip(positions, first)] for corner in (1, 2)]
+
+
+def _angles(cosines):
+    return list(map(math.acos, map(max, map(min, cosines, repeat(1.0)),
+        repeat(-1.0))))
+
+
+def _corner_angles(first, second):
+    third = [list(map(_sub, b, a)) for a, b in zip(first, second)]
+    lengths = [list(map(max, map(math.hypot, *edge), repeat(_TINY)))
+        for edge in (first, second, third)]
+
+    # At the second corner the edges are -first and third, at the last one
+    # -second and -third.
+    angles = [
+        _angles(map(operator.truediv, _dot(*first, *second),
+            map(_mul, lengths[0], lengths[1]))),
+        _angles(map(operator.truediv, map(operator.neg, _dot(*first,
+            *third)), map(_mul, lengths[0], lengths[2]))),
+        _angles(map(operator.truediv, _dot(*second, *third),
+            map(_mul, lengths[1], lengths[2])))]
+    return angles
+
+
+def _corner_weights(edges, weighting):
+    if weighting == AREA_WEIGHTING:
+        return None
+    if weighting == ANGLE_WEIGHTING:
+        return _per_corner(*_corner_angles(*edges))
+    raise ValueError("Unknown weighting {0}.".format(weighting))
+
+
+def _weld_targets(positions, indices):
+    # Corners point at one representative vertex per distinct position, so
+    # vertices split along uv seams still get one smooth normal.
+    keys = list(zip(*positions))
+    representative = dict(zip(keys, range(len(keys))))
+    vertex_representatives = list(map(representative.__getitem__, keys))
+    return vertex_representatives, _gather(vertex_representatives, indices)
+
+
+def _accumulate(scatter, face_columns, weights):
+    columns = [_per_corner(column, column, column) for column in face_columns]
+    if weights is not None:
+        columns = [_scale(column, weights) for column in columns]
+    return [scatter.add(column) for column in columns]
+
+
+def generate_normals(vertex_array, meshes, weighting=ANGLE_WEIGHTING,
+weld=True):
+    # Smooth vertex normals as [x, y, z] columns. Area weighting sums the
+    # unnormalized face normals, angle weighting the unit face normals
+    # times the corner angles.
+    positions = attribute_columns(vertex_array, POSITION_ATTRIBUTE)
+    indices = _corners(meshes)
+    vertex_count = vertex_array.vertex_count()
+    edges = _edges(positions, indices)
+    face_normals = _cross(*edges[0], *edges[1])
+    weights = _corner_weights(edges, weighting)
+    if weights is not None:
+        face_normals = _normalize(*face_normals)
+
+    if weld:
+        representatives, targets = _weld_targets(positions, indices)
+    else:
+        representatives, targets = None, indices
+    sums = _accumulate(_Scatter(targets, vertex_count), face_normals,
+        weights)
+    if representatives is not None:
+        sums = [_gather(column, representatives) for column in sums]
+    return list(_normalize(*sums))
+
+
+def generate_tangents(vertex_array, meshes, normals=None,
+uv_attribute=TEX_COORD_ATTRIBUTE, weighting=ANGLE_WEIGHTING):
+    # MikkTSpace style tangents and binormals as column lists: per face
+    # directions of increasing u and v, summed per vertex with the same
+    # weighting as the normals, then made orthonormal to the normal. The
+    # binormal's sign follows the uv winding, so mirrored uvs work.
+    if normals is None:
+        normals = attribute_columns(vertex_array, NORMAL_ATTRIBUTE)
+    positions = attribute_columns(vertex_array, POSITION_ATTRIBUTE)
+    uvs = attribute_columns(vertex_array, uv_attribute)[:2]
+    indices = _corners(meshes)
+    vertex_count = vertex_array.vertex_count()
+    edges = _edges(positions, indices)
+    first, second = edges
+
+    u = [_gather(uvs[0], indices[corner::3]) for corner in range(3)]
+    v = [_gather(uvs[1], indices[corner::3]) for corner in range(3)]
+    du1 = list(map(_sub, u[1], u[0]))
+    dv1 = list(map(_sub, v[1], v[0]))
+    du2 = list(map(_sub, u[2], u[0]))
+    dv2 = list(map(_sub, v[2], v[0]))
+
+    # Dividing by the uv area's determinant is left out, only its sign
+    # matters once the sums get normalized. Faces without uv area add
+    # nothing.
+    determinants = list(map(_sub, map(_mul, du1, dv2), map(_mul, du2, dv1)))
+    signs = list(map(_sub, map(operator.gt, determinants, repeat(0.0)),
+        map(operator.lt, determinants, repeat(0.0))))
+    face_tangents = [list(map(_mul, signs, map(_sub, _scale(e1, dv2),
+        _scale(e2, dv1)))) for e1, e2 in zip(first, second)]
+    face_binormals = [list(map(_mul, signs, map(_sub, _scale(e2, du1),
+        _scale(e1, du2)))) for e1, e2 in zip(first, second)]
+    weights = _corner_weights(edges, weighting)
+    if weights is not None:
+        face_tangents = _normalize(*face_tangents)
+        face_binormals = _normalize(*face_binormals)
+
+    scatter = _Scatter(indices, vertex_count)
+    tangents = _accumulate(scatter, face_tangents, weights)
+    binormals = _accumulate(scatter, face_binormals, weights)
+
+    # Gram-Schmidt against the normal.
+    projections = _dot(*normals, *tangents)
+    tangents = _normalize(*[list(map(_sub, tangent, _scale(normal,
+        projections))) for tangent, normal in zip(tangents, normals)])
+    crossed = _cross(*normals, *tangents)
+    handedness = list(map(math.copysign, repeat(1.0),
+        _dot(*crossed, *binormals)))
+    binormals = [_scale(column, handedness) for column in crossed]
+    return list(tangents), binormals
+
+
+def generate_frames(meshes, normals=True, tangents=True, replace=False,
+weighting=ANGLE_WEIGHTING):
+    # Adds normals, and tangents and binormals where there are uvs, to the
+    # vertex arrays of the meshes in place. Existing normals are only
+    # regenerated with replace. Returns the names added per vertex array.
+    added = []
+    for vertex_array, group in group_by_vertex_array(meshes):
+        names = []
+        if normals and (replace or
+        not vertex_array.has_attribute(NORMAL_ATTRIBUTE)):
+            set_attribute_columns(vertex_array, NORMAL_ATTRIBUTE,
+                generate_normals(vertex_array, group, weighting))
+            names.append(NORMAL_ATTRIBUTE)
+        if tangents and vertex_array.has_attribute(NORMAL_ATTRIBUTE) and \
+        vertex_array.has_attribute(TEX_COORD_ATTRIBUTE) and (replace or
+        not vertex_array.has_attribute(TANGENT_ATTRIBUTE)):
+            tangent_columns, binormal_columns = generate_tangents(
+                vertex_array, group, weighting=weighting)
+            set_attribute_columns(vertex_array, TANGENT_ATTRIBUTE,
+                tangent_columns)
+            set_attribute_columns(vertex_array, BINORMAL_ATTRIBUTE,
+                binormal_columns)
+            names.extend([TANGENT_ATTRIBUTE, BINORMAL_ATTRIBUTE])
+        added.append((vertex_array, names))
+    return added
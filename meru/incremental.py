@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .c3b import C3bError, C3bParser
+from .report import document_report
+from .scan import SCAN_EXTENSIONS, iter_files
+
+MANIFEST_NAME = ".meru-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def content_digest(_bytes):
+    return hashlib.blake2b(_bytes, digest_size=16).hexdigest()
+
+
+def write_report(source_path, _bytes, output_dir, rel_path):
+    parser = C3bParser(_bytes)
+    if not parser.verify_signature():
+        raise C3bError("{0} is not a c3b file.".format(source_path))
+
+    output = rel_path + ".json"
+    output_path = os.path.join(output_dir, output)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as _file:
+        json.dump(document_report(parser), _file, indent=1)
+    return [output]
+
+
+class MeruManifestEntry:
+    def __init__(self, size, mtime_ns, digest, outputs):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.outputs = outputs
+
+    def matches_stat(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def to_list(self):
+        return [self.size, self.mtime_ns, self.digest, self.outputs]
+
+
+class MeruManifest:
+    def __init__(self):
+        self.entries = {}
+
+    @classmethod
+    def load(self, path):
+        manifest = MeruManifest()
+        try:
+            with open(path, "r") as _file:
+                data = json.load(_file)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") != MANIFEST_VERSION:
+            return manifest
+        for rel_path, values in data["entries"].items():
+            manifest.entries[rel_path] = MeruManifestEntry(*values)
+        return manifest
+
+    def save(self, path):
+        data = {
+            "version": MANIFEST_VERSION,
+            "entries": {rel_path: entry.to_list()
+                for rel_path, entry in sorted(self.entries.items())}
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as _file:
+            json.dump(data, _file, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+
+class MeruBuildResult:
+    def __init__(self):
+        self.added = []
+        self.changed = []
+        self.removed = []
+        self.unchanged = 0
+        self.failed = {}
+
+    def has_changes(self):
+        return bool(self.added or self.changed or self.removed or
+            self.failed)
+
+
+def _process(process, source_path, output_dir, rel_path, digest=None):
+    # digest is passed when build() already hashed the file.
+    with open(source_path, "rb") as _file:
+        _bytes = _file.read()
+    outputs = process(source_path, _bytes, output_dir, rel_path)
+    if digest is None:
+        digest = content_digest(_bytes)
+    return digest, outputs
+
+
+class MeruBuilder:
+    def __init__(self, source_dir, output_dir, process=write_report,
+    extensions=SCAN_EXTENSIONS, workers=None):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.process = process
+        self.extensions = extensions
+        self.workers = workers
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.manifest = MeruManifest.load(self.manifest_path)
+
+    def build(self):
+        result = MeruBuildResult()
+        entries = self.manifest.entries
+        seen = set()
+        candidates = []
+
+        # Only files whose size or mtime moved are read and hashed, a no-op
+        # build costs one stat per file.
+        for path in iter_files([self.source_dir], self.extensions):
+            rel_path = os.path.relpath(path, self.source_dir)
+            seen.add(rel_path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = entries.get(rel_path)
+            if entry is not None and entry.matches_stat(stat):
+                result.unchanged += 1
+            else:
+                candidates.append((rel_path, path, stat))
+
+        for rel_path in sorted(set(entries) - seen):
+            self._remove_outputs(entries.pop(rel_path).outputs)
+            result.removed.append(rel_path)
+
+        changed = []
+        touched = False
+        for rel_path, path, stat in candidates:
+            entry = entries.get(rel_path)
+            digest = None
+            if entry is not None:
+                with open(path, "rb") as _file:
+                    digest = content_digest(_file.read())
+                if digest == entry.digest:
+                    entry.size = stat.st_size
+                    entry.mtime_ns = stat.st_mtime_ns
+                    result.unchanged += 1
+                    touched = True
+                    continue
+            changed.append((rel_path, path, stat, digest))
+
+        for (rel_path, path, stat, digest), outcome in zip(changed,
+        self._run(changed)):
+            previous = entries.pop(rel_path, None)
+            if isinstance(outcome, Exception):
+                if previous is not None:
+                    self._remove_outputs(previous.outputs)
+                result.failed[rel_path] = str(outcome)
+
+                # Remember the failing revision so it is not retried until
+                # it changes again.
+                entries[rel_path] = MeruManifestEntry(stat.st_size,
+                    stat.st_mtime_ns, None, [])
+                continue
+            digest, outputs = outcome
+            if previous is not None:
+                self._remove_outputs(set(previous.outputs) - set(outputs))
+                result.changed.append(rel_path)
+            else:
+                result.added.append(rel_path)
+            entries[rel_path] = MeruManifestEntry(stat.st_size,
+                stat.st_mtime_ns, digest, outputs)
+
+        if touched or result.has_changes():
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.manifest.save(self.manifest_path)
+        return result
+
+    def watch(self, interval=1.0, callback=None, should_stop=None):
+        while should_stop is None or not should_stop():
+            result = self.build()
+            if callback is not None and result.has_changes():
+                callback(result)
+            time.sleep(interval)
+
+    def _run(self, changed):
+        if self.workers is None or self.workers <= 1 or len(changed) < 2:
+            return [self._run_one(path, rel_path, digest)
+                for rel_path, path, stat, digest in changed]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(_process, self.process, path,
+                self.output_dir, rel_path, digest)
+                for rel_path, path, stat, digest in changed]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as error:
+                    outcomes.append(error)
+            return outcomes
+
+    def _run_one(self, path, rel_path, digest=None):
+        try:
+            return _process(self.process, path, self.output_dir, rel_path,
+                digest)
+        except Exception as error:
+            return error
+
+    def _remove_outputs(self, outputs):
+        for output in outputs:
+            try:
+                os.remove(os.path.join(self.output_dir, output))
+            except FileNotFoundError:
+                pass
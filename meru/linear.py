@@ -1,3 +1,6 @@
+import math
+
+
 class Vec2:
     def __init__(self, x, y):
         self.x = x
@@ -48,3 +51,120 @@ class Mat44(Mat):
 
     def __init__(self, values):
         super().__init__(values)
+
+    @classmethod
+    def identity(self):
+        return Mat44(list(MAT44_IDENTITY))
+
+    @classmethod
+    def from_trs(self, translation, rotation, scale):
+        return Mat44(mat44_from_trs(translation.unpack(), rotation.unpack(),
+            scale.unpack()))
+
+    def multiply(self, other):
+        return Mat44(mat44_multiply(self.values, other.values))
+
+    def transform_point(self, point):
+        return Vec3(*mat44_transform_point(self.values, point.unpack()))
+
+
+# Matrices are stored the way c3b stores them: 16 floats in column-major
+# order, so translation lives in values[12:15] and a * b applies b first.
+MAT44_IDENTITY = (
+    1.0, 0.0, 0.0, 0.0,
+    0.0, 1.0, 0.0, 0.0,
+    0.0, 0.0, 1.0, 0.0,
+    0.0, 0.0, 0.0, 1.0
+)
+
+
+def mat44_multiply(a, b):
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12, a13, a14, a15 = a
+    values = []
+    for column in range(0, 16, 4):
+        b0, b1, b2, b3 = b[column:column + 4]
+        values.append(a0 * b0 + a4 * b1 + a8 * b2 + a12 * b3)
+        values.append(a1 * b0 + a5 * b1 + a9 * b2 + a13 * b3)
+        values.append(a2 * b0 + a6 * b1 + a10 * b2 + a14 * b3)
+        values.append(a3 * b0 + a7 * b1 + a11 * b2 + a15 * b3)
+    return values
+
+
+def mat44_transform_point(m, point):
+    x, y, z = point
+    return (m[0] * x + m[4] * y + m[8] * z + m[12],
+        m[1] * x + m[5] * y + m[9] * z + m[13],
+        m[2] * x + m[6] * y + m[10] * z + m[14])
+
+
+def mat44_from_trs(translation, rotation, scale):
+    x, y, z, w = rotation
+    sx, sy, sz = scale
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    return [
+        (1.0 - 2.0 * (yy + zz)) * sx, 2.0 * (xy + wz) * sx,
+        2.0 * (xz - wy) * sx, 0.0,
+        2.0 * (xy - wz) * sy, (1.0 - 2.0 * (xx + zz)) * sy,
+        2.0 * (yz + wx) * sy, 0.0,
+        2.0 * (xz + wy) * sz, 2.0 * (yz - wx) * sz,
+        (1.0 - 2.0 * (xx + yy)) * sz, 0.0,
+        translation[0], translation[1], translation[2], 1.0
+    ]
+
+
+def mat44_decompose(m):
+    translation = (m[12], m[13], m[14])
+    sx = math.sqrt(m[0] * m[0] + m[1] * m[1] + m[2] * m[2])
+    sy = math.sqrt(m[4] * m[4] + m[5] * m[5] + m[6] * m[6])
+    sz = math.sqrt(m[8] * m[8] + m[9] * m[9] + m[10] * m[10])
+    # A mirrored basis keeps its handedness in the x scale.
+    determinant = (m[0] * (m[5] * m[10] - m[9] * m[6]) -
+        m[4] * (m[1] * m[10] - m[9] * m[2]) +
+        m[8] * (m[1] * m[6] - m[5] * m[2]))
+    if determinant < 0:
+        sx = -sx
+    scale = (sx, sy, sz)
+
+    if sx == 0.0 or sy == 0.0 or sz == 0.0:
+        return translation, (0.0, 0.0, 0.0, 1.0), scale
+    r00, r10, r20 = m[0] / sx, m[1] / sx, m[2] / sx
+    r01, r11, r21 = m[4] / sy, m[5] / sy, m[6] / sy
+    r02, r12, r22 = m[8] / sz, m[9] / sz, m[10] / sz
+    trace = r00 + r11 + r22
+    if trace > 0.0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        rotation = ((r21 - r12) * s, (r02 - r20) * s, (r10 - r01) * s,
+            0.25 / s)
+    elif r00 > r11 and r00 > r22:
+        s = 2.0 * math.sqrt(1.0 + r00 - r11 - r22)
+        rotation = (0.25 * s, (r01 + r10) / s, (r02 + r20) / s,
+            (r21 - r12) / s)
+    elif r11 > r22:
+        s = 2.0 * math.sqrt(1.0 + r11 - r00 - r22)
+        rotation = ((r01 + r10) / s, 0.25 * s, (r12 + r21) / s,
+            (r02 - r20) / s)
+    else:
+        s = 2.0 * math.sqrt(1.0 + r22 - r00 - r11)
+        rotation = ((r02 + r20) / s, (r12 + r21) / s, 0.25 * s,
+            (r10 - r01) / s)
+    return translation, rotation, scale
+
+
+def quat_nlerp(a, b, t):
+    # Take the short way around.
+    if a[0] * b[0] + a[1] * b[1] + a[2] * b[2] + a[3] * b[3] < 0.0:
+        b = (-b[0], -b[1], -b[2], -b[3])
+    x = a[0] + (b[0] - a[0]) * t
+    y = a[1] + (b[1] - a[1]) * t
+    z = a[2] + (b[2] - a[2]) * t
+    w = a[3] + (b[3] - a[3]) * t
+    length = math.sqrt(x * x + y * y + z * z + w * w)
+    if length == 0.0:
+        return (0.0, 0.0, 0.0, 1.0)
+    return (x / length, y / length, z / length, w / length)
+
+
+def vec_lerp(a, b, t):
+    return tuple(value + (other - value) * t for value, other in zip(a, b))
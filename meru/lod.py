@@ -0,0 +1,448 @@
+import heapq
+import operator
+import os
+
+from .batch import NORMAL_ATTRIBUTE
+from .bounds import (BLEND_INDEX_ATTRIBUTE, BLEND_WEIGHT_ATTRIBUTE,
+POSITION_ATTRIBUTE, compute_aabb)
+from .c3b import C3bMesh, C3bParser, C3bType, C3bVertexArray, C3bWriter
+from .optimize import group_by_vertex_array
+
+TEX_COORD_PREFIX = "VERTEX_ATTRIB_TEX_COORD"
+DEFAULT_LOD_RATIOS = [0.5, 0.25]
+
+# Weights of attribute changes relative to the geometric error, and of the
+# planes keeping open borders in place.
+LOD_NORMAL_WEIGHT = 1.0
+LOD_UV_WEIGHT = 1.0
+LOD_SKIN_WEIGHT = 4.0
+LOD_BORDER_WEIGHT = 10.0
+
+# Collapses turning a remaining triangle's normal further than this cosine
+# are rejected as fold overs.
+LOD_FLIP_COSINE = 0.2
+
+
+def _sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0])
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _plane_quadric(normal, point, weight):
+    # Symmetric 4x4 quadric of the plane, upper triangle row by row.
+    a, b, c = normal
+    d = -_dot(normal, point)
+    return [weight * a * a, weight * a * b, weight * a * c, weight * a * d,
+        weight * b * b, weight * b * c, weight * b * d,
+        weight * c * c, weight * c * d, weight * d * d]
+
+
+def _add_quadric(target, quadric):
+    target[:] = map(operator.add, target, quadric)
+
+
+def _attribute_columns(vertex_array, names, weight):
+    columns = []
+    offset = 0
+    for attrib in vertex_array.attributes:
+        if attrib.name in names or (TEX_COORD_PREFIX in names and
+        attrib.name.startswith(TEX_COORD_PREFIX)):
+            columns.extend((offset + component, weight ** 0.5)
+                for component in range(attrib.value_count))
+        offset += attrib.value_count
+    return columns
+
+
+class MeruDecimator:
+    # Half-edge collapses ordered by quadric error. A vertex is merged into
+    # a neighbor that keeps its position and attributes, so the vertices
+    # that remain, skinning data included, stay valid as they are.
+    def __init__(self, vertex_array, meshes, normal_weight=LOD_NORMAL_WEIGHT,
+    uv_weight=LOD_UV_WEIGHT, skin_weight=LOD_SKIN_WEIGHT,
+    border_weight=LOD_BORDER_WEIGHT):
+        self.vertex_array = vertex_array
+        self.meshes = list(meshes)
+        self.skin_weight = skin_weight
+        self.max_error = 0.0
+        values = vertex_array.values
+        stride = vertex_array.values_per_vertex()
+        vertex_count = vertex_array.vertex_count()
+        attrib, position = vertex_array.get_attribute_offset(
+            POSITION_ATTRIBUTE)
+        self._positions = [tuple(values[start + position:start + position + 3])
+            for start in range(0, vertex_count * stride, stride)]
+
+        # Weighted normal and uv values every collapse is charged for
+        # changing, blend weights per bone for the skinning cost.
+        columns = _attribute_columns(vertex_array, [NORMAL_ATTRIBUTE],
+            normal_weight) + _attribute_columns(vertex_array,
+            [TEX_COORD_PREFIX], uv_weight)
+        self._features = [tuple(values[start + offset] * scale
+            for offset, scale in columns)
+            for start in range(0, vertex_count * stride, stride)]
+        self._skins = self._read_skins(vertex_array, vertex_count, stride)
+
+        # Triangles as a flat corner array with the mesh each belongs to,
+        # and array backed vertex -> triangle adjacency.
+        corners = []
+        self._triangle_meshes = []
+        for mesh_index, mesh in enumerate(self.meshes):
+            count = len(mesh.indices) // 3
+            corners.extend(mesh.indices[:count * 3])
+            self._triangle_meshes.extend([mesh_index] * count)
+        self._corners = corners
+        triangle_total = len(corners) // 3
+        self._alive = [True] * triangle_total
+        self._vertex_triangles = [[] for vertex in range(vertex_count)]
+        self.triangle_count = 0
+        for triangle in range(triangle_total):
+            a, b, c = corners[triangle * 3:triangle * 3 + 3]
+            if a == b or b == c or a == c:
+                self._alive[triangle] = False
+                continue
+            self.triangle_count += 1
+            for vertex in (a, b, c):
+                self._vertex_triangles[vertex].append(triangle)
+        self.source_triangle_count = self.triangle_count
+
+        # Vertices sharing their position with another one sit on an
+        # attribute seam, moving only one side would open a crack.
+        position_counts = {}
+        for vertex, triangles in enumerate(self._vertex_triangles):
+            if triangles:
+                point = self._positions[vertex]
+                position_counts[point] = position_counts.get(point, 0) + 1
+        self._locked = [position_counts.get(point, 0) > 1
+            for point in self._positions]
+
+        self._merged = list(range(vertex_count))
+        self._stamps = [0] * vertex_count
+        self._areas = [0.0] * vertex_count
+        self._quadrics = [[0.0] * 10 for vertex in range(vertex_count)]
+        self._build_quadrics(border_weight)
+
+        used = [point for vertex, point in enumerate(self._positions)
+            if self._vertex_triangles[vertex]]
+        if used:
+            lower = [min(point[axis] for point in used) for axis in range(3)]
+            upper = [max(point[axis] for point in used) for axis in range(3)]
+            self._scale = sum((upper[axis] - lower[axis]) ** 2
+                for axis in range(3))
+        else:
+            self._scale = 0.0
+
+        # Both directions of every edge, each edge is seen from its lower
+        # vertex only.
+        self._heap = []
+        for vertex in range(vertex_count):
+            self._heap.extend(self._edge_entries(vertex, vertex))
+        heapq.heapify(self._heap)
+
+    def _read_skins(self, vertex_array, vertex_count, stride):
+        if not (vertex_array.has_attribute(BLEND_WEIGHT_ATTRIBUTE) and
+        vertex_array.has_attribute(BLEND_INDEX_ATTRIBUTE)):
+            return None
+        values = vertex_array.values
+        weight_attrib, weight_offset = vertex_array.get_attribute_offset(
+            BLEND_WEIGHT_ATTRIBUTE)
+        index_attrib, index_offset = vertex_array.get_attribute_offset(
+            BLEND_INDEX_ATTRIBUTE)
+        influence_count = min(weight_attrib.value_count,
+            index_attrib.value_count)
+        skins = []
+        for start in range(0, vertex_count * stride, stride):
+            skin = {}
+            for influence in range(influence_count):
+                weight = values[start + weight_offset + influence]
+                if weight != 0.0:
+                    bone = int(values[start + index_offset + influence])
+                    skin[bone] = skin.get(bone, 0.0) + weight
+            skins.append(skin)
+        return skins
+
+    def _build_quadrics(self, border_weight):
+        corners = self._corners
+        positions = self._positions
+        edge_triangles = {}
+        for triangle, alive in enumerate(self._alive):
+            if not alive:
+                continue
+            triangle_corners = corners[triangle * 3:triangle * 3 + 3]
+            a, b, c = [positions[vertex] for vertex in triangle_corners]
+            normal = _cross(_sub(b, a), _sub(c, a))
+            length = _dot(normal, normal) ** 0.5
+            if length == 0.0:
+                continue
+            unit = (normal[0] / length, normal[1] / length,
+                normal[2] / length)
+            area = length * 0.5
+            quadric = _plane_quadric(unit, a, area)
+            for vertex in triangle_corners:
+                _add_quadric(self._quadrics[vertex], quadric)
+                self._areas[vertex] += area / 3.0
+            for corner in range(3):
+                first = triangle_corners[corner]
+                second = triangle_corners[(corner + 1) % 3]
+                key = (first, second) if first < second else (second, first)
+                if key in edge_triangles:
+                    edge_triangles[key] = None
+                else:
+                    edge_triangles[key] = unit
+
+        # A plane through every open border edge, perpendicular to its
+        # triangle, keeps the outline from shrinking.
+        for (first, second), unit in edge_triangles.items():
+            if unit is None:
+                continue
+            edge = _sub(positions[second], positions[first])
+            perpendicular = _cross(edge, unit)
+            length = _dot(perpendicular, perpendicular) ** 0.5
+            if length == 0.0:
+                continue
+            perpendicular = (perpendicular[0] / length,
+                perpendicular[1] / length, perpendicular[2] / length)
+            quadric = _plane_quadric(perpendicular, positions[first],
+                border_weight * _dot(edge, edge))
+            _add_quadric(self._quadrics[first], quadric)
+            _add_quadric(self._quadrics[second], quadric)
+
+    def _neighbors(self, vertex):
+        corners = self._corners
+        neighbors = set()
+        for triangle in self._vertex_triangles[vertex]:
+            neighbors.update(corners[triangle * 3:triangle * 3 + 3])
+        neighbors.discard(vertex)
+        return neighbors
+
+    def _cost(self, source, target):
+        # Error of the summed quadrics at the target's position.
+        x, y, z = self._positions[target]
+        a = self._quadrics[source]
+        b = self._quadrics[target]
+        cost = ((a[0] + b[0]) * x * x + (a[4] + b[4]) * y * y +
+            (a[7] + b[7]) * z * z + 2.0 * ((a[1] + b[1]) * x * y +
+            (a[2] + b[2]) * x * z + (a[5] + b[5]) * y * z +
+            (a[3] + b[3]) * x + (a[6] + b[6]) * y + (a[8] + b[8]) * z) +
+            a[9] + b[9])
+
+        # The source's attributes are replaced by the target's over the
+        # area the source covered.
+        difference = 0.0
+        for a, b in zip(self._features[source], self._features[target]):
+            difference += (a - b) * (a - b)
+        if self._skins is not None:
+            source_skin = self._skins[source]
+            target_skin = self._skins[target]
+            skin_difference = 0.0
+            for bone in source_skin.keys() | target_skin.keys():
+                delta = source_skin.get(bone, 0.0) - \
+                    target_skin.get(bone, 0.0)
+                skin_difference += delta * delta
+            difference += self.skin_weight * skin_difference
+        return max(cost, 0.0) + \
+            difference * self._areas[source] * self._scale
+
+    def _edge_entries(self, vertex, lower=-1):
+        # Heap entries for collapsing the vertex's edges either way,
+        # skipping neighbors up to lower.
+        stamps = self._stamps
+        locked = self._locked
+        cost = self._cost
+        entries = []
+        for neighbor in self._neighbors(vertex):
+            if neighbor <= lower:
+                continue
+            if not locked[vertex]:
+                entries.append((cost(vertex, neighbor), vertex, neighbor,
+                    stamps[vertex], stamps[neighbor]))
+            if not locked[neighbor]:
+                entries.append((cost(neighbor, vertex), neighbor, vertex,
+                    stamps[neighbor], stamps[vertex]))
+        return entries
+
+    def _can_collapse(self, source, target):
+        corners = self._corners
+        positions = self._positions
+        shared = []
+        for triangle in self._vertex_triangles[source]:
+            triangle_corners = corners[triangle * 3:triangle * 3 + 3]
+            if target in triangle_corners:
+                shared.append(triangle)
+                continue
+
+            # Reject fold overs of the triangles that stay.
+            points = [positions[vertex] for vertex in triangle_corners]
+            before = _cross(_sub(points[1], points[0]),
+                _sub(points[2], points[0]))
+            points[triangle_corners.index(source)] = positions[target]
+            after = _cross(_sub(points[1], points[0]),
+                _sub(points[2], points[0]))
+            dot = _dot(before, after)
+            if dot <= 0.0 or dot * dot < LOD_FLIP_COSINE * LOD_FLIP_COSINE * \
+            _dot(before, before) * _dot(after, after):
+                return False
+        if not shared:
+            return False
+
+        # Link condition, the two vertices may only have the vertices
+        # opposite the collapsed edge as common neighbors, anything else
+        # would pinch the surface into a non manifold one.
+        opposite = set()
+        for triangle in shared:
+            opposite.update(corners[triangle * 3:triangle * 3 + 3])
+        common = self._neighbors(source) & self._neighbors(target)
+        return common <= opposite
+
+    def _collapse(self, source, target):
+        corners = self._corners
+        vertex_triangles = self._vertex_triangles
+        for triangle in vertex_triangles[source]:
+            start = triangle * 3
+            triangle_corners = corners[start:start + 3]
+            if target in triangle_corners:
+                self._alive[triangle] = False
+                self.triangle_count -= 1
+                for vertex in triangle_corners:
+                    if vertex != source:
+                        vertex_triangles[vertex].remove(triangle)
+            else:
+                corners[start + triangle_corners.index(source)] = target
+                vertex_triangles[target].append(triangle)
+        vertex_triangles[source] = []
+        self._merged[source] = target
+        _add_quadric(self._quadrics[target], self._quadrics[source])
+        self._areas[target] += self._areas[source]
+        self._stamps[target] += 1
+        for entry in self._edge_entries(target):
+            heapq.heappush(self._heap, entry)
+
+    def decimate(self, target_triangles):
+        # Can be called again with fewer triangles to continue from the
+        # current state.
+        heap = self._heap
+        merged = self._merged
+        stamps = self._stamps
+        while self.triangle_count > target_triangles and heap:
+            cost, source, target, source_stamp, target_stamp = \
+                heapq.heappop(heap)
+            if merged[source] != source or merged[target] != target or \
+            stamps[source] != source_stamp or stamps[target] != target_stamp:
+                continue
+            if not self._can_collapse(source, target):
+                continue
+            self.max_error = max(self.max_error, cost)
+            self._collapse(source, target)
+        return self.triangle_count
+
+    def result(self):
+        # A compacted copy of the current state, vertices in first use
+        # order and every mesh keeping its id.
+        corners = self._corners
+        stride = self.vertex_array.values_per_vertex()
+        values = self.vertex_array.values
+        remap = {}
+        new_values = []
+        mesh_indices = [[] for mesh in self.meshes]
+        for triangle, alive in enumerate(self._alive):
+            if not alive:
+                continue
+            indices = mesh_indices[self._triangle_meshes[triangle]]
+            for vertex in corners[triangle * 3:triangle * 3 + 3]:
+                new_index = remap.get(vertex)
+                if new_index is None:
+                    new_index = len(remap)
+                    remap[vertex] = new_index
+                    new_values.extend(
+                        values[vertex * stride:(vertex + 1) * stride])
+                indices.append(new_index)
+
+        vertex_array = C3bVertexArray()
+        vertex_array.attributes = list(self.vertex_array.attributes)
+        vertex_array.values = new_values
+        meshes = []
+        for mesh, indices in zip(self.meshes, mesh_indices):
+            copy = C3bMesh(mesh.id, vertex_array)
+            copy.indices = indices
+            copy.aabb = compute_aabb(vertex_array, indices) if indices \
+                else list(mesh.aabb)
+            meshes.append(copy)
+        return vertex_array, meshes
+
+
+class MeruLod:
+    def __init__(self, ratio):
+        self.ratio = ratio
+        self.meshes = []
+        self.triangle_count = 0
+        self.source_triangle_count = 0
+        self.max_error = 0.0
+
+
+def generate_lods(meshes, ratios=DEFAULT_LOD_RATIOS, **weights):
+    # One MeruLod per ratio with the meshes in their original order. Every
+    # vertex array is decimated progressively from the largest ratio down.
+    ordered = sorted(set(ratios), reverse=True)
+    lods = {ratio: MeruLod(ratio) for ratio in ordered}
+    positions = {id(mesh): index for index, mesh in enumerate(meshes)}
+    lod_meshes = {ratio: [None] * len(meshes) for ratio in ordered}
+    for vertex_array, group in group_by_vertex_array(meshes):
+        decimator = MeruDecimator(vertex_array, group, **weights)
+        for ratio in ordered:
+            decimator.decimate(int(decimator.source_triangle_count * ratio))
+            lod = lods[ratio]
+            lod.triangle_count += decimator.triangle_count
+            lod.source_triangle_count += decimator.source_triangle_count
+            lod.max_error = max(lod.max_error, decimator.max_error)
+            lod_vertex_array, decimated = decimator.result()
+            for mesh, lod_mesh in zip(group, decimated):
+                lod_meshes[ratio][positions[id(mesh)]] = lod_mesh
+    for ratio in ordered:
+        lods[ratio].meshes = lod_meshes[ratio]
+    return [lods[ratio] for ratio in ratios]
+
+
+def lod_writers(parser, ratios=DEFAULT_LOD_RATIOS, **weights):
+    # A (lods, writer) pair per ratio, with a MeruLod per meshes section.
+    # Every other section is copied as it is.
+    mesh_count = sum(1 for ref in parser.read_header().references
+        if ref.type == C3bType.MESHES)
+    section_lods = [generate_lods(parser.read_meshes(index), ratios,
+        **weights) for index in range(mesh_count)]
+    writers = []
+    for lod_index in range(len(ratios)):
+        lods = [_lods[lod_index] for _lods in section_lods]
+        writers.append((lods, C3bWriter.from_parser(parser,
+            [lod.meshes for lod in lods])))
+    return writers
+
+
+def lod_path(path, lod_index, output_dir=None):
+    stem, extension = os.path.splitext(os.path.basename(path))
+    directory = output_dir if output_dir is not None else \
+        os.path.dirname(path)
+    return os.path.join(directory, "{0}_lod{1}{2}".format(stem,
+        lod_index + 1, extension))
+
+
+def write_lods(path, ratios=DEFAULT_LOD_RATIOS, output_dir=None, **weights):
+    # Writes name_lod1.c3b, name_lod2.c3b... and returns their paths with
+    # the LODs of each.
+    parser = C3bParser.from_file(path)
+    outputs = []
+    for lod_index, (lods, writer) in enumerate(lod_writers(parser, ratios,
+    **weights)):
+        output_path = lod_path(path, lod_index, output_dir)
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "wb") as _file:
+            _file.write(writer.to_bytes())
+        outputs.append((output_path, lods))
+    return outputs
@@ -0,0 +1,289 @@
+from .c3b import C3bMesh, C3bVertexArray
+
+DEFAULT_CACHE_SIZE = 32
+
+# Scoring constants from Tom Forsyth's linear-speed vertex cache
+# optimisation.
+FORSYTH_CACHE_DECAY_POWER = 1.5
+FORSYTH_LAST_TRI_SCORE = 0.75
+FORSYTH_VALENCE_BOOST_SCALE = 2.0
+FORSYTH_VALENCE_BOOST_POWER = 0.5
+FORSYTH_MAX_VALENCE = 64
+
+
+class MeruPassReport:
+    def __init__(self, name, acmr_before, acmr_after, vertex_count_before,
+    vertex_count_after):
+        self.name = name
+        self.acmr_before = acmr_before
+        self.acmr_after = acmr_after
+        self.vertex_count_before = vertex_count_before
+        self.vertex_count_after = vertex_count_after
+
+
+class MeruOptimizeResult:
+    def __init__(self, vertex_array, meshes):
+        self.vertex_array = vertex_array
+        self.meshes = meshes
+        self.reports = []
+
+
+def compute_acmr(indices, cache_size=DEFAULT_CACHE_SIZE):
+    triangle_count = len(indices) // 3
+    if triangle_count == 0:
+        return 0.0
+
+    # Simulate a FIFO post-transform cache, which is what most hardware
+    # behaves like.
+    cache = [-1] * cache_size
+    cached = set()
+    head = 0
+    misses = 0
+    for index in indices[:triangle_count * 3]:
+        if index not in cached:
+            misses += 1
+            evicted = cache[head]
+            if evicted >= 0:
+                cached.discard(evicted)
+            cache[head] = index
+            cached.add(index)
+            head = (head + 1) % cache_size
+    return misses / triangle_count
+
+
+def meshes_acmr(meshes, cache_size=DEFAULT_CACHE_SIZE):
+    triangle_count = 0
+    weighted = 0.0
+    for mesh in meshes:
+        count = len(mesh.indices) // 3
+        weighted += compute_acmr(mesh.indices, cache_size) * count
+        triangle_count += count
+    if triangle_count == 0:
+        return 0.0
+    return weighted / triangle_count
+
+
+def _copy_mesh(mesh, vertex_array, indices):
+    copy = C3bMesh(mesh.id, vertex_array)
+    copy.indices = indices
+    copy.aabb = list(mesh.aabb)
+    return copy
+
+
+def _copy_vertex_array(vertex_array, values):
+    copy = C3bVertexArray()
+    copy.attributes = list(vertex_array.attributes)
+    copy.values = values
+    return copy
+
+
+def weld_vertices(vertex_array, meshes):
+    stride = vertex_array.values_per_vertex()
+    values = vertex_array.values
+    remap = []
+    lookup = {}
+    welded_values = []
+
+    # Vertices are identical only if every attribute matches, so the whole
+    # interleaved slice is the key.
+    for offset in range(0, len(values), stride):
+        key = tuple(values[offset:offset + stride])
+        index = lookup.get(key)
+        if index is None:
+            index = len(lookup)
+            lookup[key] = index
+            welded_values.extend(key)
+        remap.append(index)
+
+    welded = _copy_vertex_array(vertex_array, welded_values)
+    welded_meshes = [_copy_mesh(mesh, welded,
+        [remap[index] for index in mesh.indices]) for mesh in meshes]
+    return welded, welded_meshes
+
+
+def _forsyth_tables(cache_size):
+    cache_scores = []
+    for position in range(cache_size):
+        if position < 3:
+            cache_scores.append(FORSYTH_LAST_TRI_SCORE)
+        else:
+            scale = 1.0 / (cache_size - 3)
+            score = 1.0 - (position - 3) * scale
+            cache_scores.append(score ** FORSYTH_CACHE_DECAY_POWER)
+
+    valence_scores = [0.0]
+    for valence in range(1, FORSYTH_MAX_VALENCE + 1):
+        valence_scores.append(FORSYTH_VALENCE_BOOST_SCALE *
+            valence ** -FORSYTH_VALENCE_BOOST_POWER)
+    return cache_scores, valence_scores
+
+
+def optimize_vertex_cache(indices, vertex_count,
+cache_size=DEFAULT_CACHE_SIZE):
+    triangle_count = len(indices) // 3
+    if triangle_count == 0:
+        return list(indices)
+    cache_scores, valence_scores = _forsyth_tables(cache_size)
+
+    # Array backed vertex -> triangle adjacency.
+    valence = [0] * vertex_count
+    for index in indices[:triangle_count * 3]:
+        valence[index] += 1
+    adjacency_offsets = [0] * (vertex_count + 1)
+    for vertex in range(vertex_count):
+        adjacency_offsets[vertex + 1] = (adjacency_offsets[vertex] +
+            valence[vertex])
+    adjacency = [0] * adjacency_offsets[vertex_count]
+    fill = list(adjacency_offsets[:vertex_count])
+    for triangle in range(triangle_count):
+        for corner in range(3):
+            vertex = indices[triangle * 3 + corner]
+            adjacency[fill[vertex]] = triangle
+            fill[vertex] += 1
+
+    remaining = valence
+    cache_positions = [-1] * vertex_count
+
+    def vertex_score(vertex):
+        count = remaining[vertex]
+        if count == 0:
+            return -1.0
+        position = cache_positions[vertex]
+        score = cache_scores[position] if position >= 0 else 0.0
+        return score + valence_scores[min(count, FORSYTH_MAX_VALENCE)]
+
+    vertex_scores = [vertex_score(vertex) for vertex in range(vertex_count)]
+    triangle_scores = [vertex_scores[indices[triangle * 3]] +
+        vertex_scores[indices[triangle * 3 + 1]] +
+        vertex_scores[indices[triangle * 3 + 2]]
+        for triangle in range(triangle_count)]
+    emitted = [False] * triangle_count
+
+    output = []
+    cache = []
+    best_triangle = max(range(triangle_count),
+        key=triangle_scores.__getitem__)
+    scan_cursor = 0
+    while best_triangle >= 0:
+        emitted[best_triangle] = True
+        corners = indices[best_triangle * 3:best_triangle * 3 + 3]
+        output.extend(corners)
+
+        for vertex in corners:
+            offset = adjacency_offsets[vertex]
+            end = offset + remaining[vertex]
+            for position in range(offset, end):
+                if adjacency[position] == best_triangle:
+                    adjacency[position] = adjacency[end - 1]
+                    break
+            remaining[vertex] -= 1
+
+        # Move the triangle's vertices to the front of the LRU cache,
+        # vertices pushed out of the cache are rescored as well.
+        new_cache = []
+        for vertex in corners:
+            if vertex not in new_cache:
+                new_cache.append(vertex)
+        for vertex in cache:
+            if vertex not in corners:
+                new_cache.append(vertex)
+        for vertex in new_cache[cache_size:]:
+            cache_positions[vertex] = -1
+        cache = new_cache[:cache_size]
+        for position, vertex in enumerate(cache):
+            cache_positions[vertex] = position
+
+        best_triangle = -1
+        best_score = -1.0
+        touched = set()
+        for vertex in new_cache:
+            score = vertex_score(vertex)
+            delta = score - vertex_scores[vertex]
+            vertex_scores[vertex] = score
+            offset = adjacency_offsets[vertex]
+            for position in range(offset, offset + remaining[vertex]):
+                triangle = adjacency[position]
+                triangle_scores[triangle] += delta
+                touched.add(triangle)
+        for triangle in touched:
+            if triangle_scores[triangle] > best_score:
+                best_score = triangle_scores[triangle]
+                best_triangle = triangle
+
+        if best_triangle < 0:
+            while scan_cursor < triangle_count and emitted[scan_cursor]:
+                scan_cursor += 1
+            if scan_cursor < triangle_count:
+                best_triangle = scan_cursor
+    return output
+
+
+def optimize_vertex_fetch(vertex_array, meshes):
+    stride = vertex_array.values_per_vertex()
+    values = vertex_array.values
+    remap = [-1] * vertex_array.vertex_count()
+    fetched_values = []
+    next_index = 0
+
+    # Vertices are renumbered in first-use order, vertices that none of the
+    # meshes reference are dropped.
+    for mesh in meshes:
+        for index in mesh.indices:
+            if remap[index] < 0:
+                remap[index] = next_index
+                next_index += 1
+                fetched_values.extend(
+                    values[index * stride:(index + 1) * stride])
+
+    fetched = _copy_vertex_array(vertex_array, fetched_values)
+    fetched_meshes = [_copy_mesh(mesh, fetched,
+        [remap[index] for index in mesh.indices]) for mesh in meshes]
+    return fetched, fetched_meshes
+
+
+def group_by_vertex_array(meshes):
+    groups = []
+    lookup = {}
+    for mesh in meshes:
+        key = id(mesh.vertex_array)
+        if key not in lookup:
+            lookup[key] = len(groups)
+            groups.append((mesh.vertex_array, []))
+        groups[lookup[key]][1].append(mesh)
+    return groups
+
+
+def optimize_vertex_array(vertex_array, meshes, cache_size=DEFAULT_CACHE_SIZE,
+weld=True, vertex_cache=True, vertex_fetch=True):
+    result = MeruOptimizeResult(vertex_array, list(meshes))
+
+    def run_pass(name, pass_func):
+        acmr_before = meshes_acmr(result.meshes, cache_size)
+        vertex_count_before = result.vertex_array.vertex_count()
+        result.vertex_array, result.meshes = pass_func(result.vertex_array,
+            result.meshes)
+        result.reports.append(MeruPassReport(name, acmr_before,
+            meshes_acmr(result.meshes, cache_size), vertex_count_before,
+            result.vertex_array.vertex_count()))
+
+    def cache_pass(_vertex_array, _meshes):
+        vertex_count = _vertex_array.vertex_count()
+        return _vertex_array, [_copy_mesh(mesh, _vertex_array,
+            optimize_vertex_cache(mesh.indices, vertex_count, cache_size))
+            for mesh in _meshes]
+
+    if weld:
+        run_pass("weld", weld_vertices)
+    if vertex_cache:
+        run_pass("vertex_cache", cache_pass)
+    if vertex_fetch:
+        run_pass("vertex_fetch", optimize_vertex_fetch)
+    return result
+
+
+def optimize_meshes(meshes, cache_size=DEFAULT_CACHE_SIZE, **passes):
+    results = []
+    for vertex_array, group in group_by_vertex_array(meshes):
+        results.append(optimize_vertex_array(vertex_array, group, cache_size,
+            **passes))
+    return results
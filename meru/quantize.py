@@ -0,0 +1,259 @@
+import struct
+
+from .c3b import C3bVertexArray, C3bVertexAttribute
+
+
+class MeruVertexFormat:
+    def __init__(self, name, struct_format, gl_type, normalized, minimum,
+    maximum):
+        self.name = name
+        self.struct_format = struct_format
+        self.size = struct.calcsize("<" + struct_format)
+        self.gl_type = gl_type
+        self.normalized = normalized
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+VERTEX_FORMATS = {
+    "float32": MeruVertexFormat("float32", "f", "GL_FLOAT", False, None,
+        None),
+    "snorm8": MeruVertexFormat("snorm8", "b", "GL_BYTE", True, -127, 127),
+    "snorm16": MeruVertexFormat("snorm16", "h", "GL_SHORT", True, -32767,
+        32767),
+    "unorm8": MeruVertexFormat("unorm8", "B", "GL_UNSIGNED_BYTE", True, 0,
+        255),
+    "unorm16": MeruVertexFormat("unorm16", "H", "GL_UNSIGNED_SHORT", True, 0,
+        65535),
+    "uint8": MeruVertexFormat("uint8", "B", "GL_UNSIGNED_BYTE", False, 0,
+        255),
+    "uint16": MeruVertexFormat("uint16", "H", "GL_UNSIGNED_SHORT", False, 0,
+        65535)
+}
+
+DEFAULT_ATTRIBUTE_FORMATS = {
+    "VERTEX_ATTRIB_NORMAL": "snorm16",
+    "VERTEX_ATTRIB_TEX_COORD": "unorm16",
+    "VERTEX_ATTRIB_BLEND_WEIGHT": "unorm8",
+    "VERTEX_ATTRIB_BLEND_INDEX": "uint8"
+}
+
+# Attributes are aligned so every one starts on a 4 byte boundary, which
+# is what most vertex fetch hardware requires.
+ATTRIBUTE_ALIGNMENT = 4
+PACK_CHUNK_SIZE = 4096
+
+
+def _align(value, alignment=ATTRIBUTE_ALIGNMENT):
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _default_format(attrib_name):
+    for prefix, format_name in DEFAULT_ATTRIBUTE_FORMATS.items():
+        if attrib_name.startswith(prefix):
+            return format_name
+    return "float32"
+
+
+class MeruQuantizedAttribute:
+    def __init__(self, name, _type, value_count, vertex_format, offset):
+        self.name = name
+        self.type = _type
+        self.value_count = value_count
+        self.format = vertex_format
+        self.offset = offset
+        self.decode_offset = 0.0
+        self.decode_scale = 1.0
+        self.max_error = 0.0
+
+    def size(self):
+        return self.format.size * self.value_count
+
+    def decode(self, quantized):
+        if self.format.name == "float32" or not self.format.normalized:
+            return [float(value) for value in quantized]
+        if self.format.minimum < 0:
+            # Both -max and -max - 1 decode to -1.0 for snorm formats.
+            minimum = -1.0
+            return [max(minimum, self.decode_offset + value *
+                self.decode_scale) for value in quantized]
+        return [self.decode_offset + value * self.decode_scale
+            for value in quantized]
+
+
+class MeruQuantizedVertexArray:
+    def __init__(self, attributes, stride, vertex_count, data):
+        self.attributes = attributes
+        self.stride = stride
+        self.vertex_count = vertex_count
+        self.data = data
+        self.source_size = 0
+
+    def size(self):
+        return len(self.data)
+
+    def errors(self):
+        return {attrib.name: attrib.max_error for attrib in self.attributes}
+
+    def struct_format(self):
+        _format = ""
+        position = 0
+        for attrib in self.attributes:
+            if attrib.offset > position:
+                _format += "{0}x".format(attrib.offset - position)
+            _format += "{0}{1}".format(attrib.value_count,
+                attrib.format.struct_format)
+            position = attrib.offset + attrib.size()
+        if self.stride > position:
+            _format += "{0}x".format(self.stride - position)
+        return _format
+
+    def to_vertex_array(self):
+        vertex_array = C3bVertexArray()
+        columns = self._unpack_columns()
+        values_per_vertex = 0
+        for attrib in self.attributes:
+            vertex_array.attributes.append(C3bVertexAttribute(
+                attrib.value_count, attrib.type, attrib.name))
+            values_per_vertex += attrib.value_count
+
+        values = [0.0] * (values_per_vertex * self.vertex_count)
+        component = 0
+        for attrib, attrib_columns in zip(self.attributes, columns):
+            for column in attrib_columns:
+                values[component::values_per_vertex] = attrib.decode(column)
+                component += 1
+        vertex_array.values = values
+        return vertex_array
+
+    def _unpack_columns(self):
+        component_count = sum(attrib.value_count
+            for attrib in self.attributes)
+        flat = _unpack_chunked(self.struct_format(), self.stride, self.data,
+            self.vertex_count)
+        columns = []
+        component = 0
+        for attrib in self.attributes:
+            columns.append([flat[component + i::component_count]
+                for i in range(attrib.value_count)])
+            component += attrib.value_count
+        return columns
+
+
+def _pack_chunked(vertex_format, flat, values_per_vertex, vertex_count):
+    chunks = []
+    for start in range(0, vertex_count, PACK_CHUNK_SIZE):
+        count = min(PACK_CHUNK_SIZE, vertex_count - start)
+        packer = struct.Struct("<" + vertex_format * count)
+        chunks.append(packer.pack(*flat[start * values_per_vertex:
+            (start + count) * values_per_vertex]))
+    return b"".join(chunks)
+
+
+def _unpack_chunked(vertex_format, stride, data, vertex_count):
+    flat = []
+    for start in range(0, vertex_count, PACK_CHUNK_SIZE):
+        count = min(PACK_CHUNK_SIZE, vertex_count - start)
+        unpacker = struct.Struct("<" + vertex_format * count)
+        flat.extend(unpacker.unpack_from(data, start * stride))
+    return flat
+
+
+def _quantize_column(column, attrib, vertex_format):
+    if vertex_format.name == "float32":
+        return list(column)
+    if not vertex_format.normalized:
+        return [int(round(value)) for value in column]
+
+    minimum = vertex_format.minimum
+    maximum = vertex_format.maximum
+    offset = attrib.decode_offset
+    scale = attrib.decode_scale
+    return [min(maximum, max(minimum, int(round((value - offset) / scale))))
+        for value in column]
+
+
+def _fix_weight_sums(columns, maximum):
+    # Rounding each weight on its own can make a vertex's weights stop
+    # summing to one, the largest weight absorbs the difference.
+    for vertex, weights in enumerate(zip(*columns)):
+        total = sum(weights)
+        if total == 0 or total == maximum:
+            continue
+        largest = weights.index(max(weights))
+        columns[largest][vertex] = max(0, min(maximum,
+            columns[largest][vertex] + maximum - total))
+
+
+def quantize_vertex_array(vertex_array, formats=None):
+    if formats is None:
+        formats = {}
+    vertex_count = vertex_array.vertex_count()
+    values_per_vertex = vertex_array.values_per_vertex()
+
+    attributes = []
+    offset = 0
+    value_offset = 0
+    quantized_columns = []
+    for attrib in vertex_array.attributes:
+        columns = [vertex_array.values[value_offset + i::values_per_vertex]
+            for i in range(attrib.value_count)]
+        value_offset += attrib.value_count
+
+        format_name = formats.get(attrib.name, _default_format(attrib.name))
+        if format_name not in VERTEX_FORMATS:
+            raise ValueError("Unknown vertex format {0}.".format(format_name))
+        vertex_format = VERTEX_FORMATS[format_name]
+
+        flat_values = [value for column in columns for value in column]
+        if not vertex_format.normalized and vertex_format.name != "float32":
+            # Integer formats widen instead of wrapping around.
+            largest = max(flat_values, default=0)
+            if largest > vertex_format.maximum:
+                vertex_format = VERTEX_FORMATS["uint16"]
+            if largest > vertex_format.maximum or \
+            min(flat_values, default=0) < 0:
+                vertex_format = VERTEX_FORMATS["float32"]
+
+        quantized_attrib = MeruQuantizedAttribute(attrib.name, attrib.type,
+            attrib.value_count, vertex_format, offset)
+        if vertex_format.normalized:
+            if vertex_format.minimum < 0:
+                quantized_attrib.decode_scale = 1.0 / vertex_format.maximum
+            else:
+                # Unsigned formats cover the attribute's range, so uvs that
+                # tile outside [0, 1] keep their precision.
+                low = min(0.0, min(flat_values, default=0.0))
+                high = max(1.0, max(flat_values, default=1.0))
+                quantized_attrib.decode_offset = low
+                quantized_attrib.decode_scale = \
+                    (high - low) / vertex_format.maximum
+
+        quantized = [_quantize_column(column, quantized_attrib, vertex_format)
+            for column in columns]
+        if attrib.name.startswith("VERTEX_ATTRIB_BLEND_WEIGHT") and \
+        vertex_format.normalized and vertex_format.minimum == 0:
+            _fix_weight_sums(quantized, vertex_format.maximum)
+
+        max_error = 0.0
+        for column, quantized_column in zip(columns, quantized):
+            decoded = quantized_attrib.decode(quantized_column)
+            for value, decoded_value in zip(column, decoded):
+                max_error = max(max_error, abs(value - decoded_value))
+        quantized_attrib.max_error = max_error
+
+        attributes.append(quantized_attrib)
+        quantized_columns.extend(quantized)
+        offset = _align(offset + quantized_attrib.size())
+
+    component_count = len(quantized_columns)
+    flat = [0] * (component_count * vertex_count)
+    for component, column in enumerate(quantized_columns):
+        flat[component::component_count] = column
+
+    quantized_array = MeruQuantizedVertexArray(attributes, offset,
+        vertex_count, b"")
+    quantized_array.data = _pack_chunked(quantized_array.struct_format(),
+        flat, component_count, vertex_count)
+    quantized_array.source_size = len(vertex_array.values) * 4
+    return quantized_array
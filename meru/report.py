@@ -0,0 +1,109 @@
+from .c3b import C3bType
+
+
+def section_count(header, _type):
+    return len([ref for ref in header.references if ref.type == _type])
+
+
+def header_report(parser):
+    header = parser.read_header()
+    references = []
+    for ref in header.references:
+        references.append({
+            "id": ref.id,
+            "type": C3bType.name(ref.type),
+            "offset": ref.offset
+        })
+    return {
+        "version": "{0}.{1}".format(header.major_version,
+            header.minor_version),
+        "references": references
+    }
+
+
+def meshes_report(parser):
+    report = []
+    for index in range(section_count(parser.read_header(), C3bType.MESHES)):
+        for mesh in parser.read_meshes(index):
+            vertex_array = mesh.vertex_array
+            report.append({
+                "id": mesh.id,
+                "vertex_count": vertex_array.vertex_count(),
+                "index_count": len(mesh.indices),
+                "aabb": list(mesh.aabb),
+                "attributes": [{
+                    "name": attrib.name,
+                    "type": attrib.type,
+                    "value_count": attrib.value_count
+                } for attrib in vertex_array.attributes]
+            })
+    return report
+
+
+def materials_report(parser):
+    report = []
+    header = parser.read_header()
+    for index in range(section_count(header, C3bType.MATERIALS)):
+        for material in parser.read_materials(index):
+            report.append({
+                "id": material.id,
+                "textures": [{
+                    "id": texture.id,
+                    "filename": texture.filename,
+                    "type": texture.type,
+                    "wrap_u": texture.wrap_u,
+                    "wrap_v": texture.wrap_v
+                } for texture in material.textures]
+            })
+    return report
+
+
+def _node_report(node):
+    return {
+        "id": node.id,
+        "skeleton": node.is_skeleton,
+        "parts": [{
+            "mesh_id": part.mesh_id,
+            "material_id": part.material_id,
+            "bones": [bone.name for bone in part.bones]
+        } for part in node.parts],
+        "children": [_node_report(child) for child in node.children]
+    }
+
+
+def nodes_report(parser):
+    report = []
+    for index in range(section_count(parser.read_header(), C3bType.NODES)):
+        for node in parser.read_nodes(index):
+            report.append(_node_report(node))
+    return report
+
+
+def animations_report(parser):
+    report = []
+    header = parser.read_header()
+    for index in range(section_count(header, C3bType.ANIMATIONS)):
+        anim = parser.read_animations(index)
+        report.append({
+            "id": anim.id,
+            "total_time": anim.total_time,
+            "channels": {bone: len(anim.get_keyframes(bone))
+                for bone in anim.get_bones()}
+        })
+    return report
+
+
+REPORTS = {
+    "header": header_report,
+    "meshes": meshes_report,
+    "materials": materials_report,
+    "nodes": nodes_report,
+    "animations": animations_report
+}
+
+
+def document_report(parser):
+    report = {}
+    for name, report_func in REPORTS.items():
+        report[name] = report_func(parser)
+    return report
@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .archive import (archive_path, is_archive, is_glob, list_members,
+open_source, split_archive_path, MeruSourceReader)
+from .binary import ShortReadError
+from .c3b import C3bParser, C3bType
+
+SCAN_EXTENSIONS = (".c3b",)
+SCAN_READ_SIZE = 4096
+SCAN_MAX_READ_SIZE = 1 << 20
+
+
+class MeruScanEntry:
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.valid = False
+        self.major_version = None
+        self.minor_version = None
+        self.reference_count = 0
+        self.type_counts = {}
+        self.header = None
+        self.error = None
+
+    def version(self):
+        if self.major_version is None:
+            return ""
+        return "{0}.{1}".format(self.major_version, self.minor_version)
+
+    def to_dict(self):
+        types = {}
+        for _type, count in sorted(self.type_counts.items()):
+            types[C3bType.name(_type)] = count
+        return {
+            "path": self.path,
+            "size": self.size,
+            "valid": self.valid,
+            "version": self.version(),
+            "references": self.reference_count,
+            "types": types,
+            "error": self.error
+        }
+
+
+def iter_files(paths, extensions=SCAN_EXTENSIONS):
+    # Explicitly listed files are always scanned, directories are walked
+    # iteratively and filtered by extension.
+    stack = []
+    for path in paths:
+        if os.path.isdir(path):
+            stack.append(path)
+        else:
+            yield path
+
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(extensions):
+                yield entry.path
+        stack.extend(reversed(subdirectories))
+
+
+def iter_sources(paths, extensions=SCAN_EXTENSIONS):
+    # Like iter_files, but archives expand to their matching members:
+    # "pack.zip" to every member with a matching extension and
+    # "pack.zip::dir/*.c3b" to the members matching the glob.
+    # Unreadable archives are passed through as they are, so the error is
+    # reported for them when they are opened.
+    for path in paths:
+        zip_path, member = split_archive_path(path)
+        try:
+            if member is not None and is_glob(member):
+                names = list_members(zip_path, member)
+            elif member is None and is_archive(path):
+                names = list_members(path, extensions=extensions)
+            else:
+                names = None
+        except OSError:
+            yield path
+            continue
+        if names is not None:
+            for name in names:
+                yield archive_path(zip_path, name)
+        elif member is not None:
+            yield path
+        else:
+            for file_path in iter_files([path], extensions):
+                yield file_path
+
+
+def scan_file(path, read_size=SCAN_READ_SIZE,
+max_read_size=SCAN_MAX_READ_SIZE, reader=None):
+    entry = MeruScanEntry(path)
+    try:
+        _file, entry.size = open_source(path, reader)
+        with _file:
+            buffer = _file.read(read_size)
+            parser = C3bParser(buffer)
+            if not parser.verify_signature():
+                entry.error = "not a c3b file"
+                return entry
+
+            # Grow the read window until the whole header fits, any other
+            # error is in the header itself.
+            while True:
+                try:
+                    header = parser.read_header()
+                    break
+                except ShortReadError as error:
+                    exhausted = (len(buffer) >= entry.size or
+                        len(buffer) >= max_read_size)
+                    if exhausted:
+                        entry.error = str(error)
+                        return entry
+                    # The file may have shrunk since its size was read.
+                    chunk = _file.read(len(buffer))
+                    if not chunk:
+                        entry.error = str(error)
+                        return entry
+                    buffer += chunk
+                    parser = C3bParser(buffer)
+    except (OSError, ValueError) as error:
+        entry.error = str(error)
+        return entry
+
+    entry.header = header
+    entry.major_version = header.major_version
+    entry.minor_version = header.minor_version
+    entry.reference_count = len(header.references)
+    for ref in header.references:
+        if ref.offset >= entry.size:
+            entry.error = "reference {0} points past end of file"\
+                .format(ref.id)
+            return entry
+        entry.type_counts[ref.type] = entry.type_counts.get(ref.type, 0) + 1
+    entry.valid = True
+    return entry
+
+
+def scan(paths, workers=None, extensions=SCAN_EXTENSIONS):
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) * 4)
+    with MeruSourceReader() as reader:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for entry in executor.map(lambda path: scan_file(path,
+            reader=reader), iter_sources(paths, extensions)):
+                yield entry
+
+
+SCAN_CSV_FIELDS = ["path", "size", "valid", "version", "references"]
+
+
+def write_csv(entries, stream):
+    invalid_count = 0
+    type_names = [C3bType.name(_type) for _type in C3bType.TYPES]
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(SCAN_CSV_FIELDS + type_names + ["error"])
+    for entry in entries:
+        row = entry.to_dict()
+        writer.writerow([row[field] for field in SCAN_CSV_FIELDS] +
+            [entry.type_counts.get(_type, 0) for _type in C3bType.TYPES] +
+            [entry.error or ""])
+        invalid_count += int(not entry.valid)
+    return invalid_count
+
+
+def write_ndjson(entries, stream):
+    invalid_count = 0
+    for entry in entries:
+        stream.write(json.dumps(entry.to_dict()))
+        stream.write("\n")
+        invalid_count += int(not entry.valid)
+    return invalid_count
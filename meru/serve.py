@@ -0,0 +1,186 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+
+from .c3b import C3bError, C3bParser
+from .client import default_socket_path
+from .report import REPORTS
+
+DEFAULT_CACHE_BYTES = 256 << 20
+
+
+class MeruCacheEntry:
+    def __init__(self, size, mtime_ns, parser):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.parser = parser
+        self.reports = {}
+        self.cost = size
+
+        # Parsers seek around their buffer, only one thread may use one.
+        self.lock = threading.Lock()
+
+    def matches_stat(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class MeruDocumentCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def query(self, command, path):
+        # Returns the report encoded as JSON, encoded reports are what is
+        # cached so repeated queries skip both parsing and encoding.
+        report_func = REPORTS.get(command)
+        if report_func is None:
+            raise C3bError("Unknown command {0}.".format(command))
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and not entry.matches_stat(stat):
+                self._remove(path)
+                self.reloads += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(path)
+                encoded = entry.reports.get(command)
+                if encoded is not None:
+                    self.hits += 1
+                    return encoded
+            self.misses += 1
+
+        if entry is None:
+            entry = self._load(path, stat)
+        with entry.lock:
+            encoded = entry.reports.get(command)
+            if encoded is None:
+                encoded = json.dumps(report_func(entry.parser))
+                entry.reports[command] = encoded
+                with self._lock:
+                    entry.cost += len(encoded)
+                    if self._entries.get(path) is entry:
+                        self.total_bytes += len(encoded)
+                    self._evict()
+        return encoded
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _load(self, path, stat):
+        with open(path, "rb") as _file:
+            _bytes = _file.read()
+        parser = C3bParser(_bytes)
+        if not parser.verify_signature():
+            raise C3bError("{0} is not a c3b file.".format(path))
+        entry = MeruCacheEntry(stat.st_size, stat.st_mtime_ns, parser)
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            self._entries[path] = entry
+            self.total_bytes += entry.cost
+        return entry
+
+    def _remove(self, path):
+        self.total_bytes -= self._entries.pop(path).cost
+
+    def _evict(self):
+        # The most recently used document always stays, even when it alone
+        # exceeds the budget.
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+
+class _MeruRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write(self.server.respond(line))
+            self.wfile.flush()
+
+
+class MeruServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, cache=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.cache = cache if cache is not None else MeruDocumentCache()
+        _remove_stale_socket(self.socket_path)
+        super().__init__(self.socket_path, _MeruRequestHandler)
+
+    def respond(self, line):
+        # One JSON request per line, one JSON response per line.
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            if command == "ping":
+                result = "true"
+            elif command == "stats":
+                result = json.dumps(self.cache.stats())
+            elif command == "shutdown":
+                threading.Thread(target=self.shutdown).start()
+                result = "true"
+            else:
+                result = self.cache.query(command, request["path"])
+        except Exception as error:
+            return (json.dumps({"ok": False, "error": str(error)}) +
+                "\n").encode("utf-8")
+        return ("{\"ok\": true, \"result\": " + result + "}\n") \
+            .encode("utf-8")
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+    else:
+        raise C3bError("A server is already listening on {0}."
+            .format(socket_path))
+    finally:
+        probe.close()
+
+
+def serve(socket_path=None, max_bytes=DEFAULT_CACHE_BYTES):
+    server = MeruServer(socket_path, MeruDocumentCache(max_bytes))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
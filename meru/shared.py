@@ -0,0 +1,278 @@
+import array
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+from .binary import Endian
+from .c3b import (C3bAnimation, C3bAnimFlag, C3bAnimKeyFrame, C3bParser,
+C3bType)
+from .linear import Vec3, Vec4
+
+SHARED_ALIGNMENT = 8
+SHARED_SEGMENT_SIZE = 4 << 20
+
+
+class MeruSharedArray:
+    # Picklable descriptor of a typed array in a shared memory segment,
+    # segment_name is None for empty arrays.
+    def __init__(self, segment_name, typecode, offset, count):
+        self.segment_name = segment_name
+        self.typecode = typecode
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return array.array(self.typecode).itemsize * self.count
+
+
+class MeruSharedMemory:
+    # Creates and attaches shared memory segments. Segments this object
+    # created, or adopted from another process, are owned and get unlinked
+    # by unlink(). Views handed out by view() are released by close(), so
+    # they must not be used, or sliced into longer lived objects, after it.
+    def __init__(self, segment_size=SHARED_SEGMENT_SIZE):
+        self.segment_size = segment_size
+        self._segments = {}
+        self._owned = []
+        self._views = []
+        self._current = None
+        self._current_size = 0
+        self._offset = 0
+
+    def owned(self):
+        return list(self._owned)
+
+    def allocate(self, typecode, count):
+        itemsize = array.array(typecode).itemsize
+        nbytes = itemsize * count
+        if count == 0:
+            return MeruSharedArray(None, typecode, 0, 0)
+
+        offset = -self._offset % SHARED_ALIGNMENT + self._offset
+        if self._current is None or \
+        offset + nbytes > self._current_size:
+            self._current_size = max(self.segment_size, nbytes)
+            segment = shared_memory.SharedMemory(create=True,
+                size=self._current_size)
+            self._segments[segment.name] = segment
+            self._owned.append(segment.name)
+            self._current = segment
+            offset = 0
+        self._offset = offset + nbytes
+        return MeruSharedArray(self._current.name, typecode, offset, count)
+
+    def from_bytes(self, typecode, count, _bytes, endianness=None):
+        # _bytes hold count items in the given byte order, they are copied
+        # as they are when that is the native order.
+        descriptor = self.allocate(typecode, count)
+        if count == 0:
+            return descriptor
+        if endianness is not None and endianness != Endian.native():
+            swapped = array.array(typecode)
+            swapped.frombytes(_bytes)
+            swapped.byteswap()
+            _bytes = swapped.tobytes()
+        segment = self._segments[descriptor.segment_name]
+        segment.buf[descriptor.offset:descriptor.offset + len(_bytes)] = \
+            _bytes
+        return descriptor
+
+    def from_values(self, typecode, values):
+        return self.from_bytes(typecode, len(values),
+            array.array(typecode, values).tobytes())
+
+    def read_array(self, reader, typecode, count, endianness=None):
+        size = array.array(typecode).itemsize * count
+        return self.from_bytes(typecode, count, reader.strict_read(size),
+            endianness)
+
+    def view(self, descriptor):
+        # A memoryview of the array without copying it, attaching to the
+        # segment when another process created it.
+        if descriptor.segment_name is None:
+            return memoryview(array.array(descriptor.typecode))
+        segment = self._segments.get(descriptor.segment_name)
+        if segment is None:
+            segment = shared_memory.SharedMemory(descriptor.segment_name)
+            self._segments[segment.name] = segment
+        raw = segment.buf[descriptor.offset:
+            descriptor.offset + descriptor.nbytes()]
+        view = raw.cast(descriptor.typecode)
+        self._views.extend([raw, view])
+        return view
+
+    def adopt(self, segment_names):
+        # Takes over unlinking segments another process created.
+        for name in segment_names:
+            if name not in self._owned:
+                self._owned.append(name)
+
+    def disown(self):
+        # Hands the owned segments over to whoever adopts the names.
+        names = self._owned
+        self._owned = []
+        return names
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+        self._current = None
+        self._offset = 0
+
+    def unlink(self):
+        self.close()
+        for name in self.disown():
+            try:
+                segment = shared_memory.SharedMemory(name)
+            except FileNotFoundError:
+                continue
+            segment.close()
+            segment.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+class MeruSharedAnimation:
+    def __init__(self, _id, total_time):
+        self.id = _id
+        self.total_time = total_time
+
+        # (bone id, times, flags, values) per bone, descriptors or views.
+        self.bones = []
+
+    def attach(self, memory):
+        self.bones = [(bone_id, memory.view(times), memory.view(flags),
+            memory.view(values)) for bone_id, times, flags, values in
+            self.bones]
+        return self
+
+    def to_animation(self):
+        # Copies the attached arrays back into keyframe objects.
+        animation = C3bAnimation(self.id, self.total_time)
+        for bone_id, times, flags, values in self.bones:
+            value_index = 0
+            for time, flag in zip(times, flags):
+                keyframe = C3bAnimKeyFrame(time)
+                if flag & C3bAnimFlag.HAS_ROTATION:
+                    keyframe.rotation = Vec4(
+                        *values[value_index:value_index + 4])
+                    value_index += 4
+                if flag & C3bAnimFlag.HAS_SCALE:
+                    keyframe.scale = Vec3(*values[value_index:value_index + 3])
+                    value_index += 3
+                if flag & C3bAnimFlag.HAS_TRANSLATION:
+                    keyframe.translation = Vec3(
+                        *values[value_index:value_index + 3])
+                    value_index += 3
+                animation.add_keyframe(bone_id, keyframe)
+        return animation
+
+
+def read_shared_animation(parser, index, memory):
+    _id, total_time, bones = parser.read_animation_arrays(index, memory)
+    animation = MeruSharedAnimation(_id, total_time)
+    animation.bones = bones
+    return animation
+
+
+class MeruSharedDocument:
+    def __init__(self, path):
+        self.path = path
+        self.meshes = []
+        self.animations = []
+        self.segment_names = []
+
+    def attach(self, memory, adopt=True):
+        # Swaps descriptors for views, meshes sharing a vertex array keep
+        # sharing it. With adopt the memory becomes responsible for
+        # unlinking the document's segments.
+        if adopt:
+            memory.adopt(self.segment_names)
+        attached = set()
+        for mesh in self.meshes:
+            vertex_array = mesh.vertex_array
+            if id(vertex_array) not in attached:
+                attached.add(id(vertex_array))
+                vertex_array.values = memory.view(vertex_array.values)
+            mesh.indices = memory.view(mesh.indices)
+        for animation in self.animations:
+            animation.attach(memory)
+        return self
+
+
+def read_shared_document(path, segment_size=SHARED_SEGMENT_SIZE):
+    # Runs in a worker, the segments outlive it until the process
+    # attaching the document unlinks them.
+    memory = MeruSharedMemory(segment_size)
+    document = MeruSharedDocument(path)
+    try:
+        parser = C3bParser.from_file(path)
+        if not parser.verify_signature():
+            raise ValueError("{0} is not a c3b file.".format(path))
+        counts = _type_counts(parser)
+        for index in range(counts.get(C3bType.MESHES, 0)):
+            document.meshes.extend(parser.read_meshes(index, memory=memory))
+        for index in range(counts.get(C3bType.ANIMATIONS, 0)):
+            document.animations.append(read_shared_animation(parser, index,
+                memory))
+    except BaseException:
+        memory.unlink()
+        raise
+    document.segment_names = memory.disown()
+    memory.close()
+    return document
+
+
+def _type_counts(parser):
+    counts = {}
+    for ref in parser.read_header().references:
+        counts[ref.type] = counts.get(ref.type, 0) + 1
+    return counts
+
+
+def read_shared_documents(paths, workers=None,
+segment_size=SHARED_SEGMENT_SIZE):
+    # Yields (path, document, error) in order. Documents still hold
+    # descriptors, attach them to a MeruSharedMemory to read the arrays
+    # and to take over unlinking their segments.
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Workers must share this process' resource tracker, one of their own
+    # would unlink the segments as soon as the worker exits.
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque((path, executor.submit(read_shared_document, path,
+            segment_size)) for path in paths)
+        try:
+            while pending:
+                path, future = pending.popleft()
+                try:
+                    document = future.result()
+                except Exception as error:
+                    yield path, None, error
+                else:
+                    yield path, document, None
+        finally:
+            # Segments of documents the consumer never got are unlinked
+            # here, nobody else knows their names.
+            for path, future in pending:
+                try:
+                    segment_names = future.result().segment_names
+                except Exception:
+                    continue
+                memory = MeruSharedMemory()
+                memory.adopt(segment_names)
+                memory.unlink()
@@ -1,5 +1,18 @@
 from inc_noesis import *
-from meru.c3b import C3bParser, MeruSkeleton
+from meru.animation import (bake_local_matrices, pack_mat43_frames,
+world_matrices)
+from meru.binary import UINT8_FORMAT
+from meru.c3b import C3bParser, C3bType, MeruSkeleton
+from meru.report import section_count
+
+C3B_FRAME_RATE = 30.0
+C3B_MAT43_SIZE = 12 * 4
+
+C3B_POSITION = "VERTEX_ATTRIB_POSITION"
+C3B_NORMAL = "VERTEX_ATTRIB_NORMAL"
+C3B_TEX_COORD = "VERTEX_ATTRIB_TEX_COORD"
+C3B_BLEND_WEIGHT = "VERTEX_ATTRIB_BLEND_WEIGHT"
+C3B_BLEND_INDEX = "VERTEX_ATTRIB_BLEND_INDEX"
 
 
 def registerNoesisTypes():
@@ -31,8 +44,8 @@ def c3b_to_mat44(_mat44):
     return NoeMat44((v1, v2, v3, v4))
 
 
-def c3b_to_bone(_bone):
-    matrix = c3b_get_bone_matrix(_bone).toMat43()
+def c3b_to_bone(_bone, world_matrix):
+    matrix = NoeMat43.fromBytes(pack_mat43_frames([[world_matrix]]))
     bone = NoeBone(_bone.index, _bone.id, matrix)
     if _bone.parent is not None:
         bone.parentIndex = _bone.parent.index
@@ -40,12 +53,19 @@ def c3b_to_bone(_bone):
     return bone
 
 
-def c3b_get_bone_matrix(_bone):
-    matrix = c3b_to_mat44(_bone.transform)
-    if _bone.parent is None:
-        return matrix
-    else:
-        return matrix * c3b_get_bone_matrix(_bone.parent)
+def c3b_bone_world_matrices(skeleton):
+    # Each bone's world matrix is its parent's, already computed, times
+    # its own transform, so building the skeleton stays linear.
+    return world_matrices(skeleton,
+        [_bone.transform.unpack() for _bone in skeleton.bones])
+
+
+def c3b_to_anim(animation, skeleton, bones, frame_rate=C3B_FRAME_RATE):
+    frames = bake_local_matrices(animation, skeleton, frame_rate)
+    buffer = pack_mat43_frames(frames)
+    frame_mats = [NoeMat43.fromBytes(buffer[offset:offset + C3B_MAT43_SIZE])
+        for offset in range(0, len(buffer), C3B_MAT43_SIZE)]
+    return NoeAnim(animation.id, bones, len(frames), frame_mats, frame_rate)
 
 
 def c3b_check_type(data):
@@ -53,11 +73,102 @@ def c3b_check_type(data):
     return int(parser.verify_signature())
 
 
+class C3bVertexBuffers:
+    def __init__(self, vertex_array):
+        # One packed little-endian float32 buffer with the interleaved
+        # vertex data, the bind calls read every attribute out of it by
+        # offset. Blend indices get their own ubyte buffer since they are
+        # stored as floats.
+        self.vertices = vertex_array.to_bytes()
+        self.stride = vertex_array.stride()
+        self.offsets = {}
+        self.value_counts = {}
+        for attrib in vertex_array.attributes:
+            self.offsets[attrib.name] = \
+                vertex_array.get_attribute_byte_offset(attrib.name)
+            self.value_counts[attrib.name] = attrib.value_count
+        self.blend_indices = None
+        if C3B_BLEND_INDEX in self.offsets:
+            self.blend_indices = vertex_array.get_attribute_bytes(
+                C3B_BLEND_INDEX, UINT8_FORMAT)
+
+
+def c3b_bind_vertex_buffers(buffers):
+    offsets = buffers.offsets
+    rapi.rpgBindPositionBufferOfs(buffers.vertices, noesis.RPGEODATA_FLOAT,
+        buffers.stride, offsets[C3B_POSITION])
+    if C3B_NORMAL in offsets:
+        rapi.rpgBindNormalBufferOfs(buffers.vertices, noesis.RPGEODATA_FLOAT,
+            buffers.stride, offsets[C3B_NORMAL])
+    if C3B_TEX_COORD in offsets:
+        rapi.rpgBindUV1BufferOfs(buffers.vertices, noesis.RPGEODATA_FLOAT,
+            buffers.stride, offsets[C3B_TEX_COORD])
+    if buffers.blend_indices is not None and C3B_BLEND_WEIGHT in offsets:
+        # Influences per vertex follow the attributes, the ubyte index
+        # buffer is packed with one byte per index.
+        index_count = buffers.value_counts[C3B_BLEND_INDEX]
+        rapi.rpgBindBoneIndexBufferOfs(buffers.blend_indices,
+            noesis.RPGEODATA_UBYTE, index_count, 0, index_count)
+        rapi.rpgBindBoneWeightBufferOfs(buffers.vertices,
+            noesis.RPGEODATA_FLOAT, buffers.stride,
+            offsets[C3B_BLEND_WEIGHT], buffers.value_counts[C3B_BLEND_WEIGHT])
+
+
+def c3b_load_skeleton(parser):
+    return MeruSkeleton.from_nodes(parser.read_nodes(0))
+
+
+def c3b_load_bones(parser, skeleton=None):
+    if skeleton is None:
+        skeleton = c3b_load_skeleton(parser)
+    bones = []
+    for _bone, world_matrix in zip(skeleton.bones,
+    c3b_bone_world_matrices(skeleton)):
+        bones.append(c3b_to_bone(_bone, world_matrix))
+    return bones
+
+
+def c3b_load_anims(parser, skeleton, bones):
+    anims = []
+    header = parser.read_header()
+    for index in range(section_count(header, C3bType.ANIMATIONS)):
+        animation = parser.read_animations(index)
+        anims.append(c3b_to_anim(animation, skeleton, bones))
+    return anims
+
+
 def c3b_load_model(data, models):
     parser = C3bParser(data)
     if not parser.verify_signature():
         return 0
 
+    rapi.rpgCreateContext()
+    vertex_buffers = {}
+    for _mesh in parser.read_meshes(0):
+        key = id(_mesh.vertex_array)
+        if key not in vertex_buffers:
+            vertex_buffers[key] = C3bVertexBuffers(_mesh.vertex_array)
+        c3b_bind_vertex_buffers(vertex_buffers[key])
+        rapi.rpgSetName(_mesh.id)
+        rapi.rpgCommitTriangles(_mesh.indices_to_bytes(),
+            noesis.RPGEODATA_USHORT, len(_mesh.indices),
+            noesis.RPGEO_TRIANGLE, 1)
+        rapi.rpgClearBufferBinds()
+
+    model = rapi.rpgConstructModel()
+    skeleton = c3b_load_skeleton(parser)
+    bones = c3b_load_bones(parser, skeleton)
+    model.setBones(bones)
+    model.setAnims(c3b_load_anims(parser, skeleton, bones))
+    models.append(model)
+    return 1
+
+
+def c3b_load_model_objects(data, models):
+    parser = C3bParser(data)
+    if not parser.verify_signature():
+        return 0
+
     meshes = []
     for _mesh in parser.read_meshes(0):
         print("Mesh:")
@@ -84,16 +195,8 @@ def c3b_load_model(data, models):
                 NoeVertWeight(_index.unpack(), _weight.unpack()))
         meshes.append(mesh)
 
-    print("Reading nodes..")
-    _nodes = parser.read_nodes(0)
-
-    print("Building skeleton..")
-    skeleton = MeruSkeleton.from_nodes(_nodes)
-
     print("Building bone list..")
-    bones = []
-    for _bone in skeleton.bones:
-        bones.append(c3b_to_bone(_bone))
+    bones = c3b_load_bones(parser)
 
     print("Bone[0].getMatrix(): ", bones[0].getMatrix())
     print("Creating model..")
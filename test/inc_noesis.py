@@ -0,0 +1,136 @@
+# Stand-in for Noesis' inc_noesis module, records the calls the plugin
+# makes so it can be tested outside of Noesis.
+
+
+class _Recorder:
+    def __init__(self, name, returns=None):
+        self._name = name
+        self._returns = returns or {}
+        self.calls = []
+
+    def reset(self):
+        self.calls = []
+
+    def called(self, name):
+        return [args for call_name, args in self.calls if call_name == name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def record(*args):
+            self.calls.append((name, args))
+            factory = self._returns.get(name)
+            return factory() if factory is not None else None
+        return record
+
+
+class _ConstructedModel:
+    def __init__(self):
+        self.bones = []
+        self.anims = []
+
+    def setBones(self, bones):
+        self.bones = bones
+
+    def setAnims(self, anims):
+        self.anims = anims
+
+
+class _Noesis(_Recorder):
+    RPGEODATA_FLOAT = 0
+    RPGEODATA_INT = 1
+    RPGEODATA_UINT = 2
+    RPGEODATA_SHORT = 3
+    RPGEODATA_USHORT = 4
+    RPGEODATA_HALFFLOAT = 5
+    RPGEODATA_DOUBLE = 6
+    RPGEODATA_BYTE = 7
+    RPGEODATA_UBYTE = 8
+    RPGEO_TRIANGLE = 2
+
+
+noesis = _Noesis("noesis")
+rapi = _Recorder("rapi", {"rpgConstructModel": _ConstructedModel})
+
+
+class NoeVec2:
+    def __init__(self, values):
+        self.values = tuple(values)
+
+
+class NoeVec3:
+    def __init__(self, values):
+        self.values = tuple(values)
+
+
+class NoeVec4:
+    def __init__(self, values):
+        self.values = tuple(values)
+
+
+class NoeMat43:
+    def __init__(self, rows):
+        self.rows = [tuple(row) for row in rows]
+
+    @classmethod
+    def fromBytes(cls, data, bigEnd=0):
+        import struct
+        values = struct.unpack((">" if bigEnd else "<") + "12f", data)
+        return cls([values[0:3], values[3:6], values[6:9], values[9:12]])
+
+
+class NoeMat44:
+    def __init__(self, rows):
+        self.rows = [tuple(row.values) if isinstance(row, NoeVec4) else
+            tuple(row) for row in rows]
+
+    def __mul__(self, other):
+        return NoeMat44([[sum(self.rows[r][k] * other.rows[k][c]
+            for k in range(4)) for c in range(4)] for r in range(4)])
+
+    def toMat43(self):
+        return NoeMat43([row[:3] for row in self.rows])
+
+
+class NoeBone:
+    def __init__(self, index, name, matrix, parentName=None, parentIndex=-1):
+        self.index = index
+        self.name = name
+        self._matrix = matrix
+        self.parentName = parentName
+        self.parentIndex = parentIndex
+
+    def getMatrix(self):
+        return self._matrix
+
+
+class NoeVertWeight:
+    def __init__(self, indices, weights):
+        self.indices = indices
+        self.weights = weights
+
+
+class NoeMesh:
+    def __init__(self, indices, positions, name=""):
+        self.indices = indices
+        self.positions = positions
+        self.name = name
+        self.normals = []
+        self.weights = []
+
+
+class NoeModel:
+    def __init__(self, meshes=None, bones=None, anims=None):
+        self.meshes = meshes or []
+        self.bones = bones or []
+        self.anims = anims or []
+
+
+class NoeAnim:
+    def __init__(self, name, bones, numFrames, frameMats, frameRate=20.0):
+        self.name = name
+        self.bones = bones
+        self.numFrames = numFrames
+        self.frameMats = frameMats
+        self.frameRate = frameRate
@@ -0,0 +1,149 @@
+import zipfile
+import pytest
+from meru.archive import (archive_path, list_members, open_source,
+read_source, read_sources, split_archive_path, MeruSourceReader)
+from meru.c3b import C3bParser
+from meru.dedupe import dedupe_report
+from meru.scan import iter_sources, scan, scan_file
+
+
+def _write_zip(path, members):
+    with zipfile.ZipFile(str(path), "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, _bytes in members:
+            archive.writestr(name, _bytes)
+    return str(path)
+
+
+class _CountingReader(MeruSourceReader):
+    def __init__(self):
+        super().__init__()
+        self.read_bytes = 0
+
+    def open(self, source):
+        _file, size = super().open(source)
+        read = _file.read
+
+        def counting_read(size=-1):
+            _bytes = read(size)
+            self.read_bytes += len(_bytes)
+            return _bytes
+
+        _file.read = counting_read
+        return _file, size
+
+
+class TestArchivePaths:
+    def test_split(self):
+        assert split_archive_path("a.zip::b/c.c3b") == ("a.zip", "b/c.c3b")
+        assert split_archive_path("a.c3b") == ("a.c3b", None)
+        assert archive_path("a.zip", "b/c.c3b") == "a.zip::b/c.c3b"
+
+    def test_list_members(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [
+            ("models/a.c3b", c3b_bytes), ("models/b.C3B", c3b_bytes),
+            ("readme.txt", b"")])
+        assert list_members(zip_path, extensions=(".c3b",)) == \
+            ["models/a.c3b", "models/b.C3B"]
+        assert list_members(zip_path, "*.txt") == ["readme.txt"]
+
+    def test_bad_archive(self, tmp_path):
+        path = tmp_path / "pack.zip"
+        path.write_bytes(b"not a zip")
+        with pytest.raises(OSError):
+            list_members(str(path))
+        with pytest.raises(OSError):
+            read_source(str(path) + "::a.c3b")
+
+    def test_missing_member(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [("a.c3b", c3b_bytes)])
+        with pytest.raises(FileNotFoundError):
+            read_source(archive_path(zip_path, "b.c3b"))
+
+
+class TestArchiveSources:
+    def test_from_archive(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [("a.c3b", c3b_bytes)])
+        parser = C3bParser.from_archive(zip_path, "a.c3b")
+        assert parser.verify_signature()
+        expected = C3bParser(c3b_bytes).read_meshes(0)
+        assert [mesh.id for mesh in parser.read_meshes(0)] == \
+            [mesh.id for mesh in expected]
+
+    def test_open_source(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [("a.c3b", c3b_bytes)])
+        _file, size = open_source(archive_path(zip_path, "a.c3b"))
+        with _file:
+            assert size == len(c3b_bytes)
+            assert _file.read(4) == c3b_bytes[:4]
+
+    def test_iter_sources(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [
+            ("a/x.c3b", c3b_bytes), ("b/y.c3b", c3b_bytes),
+            ("b/z.txt", b"")])
+        plain = tmp_path / "plain.c3b"
+        plain.write_bytes(c3b_bytes)
+        sources = list(iter_sources([zip_path, str(plain),
+            zip_path + "::b/*", zip_path + "::a/x.c3b"]))
+        assert sources == [zip_path + "::a/x.c3b", zip_path + "::b/y.c3b",
+            str(plain), zip_path + "::b/y.c3b", zip_path + "::b/z.txt",
+            zip_path + "::a/x.c3b"]
+
+    def test_read_sources(self, tmp_path, c3b_bytes):
+        members = [("{0}.c3b".format(i), c3b_bytes + bytes([i]))
+            for i in range(20)]
+        zip_path = _write_zip(tmp_path / "pack.zip", members)
+        sources = [archive_path(zip_path, name) for name, _ in members]
+        sources.insert(3, archive_path(zip_path, "missing.c3b"))
+        results = list(read_sources(sources, workers=4))
+        assert [source for source, _, _ in results] == sources
+        assert isinstance(results[3][2], FileNotFoundError)
+        del results[3]
+        assert [_bytes for _, _bytes, _ in results] == \
+            [_bytes for _, _bytes in members]
+
+    def test_corrupt_member(self, tmp_path, c3b_bytes):
+        zip_path = str(tmp_path / "bad.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr("a.c3b", c3b_bytes)
+            archive.writestr("b.c3b", c3b_bytes)
+        data = bytearray((tmp_path / "bad.zip").read_bytes())
+        data[data.index(c3b_bytes) + 20] ^= 0xff
+        (tmp_path / "bad.zip").write_bytes(bytes(data))
+
+        results = list(read_sources([archive_path(zip_path, "a.c3b"),
+            archive_path(zip_path, "b.c3b")], workers=2))
+        assert isinstance(results[0][2], OSError)
+        assert "CRC" in str(results[0][2])
+        assert results[1][1] == c3b_bytes
+        report = dedupe_report([zip_path])
+        assert report.file_count == 1
+        assert [path for path, error in report.errors] == \
+            [archive_path(zip_path, "a.c3b")]
+
+
+class TestArchiveScan:
+    def test_scan_reads_prefix(self, tmp_path, c3b_bytes):
+        padded = c3b_bytes + bytes(1 << 20)
+        zip_path = _write_zip(tmp_path / "pack.zip", [("a.c3b", padded)])
+        with _CountingReader() as reader:
+            entry = scan_file(archive_path(zip_path, "a.c3b"),
+                reader=reader)
+        assert entry.valid
+        assert entry.size == len(padded)
+        assert entry.header.references
+        assert reader.read_bytes < len(padded) // 16
+
+    def test_scan_archive(self, tmp_path, c3b_bytes):
+        zip_path = _write_zip(tmp_path / "pack.zip", [
+            ("a.c3b", c3b_bytes), ("b.c3b", b"junk")])
+        entries = list(scan([zip_path], workers=2))
+        assert [entry.path for entry in entries] == \
+            [zip_path + "::a.c3b", zip_path + "::b.c3b"]
+        assert entries[0].valid and not entries[1].valid
+
+    def test_scan_bad_archive(self, tmp_path):
+        path = tmp_path / "pack.zip"
+        path.write_bytes(b"not a zip")
+        entries = list(scan([str(path) + "::*.c3b"]))
+        assert len(entries) == 1
+        assert not entries[0].valid
@@ -0,0 +1,84 @@
+import pytest
+from meru.batch import batch_meshes
+from meru.c3b import (C3bMesh, C3bNode, C3bNodePart, C3bParser,
+C3bVertexArray, C3bVertexAttribute, C3bWriter)
+from meru.linear import Mat44, mat44_from_trs
+
+
+def _quad_mesh(_id):
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_NORMAL")
+    ]
+    for x, y in [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]:
+        vertex_array.values.extend([x, y, 0.0, 0.0, 0.0, 1.0])
+    mesh = C3bMesh(_id, vertex_array)
+    mesh.indices = [0, 1, 2, 0, 2, 3]
+    mesh.aabb = [0.0, 0.0, 0.0, 1.0, 1.0, 0.0]
+    return mesh
+
+
+def _node(_id, mesh_id, material_id, translation, scale=(1.0, 1.0, 1.0)):
+    node = C3bNode(_id, False, Mat44(mat44_from_trs(translation,
+        (0.0, 0.0, 0.0, 1.0), scale)))
+    node.parts.append(C3bNodePart(mesh_id, material_id))
+    return node
+
+
+class TestBatchMeshes:
+    def test_merges_by_material(self):
+        meshes = [_quad_mesh("quad")]
+        parent = _node("a", "quad", "stone", (10.0, 0.0, 0.0))
+        parent.children.append(_node("b", "quad", "stone", (0.0, 5.0, 0.0)))
+        nodes = [parent, _node("c", "quad", "wood", (0.0, 0.0, 0.0))]
+        result = batch_meshes(nodes, meshes)
+
+        assert result.draw_calls_before() == 3
+        assert result.draw_calls_after() == 2
+        stone = result.batches[0]
+        assert stone.material_id == "stone"
+        assert stone.parts == [("a", "quad"), ("b", "quad")]
+        assert stone.vertex_count() == 8
+        assert stone.mesh.indices == [0, 1, 2, 0, 2, 3, 4, 5, 6, 4, 6, 7]
+        positions = stone.mesh.vertex_array.get_positions()
+        assert positions[4].unpack() == (10.0, 5.0, 0.0)
+        assert stone.mesh.aabb == [10.0, 0.0, 0.0, 11.0, 6.0, 0.0]
+        assert stone.to_dict()["triangles"] == 4
+
+    def test_splits_at_vertex_limit(self):
+        nodes = [_node(str(i), "quad", "stone", (float(i), 0.0, 0.0))
+            for i in range(3)]
+        result = batch_meshes(nodes, [_quad_mesh("quad")], max_vertices=6)
+        assert [batch.vertex_count() for batch in result.batches] == \
+            [4, 4, 4]
+        result = batch_meshes(nodes, [_quad_mesh("quad")], max_vertices=3)
+        assert len(result.batches) == 6
+        assert all(max(batch.mesh.indices) < 3 for batch in result.batches)
+
+    def test_mirrored_transform(self):
+        nodes = [_node("m", "quad", "stone", (0.0, 0.0, 0.0),
+            (-2.0, 1.0, 1.0))]
+        batch = batch_meshes(nodes, [_quad_mesh("quad")]).batches[0]
+        assert batch.mesh.indices[:3] == [0, 2, 1]
+        normals = batch.mesh.vertex_array.get_normals()
+        assert normals[0].unpack() == pytest.approx((0.0, 0.0, 1.0))
+
+    def test_skips_skinned_parts(self, c3b_model):
+        result = batch_meshes(c3b_model.nodes, c3b_model.meshes)
+        assert result.batches == []
+        assert [node_id for node_id, part in result.skipped] == ["body",
+            "body"]
+
+    def test_writes_back_to_c3b(self):
+        nodes = [_node(str(i), "quad", "stone", (float(i), 0.0, 0.0))
+            for i in range(2)]
+        result = batch_meshes(nodes, [_quad_mesh("quad")])
+        writer = C3bWriter()
+        writer.add_meshes(result.meshes())
+        writer.add_nodes([result.to_node()])
+        parser = C3bParser(writer.to_bytes())
+        meshes = parser.read_meshes(0)
+        assert [mesh.id for mesh in meshes] == ["stone_batch0"]
+        assert meshes[0].vertex_array.vertex_count() == 8
+        assert parser.read_nodes(0)[0].parts[0].mesh_id == "stone_batch0"
@@ -1,8 +1,10 @@
+import array
 import struct
 import sys
 import pytest
-from meru.binary import (Endian, parse_int32, parse_uint32, dump_int32,
-dump_uint32, BinaryStream, BinaryReader, BinaryWriter)
+from meru.binary import (ARRAY_TYPECODES, Endian, parse_int32, parse_uint32,
+dump_int32, dump_uint32, dump_array_from_format, parse_array_from_format,
+parse_typed_array_from_format, BinaryStream, BinaryReader, BinaryWriter)
 
 
 _int = -255
@@ -45,6 +47,35 @@ class TestParse:
         assert parse_uint32(_uint_bytes_big, Endian.BIG) == _uint
 
 
+class TestArrays:
+    def test_typecodes(self):
+        for frmt, typecode in ARRAY_TYPECODES.items():
+            assert array.array(typecode).itemsize == \
+                struct.calcsize("<" + frmt)
+
+    @pytest.mark.parametrize("endianness", [Endian.LITTLE, Endian.BIG])
+    def test_parse(self, endianness):
+        prefix = "<" if endianness == Endian.LITTLE else ">"
+        values = [1.5, -2.0, 3.25]
+        _bytes = struct.pack(prefix + "3f", *values)
+        assert parse_array_from_format("f", 3, _bytes, endianness) == values
+        typed = parse_typed_array_from_format("H", 2, struct.pack(
+            prefix + "2H", 1, 258), endianness)
+        assert typed == array.array(ARRAY_TYPECODES["H"], [1, 258])
+        with pytest.raises(ValueError):
+            parse_array_from_format("f", 4, _bytes, endianness)
+
+    @pytest.mark.parametrize("endianness", [Endian.LITTLE, Endian.BIG])
+    def test_dump(self, endianness):
+        prefix = "<" if endianness == Endian.LITTLE else ">"
+        values = array.array("f", [1.5, -2.0])
+        assert dump_array_from_format("f", values, endianness) == \
+            struct.pack(prefix + "2f", 1.5, -2.0)
+        assert dump_array_from_format("i", [-1, 2], endianness) == \
+            struct.pack(prefix + "2i", -1, 2)
+        assert values == array.array("f", [1.5, -2.0])
+
+
 class TestDump:
     def test_dump_int32(self):
         assert dump_int32(_int) == _int_bytes
@@ -146,6 +177,14 @@ class TestBinaryReader:
         reader = BinaryReader(b"Hello")
         assert reader.read_string(5) == "Hello"
 
+    def test_view(self):
+        reader = BinaryReader(b"Hello")
+        reader.seek(1)
+        assert bytes(reader.view(1, 4)) == b"ell"
+        assert reader.pos() == 1
+        with pytest.raises(IndexError):
+            reader.view(2, 6)
+
 
 class TestBinaryWriter:
     def setup_method(self):
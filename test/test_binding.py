@@ -0,0 +1,42 @@
+import pytest
+from meru.animation import bake_local_matrices
+from meru.binding import MISSING_BONE, MeruBindingCache
+from meru.c3b import C3bAnimKeyFrame, C3bBone, MeruSkeleton
+from meru.linear import MAT44_IDENTITY, Vec3
+
+
+@pytest.fixture
+def skeleton(c3b_model):
+    return MeruSkeleton.from_nodes(c3b_model.nodes)
+
+
+class TestBindings:
+    def test_clip(self, c3b_model, skeleton):
+        animation = c3b_model.animation
+        animation.add_keyframe("tail", C3bAnimKeyFrame(0.0,
+            translation=Vec3(0.0, 0.0, 0.0)))
+        cache = MeruBindingCache()
+        binding = cache.clip(skeleton, animation)
+        assert cache.clip(skeleton, animation) is binding
+        assert binding.channel_ids == ["root_bone", "child_bone", "tail"]
+        assert list(binding.channel_bones) == [0, 1, MISSING_BONE]
+        assert list(binding.bone_channels) == [0, 1]
+        assert binding.missing == ["tail"]
+        assert cache.missing() == [("Take 001", "tail")]
+
+        frames = bake_local_matrices(animation, skeleton, binding=binding)
+        assert frames[-1][0][12:15] == pytest.approx([2.0, 0.0, 0.0])
+
+    def test_part(self, c3b_model, skeleton):
+        part = c3b_model.nodes[1].parts[0]
+        part.bones.append(C3bBone("ghost", c3b_model.nodes[0].transform))
+        cache = MeruBindingCache()
+        binding = cache.part(skeleton, part)
+        assert list(binding.palette) == [0, 1, MISSING_BONE]
+        assert cache.missing() == [("lower", "ghost")]
+
+        worlds = [list(MAT44_IDENTITY), list(MAT44_IDENTITY[:12]) +
+            [0.0, 1.0, 0.0, 1.0]]
+        skins = binding.skin_matrices(worlds)
+        assert skins[1] == pytest.approx(list(MAT44_IDENTITY))
+        assert skins[2] == list(MAT44_IDENTITY)
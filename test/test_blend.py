@@ -0,0 +1,137 @@
+import math
+import pytest
+from meru.c3b import (C3bAnimation, C3bAnimKeyFrame, C3bParser, C3bWriter,
+MeruSkeleton)
+from meru.blend import (ADDITIVE_MODE, MeruBlendEngine, read_clips,
+subtree_mask)
+from meru.linear import Vec3, Vec4
+
+
+def _clip(_id, translations, rotation=None, total_time=1.0):
+    # Keys on root_bone at 0 and total_time.
+    animation = C3bAnimation(_id, total_time)
+    for time, translation in zip([0.0, total_time], translations):
+        animation.add_keyframe("root_bone", C3bAnimKeyFrame(time,
+            translation=Vec3(*translation)))
+    if rotation is not None:
+        for time, value in zip([0.0, total_time], rotation):
+            animation.add_keyframe("child_bone", C3bAnimKeyFrame(time,
+                rotation=Vec4(*value)))
+    return animation
+
+
+def _close(a, b):
+    return all(abs(x - y) < 1e-6 for x, y in zip(a, b))
+
+
+def _z_rotation(angle):
+    return (0.0, 0.0, math.sin(angle / 2), math.cos(angle / 2))
+
+
+@pytest.fixture
+def skeleton(c3b_model):
+    return MeruSkeleton.from_nodes(c3b_model.nodes)
+
+
+class TestBlendEngine:
+    def test_weighted_blend(self, skeleton):
+        engine = MeruBlendEngine(skeleton, [
+            _clip("walk", [(0.0, 0.0, 0.0), (4.0, 0.0, 0.0)]),
+            _clip("run", [(0.0, 0.0, 0.0), (0.0, 8.0, 0.0)])])
+        engine.add_layer("walk")
+        engine.add_layer("run")
+        instances = engine.add_instances(3)
+        assert list(instances) == [0, 1, 2]
+        engine.layers[0].weights = [1.0, 3.0, 0.0]
+        engine.layers[1].weights = [0.0, 1.0, 0.0]
+        pose = engine.tick(0.5)
+
+        assert _close(pose.local_pose(0)[0][0], (2.0, 0.0, 0.0))
+        assert _close(pose.local_pose(1)[0][0], (1.5, 1.0, 0.0))
+
+        # No weight at all leaves the bind pose.
+        assert _close(pose.local_pose(2)[0][0], (0.0, 0.0, 0.0))
+        assert _close(pose.local_pose(2)[1][0], (0.0, 1.0, 0.0))
+
+    def test_looping(self, skeleton):
+        engine = MeruBlendEngine(skeleton, [
+            _clip("walk", [(0.0, 0.0, 0.0), (4.0, 0.0, 0.0)])])
+        loop = engine.add_layer("walk")
+        engine.add_instances(2)
+        loop.speeds[1] = 2.0
+        engine.tick(0.75)
+        assert _close(loop.times, [0.75, 0.5])
+
+        once = engine.add_layer("walk", loop=False, weight=0.0)
+        once.speeds[1] = 2.0
+        engine.tick(0.75)
+        assert _close(once.times, [0.75, 1.0])
+
+    def test_masked_additive_layer(self, skeleton):
+        quarter = math.pi / 2
+        engine = MeruBlendEngine(skeleton, [
+            _clip("walk", [(0.0, 0.0, 0.0), (4.0, 0.0, 0.0)],
+                [_z_rotation(quarter), _z_rotation(quarter)]),
+            _clip("wave", [(1.0, 0.0, 0.0), (1.0, 0.0, 0.0)],
+                [_z_rotation(0.0), _z_rotation(quarter)])])
+        engine.add_layer("walk")
+        wave = engine.add_layer("wave", ADDITIVE_MODE,
+            subtree_mask(skeleton, "child_bone"))
+        engine.add_instances(2)
+        wave.weights[1] = 0.0
+        wave.times = [1.0, 1.0]
+        engine.layers[0].times = [1.0, 1.0]
+        pose = engine.evaluate()
+
+        # The mask keeps the root out of the additive layer, the child
+        # turns another quarter on top of the blended quarter.
+        assert _close(pose.local_pose(0)[0][0], (4.0, 0.0, 0.0))
+        assert _close(pose.local_pose(0)[1][1], _z_rotation(quarter * 2))
+        assert _close(pose.local_pose(1)[1][1], _z_rotation(quarter))
+
+        world = pose.world_matrices(0)
+        assert _close(world[1][12:15], (4.0, 1.0, 0.0))
+
+    def test_shared_clip_ids(self, c3b_model):
+        writer = C3bWriter()
+        writer.add_nodes(c3b_model.nodes)
+        writer.add_animation(_clip("Take 001", [(0.0, 0.0, 0.0),
+            (4.0, 0.0, 0.0)]), "Take 001")
+        writer.add_animation(_clip("Take 001", [(0.0, 0.0, 0.0),
+            (0.0, 8.0, 0.0)]), "Take 001")
+        engine = MeruBlendEngine.from_parser(C3bParser(writer.to_bytes()))
+        assert len(engine.samplers) == 2
+        with pytest.raises(ValueError):
+            engine.add_layer("Take 001")
+        engine.add_layer(1)
+        engine.add_instances(1)
+        pose = engine.tick(0.5)
+        assert _close(pose.local_pose(0)[0][0], (0.0, 4.0, 0.0))
+
+    def test_unknown_mode(self, skeleton):
+        engine = MeruBlendEngine(skeleton, [
+            _clip("walk", [(0.0, 0.0, 0.0), (4.0, 0.0, 0.0)])])
+        with pytest.raises(ValueError):
+            engine.add_layer("walk", "subtract")
+
+    def test_subtree_mask(self, skeleton):
+        assert subtree_mask(skeleton, "root_bone", 0.5) == [0.5, 0.5]
+        assert subtree_mask(skeleton, "child_bone") == [0.0, 1.0]
+
+    def test_from_parser(self, c3b_model):
+        writer = C3bWriter()
+        writer.add_nodes(c3b_model.nodes)
+        writer.add_animation(c3b_model.animation, "Take 001")
+        writer.add_animation(_clip("walk", [(0.0, 0.0, 0.0),
+            (4.0, 0.0, 0.0)]), "walk")
+        parser = C3bParser(writer.to_bytes())
+        assert [clip.id for clip in read_clips(parser)] == ["Take 001",
+            "walk"]
+
+        engine = MeruBlendEngine.from_parser(parser)
+        assert [sampler.id for sampler in engine.samplers] == ["Take 001",
+            "walk"]
+        engine.add_layer("Take 001")
+        engine.add_instances(1)
+        pose = engine.tick(1.0 - 1e-9)
+        assert _close(pose.local_pose(0)[0][0], (2.0, 0.0, 0.0))
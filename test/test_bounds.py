@@ -0,0 +1,120 @@
+import math
+import pytest
+from meru.animation import bake_world_matrices, frame_times
+from meru.bounds import (EMPTY_AABB, compute_aabb, cull_aabbs,
+cull_instances, frustum_planes, is_empty, node_bounds, recompute_mesh_aabbs,
+skinned_bounds, transform_aabb, validate_mesh_aabbs)
+from meru.c3b import MeruSkeleton
+from meru.linear import (MAT44_IDENTITY, mat44_decompose, mat44_from_trs,
+mat44_multiply, mat44_transform_point)
+
+
+def _translation(x, y, z):
+    return list(MAT44_IDENTITY[:12]) + [x, y, z, 1.0]
+
+
+class TestLinear:
+    def test_decompose_round_trip(self):
+        half = math.sqrt(0.5)
+        matrix = mat44_from_trs((1.0, 2.0, 3.0), (0.0, half, 0.0, half),
+            (2.0, 3.0, 4.0))
+        translation, rotation, scale = mat44_decompose(matrix)
+        assert translation == pytest.approx((1.0, 2.0, 3.0))
+        assert rotation == pytest.approx((0.0, half, 0.0, half))
+        assert scale == pytest.approx((2.0, 3.0, 4.0))
+
+    def test_multiply_applies_right_first(self):
+        rotate = mat44_from_trs((0.0, 0.0, 0.0),
+            (0.0, 0.0, math.sqrt(0.5), math.sqrt(0.5)), (1.0, 1.0, 1.0))
+        matrix = mat44_multiply(_translation(5.0, 0.0, 0.0), rotate)
+        assert mat44_transform_point(matrix, (1.0, 0.0, 0.0)) == \
+            pytest.approx((5.0, 1.0, 0.0))
+
+
+class TestMeshBounds:
+    def test_compute_aabb(self, c3b_model):
+        mesh = c3b_model.meshes[0]
+        assert compute_aabb(mesh.vertex_array, mesh.indices) == \
+            [0.0, 0.0, 0.0, 1.0, 2.0, 0.0]
+        assert compute_aabb(mesh.vertex_array, [0, 1]) == \
+            [0.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+
+    def test_validate_and_recompute(self, c3b_model):
+        meshes = c3b_model.meshes
+        assert validate_mesh_aabbs(meshes) == []
+        meshes[1].aabb = [0.0, 0.0, 0.0, 5.0, 5.0, 5.0]
+        mismatches = validate_mesh_aabbs(meshes)
+        assert [mismatch.mesh_id for mismatch in mismatches] == ["upper"]
+        recompute_mesh_aabbs(meshes)
+        assert validate_mesh_aabbs(meshes) == []
+
+    def test_transform_aabb(self):
+        rotate = mat44_from_trs((1.0, 0.0, 0.0),
+            (0.0, 0.0, math.sqrt(0.5), math.sqrt(0.5)), (1.0, 1.0, 1.0))
+        assert transform_aabb([0.0, 0.0, 0.0, 1.0, 2.0, 3.0], rotate) == \
+            pytest.approx([-1.0, 0.0, 0.0, 1.0, 1.0, 3.0])
+        assert is_empty(transform_aabb(EMPTY_AABB, rotate))
+
+
+class TestSkinnedBounds:
+    def test_contains_skinned_vertices(self, c3b_model):
+        skeleton = MeruSkeleton.from_nodes(c3b_model.nodes)
+        animation = c3b_model.animation
+        frames = bake_world_matrices(animation, skeleton, 10.0)
+        assert len(frames) == len(frame_times(animation.total_time, 10.0))
+        mesh = c3b_model.meshes[0]
+        part = c3b_model.nodes[1].parts[0]
+        boxes = skinned_bounds(mesh, part, skeleton, frames)
+        assert boxes[0] == pytest.approx([0.0, 0.0, 0.0, 1.0, 2.0, 0.0])
+
+        vertex_array = mesh.vertex_array
+        positions = vertex_array.get_attribute_vertices(
+            "VERTEX_ATTRIB_POSITION")
+        weights = vertex_array.get_attribute_vertices(
+            "VERTEX_ATTRIB_BLEND_WEIGHT")
+        slots = vertex_array.get_attribute_vertices(
+            "VERTEX_ATTRIB_BLEND_INDEX")
+        for worlds, box in zip(frames, boxes):
+            for vertex in set(mesh.indices):
+                skinned = [0.0, 0.0, 0.0]
+                for weight, slot in zip(weights[vertex], slots[vertex]):
+                    bone = part.bones[int(slot)]
+                    index = [b.id for b in skeleton.bones].index(bone.name)
+                    skin = mat44_multiply(worlds[index],
+                        bone.inv_bind_pos.unpack())
+                    point = mat44_transform_point(skin, positions[vertex])
+                    for axis in range(3):
+                        skinned[axis] += weight * point[axis]
+                for axis in range(3):
+                    assert box[axis] - 1e-9 <= skinned[axis] <= \
+                        box[axis + 3] + 1e-9
+        assert boxes[-1][0] >= 1.0
+
+
+class TestNodeBounds:
+    def test_hierarchy(self, c3b_model):
+        c3b_model.nodes[1].transform.values[12] = 10.0
+        roots = node_bounds(c3b_model.nodes, c3b_model.meshes)
+        assert [root.node.id for root in roots] == ["root_bone", "body"]
+        assert is_empty(roots[0].subtree_aabb)
+        assert roots[0].children[0].world_transform[13] == 1.0
+        assert roots[1].subtree_aabb == [10.0, 0.0, 0.0, 11.0, 2.0, 0.0]
+
+
+class TestCulling:
+    def test_cull_aabbs(self):
+        planes = frustum_planes(MAT44_IDENTITY)
+        boxes = [
+            -0.5, -0.5, -0.5, 0.5, 0.5, 0.5,
+            2.0, 2.0, 2.0, 3.0, 3.0, 3.0,
+            0.9, -3.0, -0.1, 5.0, 3.0, 0.1,
+            -3.0, 0.0, 0.0, -1.5, 0.5, 0.5
+        ]
+        assert cull_aabbs(planes, boxes) == [0, 2]
+
+    def test_cull_instances(self):
+        planes = frustum_planes(MAT44_IDENTITY)
+        matrices = [_translation(x * 0.5, 0.0, 0.0) for x in range(-4, 5)]
+        visible = cull_instances(planes, [-0.1, -0.1, -0.1, 0.1, 0.1, 0.1],
+            matrices)
+        assert visible == [2, 3, 4, 5, 6]
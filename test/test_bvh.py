@@ -0,0 +1,133 @@
+import math
+import random
+import pytest
+from meru.bvh import MeruBvh
+
+
+def _brute_force_ray(coords, origin, direction):
+    best = None
+    for triangle in range(len(coords) // 9):
+        a = coords[triangle * 9:triangle * 9 + 3]
+        b = coords[triangle * 9 + 3:triangle * 9 + 6]
+        c = coords[triangle * 9 + 6:triangle * 9 + 9]
+        e1 = [b[i] - a[i] for i in range(3)]
+        e2 = [c[i] - a[i] for i in range(3)]
+        p = [direction[1] * e2[2] - direction[2] * e2[1],
+            direction[2] * e2[0] - direction[0] * e2[2],
+            direction[0] * e2[1] - direction[1] * e2[0]]
+        det = sum(e1[i] * p[i] for i in range(3))
+        if abs(det) < 1e-9:
+            continue
+        s = [origin[i] - a[i] for i in range(3)]
+        u = sum(s[i] * p[i] for i in range(3)) / det
+        q = [s[1] * e1[2] - s[2] * e1[1], s[2] * e1[0] - s[0] * e1[2],
+            s[0] * e1[1] - s[1] * e1[0]]
+        v = sum(direction[i] * q[i] for i in range(3)) / det
+        t = sum(e2[i] * q[i] for i in range(3)) / det
+        if u >= 0 and v >= 0 and u + v <= 1 and t >= 0:
+            if best is None or t < best:
+                best = t
+    return best
+
+
+def _soup(count, seed=3):
+    rng = random.Random(seed)
+    coords = []
+    for i in range(count):
+        center = [rng.uniform(-10, 10) for axis in range(3)]
+        for corner in range(3):
+            coords.extend(center[axis] + rng.uniform(-1, 1)
+                for axis in range(3))
+    return coords
+
+
+class TestMeruBvh:
+    def setup_method(self):
+        self.coords = _soup(300)
+        self.bvh = MeruBvh.from_coords(self.coords)
+
+    def test_structure(self):
+        assert self.bvh.triangle_count() == 300
+        assert sorted(self.bvh.triangle_order) == list(range(300))
+        assert self.bvh.node_total() > 1
+
+    def test_rays_match_brute_force(self):
+        rng = random.Random(5)
+        origins = []
+        directions = []
+        for ray in range(50):
+            origins.extend(rng.uniform(-12, 12) for axis in range(3))
+            direction = [rng.uniform(-1, 1) for axis in range(3)]
+            directions.extend(direction)
+        hits = self.bvh.intersect_rays(origins, directions)
+        for ray, hit in enumerate(hits):
+            expected = _brute_force_ray(self.coords,
+                origins[ray * 3:ray * 3 + 3],
+                directions[ray * 3:ray * 3 + 3])
+            if expected is None:
+                assert hit is None
+            else:
+                assert hit.t == pytest.approx(expected)
+
+    def test_axis_aligned_ray(self):
+        bvh = MeruBvh.from_coords([0, 0, 0, 1, 0, 0, 0, 1, 0])
+        hit = bvh.intersect_ray([0.25, 0.25, 5.0], [0.0, 0.0, -1.0])
+        assert hit.t == pytest.approx(5.0)
+        assert hit.triangle == 0
+        assert bvh.intersect_ray([2.0, 2.0, 5.0], [0.0, 0.0, -1.0]) is None
+
+    def test_closest_point(self):
+        rng = random.Random(7)
+        for sample in range(20):
+            point = [rng.uniform(-15, 15) for axis in range(3)]
+            distance, triangle, closest = self.bvh.closest_point(point)
+            brute = MeruBvh.from_coords(
+                self.coords[triangle * 9:triangle * 9 + 9])
+            assert brute.closest_point(point)[0] == pytest.approx(distance)
+            for other in range(0, 300, 7):
+                single = MeruBvh.from_coords(
+                    self.coords[other * 9:other * 9 + 9])
+                assert single.closest_point(point)[0] >= distance - 1e-9
+
+    def test_closest_point_on_face(self):
+        bvh = MeruBvh.from_coords([0, 0, 0, 4, 0, 0, 0, 4, 0])
+        distance, triangle, closest = bvh.closest_point([1.0, 1.0, 2.0])
+        assert distance == pytest.approx(2.0)
+        assert closest == pytest.approx((1.0, 1.0, 0.0))
+
+    def test_query_aabb(self):
+        box = [-2.0, -2.0, -2.0, 2.0, 2.0, 2.0]
+        expected = []
+        for triangle in range(300):
+            xs = self.coords[triangle * 9:triangle * 9 + 9:3]
+            ys = self.coords[triangle * 9 + 1:triangle * 9 + 9:3]
+            zs = self.coords[triangle * 9 + 2:triangle * 9 + 9:3]
+            if (min(xs) <= 2 and max(xs) >= -2 and min(ys) <= 2 and
+            max(ys) >= -2 and min(zs) <= 2 and max(zs) >= -2):
+                expected.append(triangle)
+        assert self.bvh.query_aabb(box) == expected
+
+    def test_serialization(self):
+        restored = MeruBvh.from_bytes(self.bvh.to_bytes())
+        assert list(restored.node_bounds) == list(self.bvh.node_bounds)
+        assert list(restored.triangle_order) == \
+            list(self.bvh.triangle_order)
+        hit = restored.intersect_ray([0.0, 0.0, -20.0], [0.0, 0.0, 1.0])
+        expected = self.bvh.intersect_ray([0.0, 0.0, -20.0],
+            [0.0, 0.0, 1.0])
+        assert (hit is None) == (expected is None)
+        with pytest.raises(ValueError):
+            MeruBvh.from_bytes(b"nope")
+
+    def test_from_meshes(self, c3b_model):
+        bvh = MeruBvh.from_meshes(c3b_model.meshes)
+        assert bvh.triangle_count() == 2
+        hit = bvh.intersect_ray([0.25, 1.5, 1.0], [0.0, 0.0, -1.0])
+        assert bvh.locate(hit.triangle) == (1, 0)
+        assert math.isclose(hit.t, 1.0)
+
+    def test_empty(self):
+        bvh = MeruBvh.from_coords([])
+        assert bvh.intersect_ray([0, 0, 0], [0, 0, 1]) is None
+        assert bvh.closest_point([0, 0, 0]) is None
+        assert bvh.query_aabb([0, 0, 0, 1, 1, 1]) == []
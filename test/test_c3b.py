@@ -0,0 +1,171 @@
+import array
+import pytest
+from meru.binary import Endian
+from meru.c3b import (C3bError, C3bNode, C3bParser, C3bStringTable,
+C3bType, C3bWriter, MeruSkeleton)
+from meru.linear import Mat44
+
+
+class TestC3bParser:
+    def test_header(self, c3b_bytes):
+        parser = C3bParser(c3b_bytes)
+        assert parser.verify_signature()
+        header = parser.read_header()
+        assert (header.major_version, header.minor_version) == (0, 9)
+        assert [ref.type for ref in header.references] == [C3bType.MESHES,
+            C3bType.MATERIALS, C3bType.NODES, C3bType.ANIMATIONS]
+
+    def test_meshes(self, c3b_bytes, c3b_model):
+        meshes = C3bParser(c3b_bytes).read_meshes(0)
+        assert [mesh.id for mesh in meshes] == ["lower", "upper"]
+        assert meshes[0].vertex_array is meshes[1].vertex_array
+        assert meshes[1].indices == array.array("H", [0, 2, 3])
+        assert meshes[0].vertex_array.values == array.array("f",
+            c3b_model.meshes[0].vertex_array.values)
+        assert meshes[0].vertex_array.get_blend_indices()[0].unpack() == \
+            (0, 1, 0, 0)
+
+    def test_materials(self, c3b_bytes):
+        materials = C3bParser(c3b_bytes).read_materials(0)
+        assert materials[0].diffuse.unpack() == (0.5, 0.25, 1.0)
+        assert materials[0].shininess == 2.0
+        assert materials[0].textures[0].filename == "skin.png"
+        assert materials[0].textures[0].uv_scale.unpack() == (1.0, 1.0)
+
+    def test_nodes(self, c3b_bytes):
+        nodes = C3bParser(c3b_bytes).read_nodes(0)
+        assert [node.id for node in nodes] == ["root_bone", "body"]
+        assert nodes[1].parts[0].uv_mapping == [[0]]
+        skeleton = MeruSkeleton.from_nodes(nodes)
+        assert [bone.id for bone in skeleton.bones] == ["root_bone",
+            "child_bone"]
+
+    def test_animations(self, c3b_bytes):
+        animation = C3bParser(c3b_bytes).read_animations(0)
+        assert animation.id == "Take 001"
+        assert animation.get_bones() == ["root_bone", "child_bone"]
+        keyframes = animation.get_keyframes("root_bone")
+        assert keyframes[1].rotation is None
+        assert keyframes[1].translation.unpack() == (2.0, 0.0, 0.0)
+
+    def test_strings_are_shared(self, c3b_bytes):
+        strings = C3bStringTable()
+        first = C3bParser(c3b_bytes, strings).read_nodes(0)
+        string_count = len(strings)
+        second = C3bParser(c3b_bytes, strings).read_nodes(0)
+        assert first[1].parts[0].bones[0].name is \
+            second[1].parts[1].bones[0].name
+        assert first[0].id is second[0].id
+        assert len(strings) == string_count
+
+        other = C3bParser(c3b_bytes).read_nodes(0)
+        assert other[0].id is first[0].id
+
+    def test_non_ascii_strings(self):
+        writer = C3bWriter()
+        writer.add_nodes([C3bNode("b\u00f6ne", True, Mat44.identity())])
+        nodes = C3bParser(writer.to_bytes()).read_nodes(0)
+        assert nodes[0].id == "b\u00f6ne"
+
+    def test_mutable_buffers(self, c3b_bytes):
+        expected = C3bParser(c3b_bytes).read_nodes(0)
+        for buffer in [bytearray(c3b_bytes), memoryview(c3b_bytes)]:
+            parser = C3bParser(buffer)
+            assert parser.read_header().references[3].id == "Take 001"
+            assert [node.id for node in parser.read_nodes(0)] == \
+                [node.id for node in expected]
+
+    def test_seek_type_out_of_bounds(self, c3b_bytes):
+        with pytest.raises(IndexError):
+            C3bParser(c3b_bytes).read_meshes(1)
+
+
+class TestBigEndian:
+    def test_sections(self, c3b_bytes, c3b_big_bytes):
+        little = C3bParser(c3b_bytes)
+        big = C3bParser(c3b_big_bytes, endianness=Endian.BIG)
+        assert big.verify_signature()
+        assert [(ref.id, ref.type) for ref in big.read_header().references] \
+            == [(ref.id, ref.type) for ref in little.read_header().references]
+        for mesh, expected in zip(big.read_meshes(0), little.read_meshes(0)):
+            assert mesh.vertex_array.values == expected.vertex_array.values
+            assert mesh.indices == expected.indices
+            assert mesh.aabb == expected.aabb
+        assert big.read_materials(0)[0].diffuse.unpack() == \
+            little.read_materials(0)[0].diffuse.unpack()
+        assert [node.transform.unpack() for node in big.read_nodes(0)] == \
+            [node.transform.unpack() for node in little.read_nodes(0)]
+        assert big.read_animation_arrays(0) == \
+            little.read_animation_arrays(0)
+
+    def test_round_trip(self, c3b_big_bytes):
+        parser = C3bParser(c3b_big_bytes, endianness=Endian.BIG)
+        assert C3bWriter.from_parser(parser).to_bytes() == c3b_big_bytes
+
+    def test_wrong_endianness(self, c3b_big_bytes):
+        with pytest.raises((ValueError, IndexError)):
+            C3bParser(c3b_big_bytes).read_meshes(0)
+
+
+class TestC3bWriter:
+    def test_round_trip_is_byte_identical(self, c3b_bytes):
+        writer = C3bWriter.from_parser(C3bParser(c3b_bytes))
+        assert writer.to_bytes() == c3b_bytes
+
+    def test_offsets(self, c3b_bytes):
+        header = C3bParser(c3b_bytes).read_header()
+        offsets = [ref.offset for ref in header.references]
+        assert offsets == sorted(offsets)
+        assert offsets[-1] < len(c3b_bytes)
+
+    def test_empty_document(self):
+        parser = C3bParser(C3bWriter().to_bytes())
+        assert parser.verify_signature()
+        assert parser.read_header().references == []
+
+    def test_mesh_without_aabb(self, c3b_model):
+        c3b_model.meshes[0].aabb = []
+        with pytest.raises(C3bError):
+            C3bWriter().add_meshes(c3b_model.meshes)
+
+
+class TestMeruNodeTable:
+    def test_table(self, c3b_bytes):
+        table = C3bParser(c3b_bytes).read_node_table(0)
+        assert [node.id for node in table.nodes] == ["root_bone",
+            "child_bone", "body"]
+        assert list(table.parents) == [-1, 0, -1]
+        assert list(table.depths) == [0, 1, 0]
+        assert list(table.first_children) == [1, -1, -1]
+        assert list(table.next_siblings) == [2, -1, -1]
+        assert list(table.subtree_ends) == [2, 2, 3]
+        assert table.find("body") == 2
+        assert table.find("missing") == -1
+        assert list(table.children(0)) == [1]
+        assert table.roots() == [0, 2]
+        assert table.skeleton_roots() == [0]
+        assert table.is_ancestor(0, 1)
+        assert not table.is_ancestor(0, 2)
+        assert [part.mesh_id for part in table.node_parts(2)] == ["lower",
+            "upper"]
+        assert table.node_parts(0) == []
+
+    def test_deep_hierarchy(self):
+        depth = 5000
+        root = C3bNode("node0", True, Mat44.identity())
+        node = root
+        for i in range(1, depth):
+            child = C3bNode("node{0}".format(i), False, Mat44.identity())
+            node.children.append(child)
+            node = child
+        writer = C3bWriter()
+        writer.add_nodes([root])
+        parser = C3bParser(writer.to_bytes())
+
+        table = parser.read_node_table(0)
+        assert len(table) == depth
+        assert table.depths[-1] == depth - 1
+        assert table.subtree_ends[0] == depth
+        assert len(list(table.ancestors(depth - 1))) == depth - 1
+        skeleton = MeruSkeleton.from_nodes(parser.read_nodes(0))
+        assert skeleton.bones[-1].parent.index == depth - 2
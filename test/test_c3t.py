@@ -0,0 +1,133 @@
+import io
+import json
+import pytest
+from meru.c3b import C3bError, C3bParser
+from meru.c3t import C3tParser, C3tTokenizer, compile_files
+
+
+def _node_to_json(node):
+    return {
+        "id": node.id,
+        "skeleton": node.is_skeleton,
+        "transform": list(node.transform.unpack()),
+        "parts": [{
+            "meshpartid": part.mesh_id,
+            "materialid": part.material_id,
+            "bones": [{"node": bone.name,
+                "transform": list(bone.inv_bind_pos.unpack())}
+                for bone in part.bones],
+            "uvMapping": part.uv_mapping
+        } for part in node.parts],
+        "children": [_node_to_json(child) for child in node.children]
+    }
+
+
+def _keyframe_to_json(keyframe):
+    data = {"keytime": keyframe.time}
+    for name in ["rotation", "scale", "translation"]:
+        value = getattr(keyframe, name)
+        if value is not None:
+            data[name] = list(value.unpack())
+    return data
+
+
+def _to_c3t(model):
+    vertex_array = model.meshes[0].vertex_array
+    animation = model.animation
+    return {
+        "version": "0.9",
+        "id": "",
+        "meshes": [{
+            "attributes": [{"size": attrib.value_count, "type": attrib.type,
+                "attribute": attrib.name}
+                for attrib in vertex_array.attributes],
+            "vertices": vertex_array.values,
+            "parts": [{"id": mesh.id, "type": "TRIANGLES",
+                "indices": mesh.indices, "aabb": mesh.aabb}
+                for mesh in model.meshes]
+        }],
+        "materials": [{
+            "id": material.id,
+            "ambient": list(material.ambient.unpack()),
+            "diffuse": list(material.diffuse.unpack()),
+            "emissive": list(material.emissive.unpack()),
+            "opacity": material.opacity,
+            "specular": list(material.specular.unpack()),
+            "shininess": material.shininess,
+            "textures": [{"id": texture.id, "filename": texture.filename,
+                "type": texture.type, "wrapModeU": texture.wrap_u,
+                "wrapModeV": texture.wrap_v}
+                for texture in material.textures]
+        } for material in model.materials],
+        "nodes": [_node_to_json(node) for node in model.nodes],
+        "animations": [{
+            "id": animation.id,
+            "length": animation.total_time,
+            "bones": [{"boneId": bone, "keyframes": [_keyframe_to_json(
+                keyframe) for keyframe in animation.get_keyframes(bone)]}
+                for bone in animation.get_bones()]
+        }]
+    }
+
+
+@pytest.fixture
+def c3t_text(c3b_model):
+    return json.dumps(_to_c3t(c3b_model), indent=2)
+
+
+class TestC3tTokenizer:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 64])
+    def test_number_array(self, chunk_size):
+        text = "[1.5, -2e3,\n 30 , 0.125]"
+        tokenizer = C3tTokenizer(io.StringIO(text), chunk_size)
+        assert list(tokenizer.read_number_array("f")) == \
+            [1.5, -2000.0, 30.0, 0.125]
+
+    @pytest.mark.parametrize("chunk_size", [1, 5])
+    def test_value(self, chunk_size):
+        text = "{\"a\": [1, 2.5, \"x\\u00e9\"], \"b\": {}, \"c\": null," \
+            " \"d\": true, \"e\": []}"
+        tokenizer = C3tTokenizer(io.StringIO(text), chunk_size)
+        assert tokenizer.read_value() == json.loads(text)
+
+    def test_errors(self):
+        with pytest.raises(C3bError):
+            C3tTokenizer(io.StringIO("[1, 2,]")).read_number_array()
+        with pytest.raises(C3bError):
+            C3tTokenizer(io.StringIO("[1, 2")).read_number_array()
+        with pytest.raises(C3bError):
+            C3tTokenizer(io.StringIO("[70000]")).read_number_array("H")
+        with pytest.raises(C3bError):
+            C3tTokenizer(io.StringIO("{\"a\" 1}")).read_value()
+
+
+class TestC3tParser:
+    @pytest.mark.parametrize("chunk_size", [7, 1 << 16])
+    def test_compiles_to_same_bytes(self, c3t_text, c3b_bytes, chunk_size):
+        model = C3tParser(io.StringIO(c3t_text), chunk_size).read()
+        assert (model.major_version, model.minor_version) == (0, 9)
+        assert [mesh.id for mesh in model.meshes] == ["lower", "upper"]
+        assert model.meshes[0].vertex_array is model.meshes[1].vertex_array
+        assert model.to_writer().to_bytes() == c3b_bytes
+
+    def test_missing_aabb(self, c3b_model):
+        data = _to_c3t(c3b_model)
+        for part in data["meshes"][0]["parts"]:
+            del part["aabb"]
+        model = C3tParser(io.StringIO(json.dumps(data))).read()
+        assert model.meshes[0].aabb == [0.0, 0.0, 0.0, 1.0, 2.0, 0.0]
+
+    def test_compile_files(self, tmpdir, c3t_text, c3b_bytes):
+        source = tmpdir.mkdir("source")
+        source.mkdir("sub").join("good.c3t").write(c3t_text)
+        source.join("bad.c3t").write("{\"meshes\": [")
+        output = tmpdir.join("output")
+
+        results = compile_files([str(source)], str(output), workers=2)
+        errors = {result.source_path: result.error for result in results}
+        assert errors[str(source.join("sub", "good.c3t"))] is None
+        assert errors[str(source.join("bad.c3t"))] is not None
+
+        compiled = output.join("sub", "good.c3b").read_binary()
+        assert compiled == c3b_bytes
+        assert C3bParser(compiled).read_animations(0).id == "Take 001"
@@ -0,0 +1,83 @@
+import math
+import random
+import pytest
+from meru.c3b import (C3bAnimation, C3bAnimKeyFrame, C3bParser,
+C3bWriter)
+from meru.compress import (ENCODING_SMALLEST_THREE, ENCODING_UINT16,
+compress_animation, decode_smallest_three, encode_smallest_three,
+quat_error)
+from meru.linear import Vec3, Vec4
+
+
+def _baked_animation(frame_count=31):
+    # One key per frame: a linear slide, a constant scale and a rotation
+    # about z that nlerp cannot follow with a single segment.
+    animation = C3bAnimation("walk", 1.0)
+    for frame in range(frame_count):
+        time = frame / (frame_count - 1)
+        angle = time * math.pi
+        animation.add_keyframe("hip", C3bAnimKeyFrame(time,
+            scale=Vec3(1.0, 1.0, 1.0),
+            rotation=Vec4(0.0, 0.0, math.sin(angle / 2), math.cos(angle / 2)),
+            translation=Vec3(time * 4.0, 1.0, -time)))
+        animation.add_keyframe("still", C3bAnimKeyFrame(time,
+            translation=Vec3(0.0, 2.0, 0.0)))
+    return animation
+
+
+class TestCompressAnimation:
+    def test_reduces_keys(self):
+        compressed = compress_animation(_baked_animation(),
+            rotation_tolerance=1e-3)
+        hip = compressed.channels["hip"]
+        assert hip.translation.key_count() == 2
+        assert hip.scale.key_count() == 1
+        assert 2 < hip.rotation.key_count() < 31
+        assert compressed.channels["still"].translation.key_count() == 1
+
+        report = compressed.report
+        assert report.source_key_count == 31 * 4
+        assert report.max_position_error <= 1e-4
+        assert report.max_rotation_error <= 1e-3
+        assert report.ratio() > 4.0
+
+    def test_quantized(self):
+        compressed = compress_animation(_baked_animation(), quantize=True)
+        hip = compressed.channels["hip"]
+        assert hip.rotation.encoding == ENCODING_SMALLEST_THREE
+        assert hip.translation.encoding == ENCODING_UINT16
+        report = compressed.report
+        assert report.max_position_error < 4.0 / 65535 * 2
+        assert report.max_rotation_error < 1e-3
+        assert report.compressed_size < \
+            compress_animation(_baked_animation()).report.compressed_size
+
+    def test_loads_back_into_c3b(self):
+        compressed = compress_animation(_baked_animation(), quantize=True)
+        writer = C3bWriter()
+        writer.add_animation(compressed.to_animation(), "walk")
+        animation = C3bParser(writer.to_bytes()).read_animations(0)
+        assert animation.get_bones() == ["hip", "still"]
+
+        keyframes = animation.get_keyframes("hip")
+        assert keyframes[0].time == 0.0
+        assert keyframes[0].scale.unpack() == (1.0, 1.0, 1.0)
+        assert keyframes[-1].time == 1.0
+        assert keyframes[-1].scale is None
+        assert keyframes[-1].translation.unpack() == \
+            pytest.approx((4.0, 1.0, -1.0), abs=1e-4)
+        still = animation.get_keyframes("still")
+        assert len(still) == 1
+        assert still[0].translation.unpack() == (0.0, 2.0, 0.0)
+
+    def test_smallest_three(self):
+        rng = random.Random(3)
+        rotations = []
+        for i in range(200):
+            rotation = [rng.uniform(-1.0, 1.0) for j in range(4)]
+            length = math.sqrt(sum(value * value for value in rotation))
+            rotations.append(tuple(value / length for value in rotation))
+        data = encode_smallest_three(rotations)
+        assert len(data) == 3 * len(rotations)
+        for rotation, decoded in zip(rotations, decode_smallest_three(data)):
+            assert quat_error(rotation, decoded) < 2e-4
@@ -0,0 +1,123 @@
+import gc
+import tracemalloc
+import pytest
+from meru.c3b import (C3bContentStore, C3bError, C3bParser, C3bType,
+C3bVertexArray, C3bWriter)
+from meru.dedupe import dedupe_report
+
+
+class TestContentStore:
+    def test_shares_vertex_arrays(self, c3b_bytes):
+        store = C3bContentStore()
+        first = C3bParser(c3b_bytes, store=store).read_meshes(0)
+        second = C3bParser(c3b_bytes, store=store).read_meshes(0)
+        assert first[0].vertex_array is second[0].vertex_array
+        assert first[0].vertex_array is first[1].vertex_array
+        values = first[0].vertex_array.values
+        assert isinstance(values, memoryview) and values.readonly
+        with pytest.raises(TypeError):
+            values[0] = 5.0
+        assert list(first[0].vertex_array.values) == \
+            list(C3bParser(c3b_bytes).read_meshes(0)[0].vertex_array.values)
+        assert [mesh.indices for mesh in second] == \
+            [mesh.indices for mesh in first]
+        assert store.hits == 1
+        assert store.shared_bytes > 0
+
+    def test_shares_animations(self, c3b_bytes):
+        store = C3bContentStore()
+        first = C3bParser(c3b_bytes, store=store).read_animations(0)
+        second = C3bParser(c3b_bytes, store=store).read_animations(0)
+        assert first is second
+        assert first.get_bones() == ["root_bone", "child_bone"]
+
+    def test_stored_values_stay_compact(self, c3b_model):
+        # Shared values cost no more than the float array of a plain read.
+        vertex_array = c3b_model.meshes[0].vertex_array
+        vertex_array.values = vertex_array.values * 4096
+        _bytes = c3b_model.to_bytes()
+        sizes = []
+        for store in [None, C3bContentStore()]:
+            tracemalloc.start()
+            meshes = C3bParser(_bytes, store=store).read_meshes(0)
+            sizes.append(tracemalloc.get_traced_memory()[0])
+            tracemalloc.stop()
+            del meshes
+        assert sizes[1] < sizes[0] * 1.25
+        assert sizes[1] < len(vertex_array.values) * 8
+
+    def test_copies_within_document(self, c3b_model):
+        # Equal vertex arrays within one document stay separate, so the
+        # document writes back unchanged.
+        upper = c3b_model.meshes[1]
+        copy = C3bVertexArray()
+        copy.attributes = list(upper.vertex_array.attributes)
+        copy.values = list(upper.vertex_array.values)
+        upper.vertex_array = copy
+        _bytes = c3b_model.to_bytes()
+
+        store = C3bContentStore()
+        C3bParser(_bytes, store=store).read_meshes(0)
+        for parser in [C3bParser(_bytes, store=store),
+        C3bParser(_bytes, store=store)]:
+            lower, upper = parser.read_meshes(0)
+            assert lower.vertex_array is not upper.vertex_array
+            assert lower.vertex_array.values is upper.vertex_array.values
+            assert C3bWriter.from_parser(parser).to_bytes() == _bytes
+
+    def test_shared_animations_are_frozen(self, c3b_bytes):
+        store = C3bContentStore()
+        animation = C3bParser(c3b_bytes, store=store).read_animations(0)
+        assert isinstance(animation.get_keyframes("root_bone"), tuple)
+        with pytest.raises(C3bError):
+            animation.add_keyframe("root_bone", None)
+
+    def test_different_content(self, c3b_model):
+        store = C3bContentStore()
+        first = C3bParser(c3b_model.to_bytes(), store=store).read_meshes(0)
+        c3b_model.meshes[0].vertex_array.values[0] = 5.0
+        second = C3bParser(c3b_model.to_bytes(), store=store).read_meshes(0)
+        assert first[0].vertex_array is not second[0].vertex_array
+        assert second[0].vertex_array.values[0] == 5.0
+
+    def test_weak_entries(self, c3b_bytes):
+        store = C3bContentStore()
+        meshes = C3bParser(c3b_bytes, store=store).read_meshes(0)
+        animation = C3bParser(c3b_bytes, store=store).read_animations(0)
+        assert len(store) == 2
+        del meshes, animation
+        gc.collect()
+        assert len(store) == 0
+
+    def test_section_extents(self, c3b_bytes):
+        extents = C3bParser(c3b_bytes).section_extents()
+        assert [ref.type for ref, start, end in extents] == [
+            C3bType.MESHES, C3bType.MATERIALS, C3bType.NODES,
+            C3bType.ANIMATIONS]
+        for (ref, start, end), (next_ref, next_start, next_end) in zip(
+        extents, extents[1:]):
+            assert end == next_start
+        assert extents[-1][2] == len(c3b_bytes)
+
+
+class TestDedupeReport:
+    def test_report(self, tmp_path, c3b_bytes, c3b_model):
+        other = c3b_model
+        other.meshes[0].vertex_array.values[0] = 5.0
+        (tmp_path / "a.c3b").write_bytes(c3b_bytes)
+        (tmp_path / "b.c3b").write_bytes(c3b_bytes)
+        (tmp_path / "c.c3b").write_bytes(other.to_bytes())
+        (tmp_path / "d.c3b").write_bytes(b"junk")
+
+        report = dedupe_report([str(tmp_path)], workers=2)
+        assert report.file_count == 3
+        assert len(report.errors) == 1
+        vertex_arrays, animations = report.kinds()
+        assert vertex_arrays.payloads == 3
+        assert vertex_arrays.unique == 2
+        assert vertex_arrays.shareable_bytes == vertex_arrays.bytes // 3
+        assert animations.payloads == 3
+        assert animations.unique == 1
+        assert animations.shareable_bytes == animations.bytes * 2 // 3
+        assert report.to_dict()["shareable_bytes"] == \
+            vertex_arrays.shareable_bytes + animations.shareable_bytes
@@ -0,0 +1,119 @@
+from meru.c3b import (C3bAnimKeyFrame, C3bMesh, C3bNode, C3bParser, C3bType,
+C3bWriter)
+from meru.diff import diff_files, diff_parsers
+from meru.linear import Mat44, Vec3
+
+
+def _changes(diff):
+    return sorted((change.kind, change.id, change.change,
+        tuple(change.fields)) for change in diff.changes)
+
+
+def _statuses(diff):
+    return [(C3bType.name(section.type), section.status)
+        for section in diff.sections]
+
+
+class TestDiff:
+    def test_equal(self, c3b_bytes):
+        diff = diff_parsers(C3bParser(c3b_bytes), C3bParser(c3b_bytes))
+        assert diff.is_equal()
+        assert diff.changes == []
+        assert diff.section_counts() == {"equal": 4}
+
+    def test_only_changed_sections_decode(self, c3b_bytes, c3b_model,
+    monkeypatch):
+        c3b_model.materials[0].shininess = 4.0
+        decoded = []
+        read_materials = C3bParser.read_materials
+
+        def recording_read(parser, index):
+            decoded.append(index)
+            return read_materials(parser, index)
+
+        for name in ["read_meshes", "read_nodes", "read_animations"]:
+            monkeypatch.setattr(C3bParser, name, None)
+        monkeypatch.setattr(C3bParser, "read_materials", recording_read)
+        diff = diff_parsers(C3bParser(c3b_bytes),
+            C3bParser(c3b_model.to_bytes()))
+        assert decoded == [0, 0]
+        assert _statuses(diff) == [("MESHES", "equal"),
+            ("MATERIALS", "changed"), ("NODES", "equal"),
+            ("ANIMATIONS", "equal")]
+        assert _changes(diff) == [
+            ("material", "skin", "changed", ("shininess",))]
+
+    def test_item_changes(self, c3b_bytes, c3b_model):
+        model = c3b_model
+        lower, upper = model.meshes
+        lower.indices = [0, 2, 1]
+        extra = C3bMesh("extra", upper.vertex_array)
+        extra.indices = [1, 2, 3]
+        extra.aabb = list(upper.aabb)
+        model.meshes = [lower, extra]
+        model.materials[1].textures = model.materials[0].textures
+        root_bone, body = model.nodes
+        child_bone = root_bone.children[0]
+        child_bone.transform = Mat44(list(child_bone.transform.values[:12]) +
+            [0.0, 2.0, 0.0, 1.0])
+        child_bone.children.append(C3bNode("tip", False,
+            Mat44.identity()))
+        body.parts[0].material_id = "plain"
+        model.animation.get_keyframes("root_bone")[1].translation = \
+            Vec3(3.0, 0.0, 0.0)
+        model.animation.add_keyframe("tip", C3bAnimKeyFrame(0.0,
+            scale=Vec3(1.0, 1.0, 1.0)))
+
+        diff = diff_parsers(C3bParser(c3b_bytes),
+            C3bParser(model.to_bytes()))
+        assert not diff.is_equal()
+        assert diff.section_counts() == {"changed": 4}
+        assert _changes(diff) == [
+            ("channel", "Take 001/root_bone", "changed", ("translation",)),
+            ("channel", "Take 001/tip", "added", ()),
+            ("material", "plain", "changed", ("textures",)),
+            ("mesh", "extra", "added", ()),
+            ("mesh", "lower", "changed", ("indices",)),
+            ("mesh", "upper", "removed", ()),
+            ("node", "body", "changed", ("parts",)),
+            ("node", "child_bone", "changed", ("transform", "children")),
+            ("node", "tip", "added", ())]
+
+    def test_header_changes(self, c3b_bytes, c3b_model):
+        writer = C3bWriter(0, 10)
+        writer.add_meshes(c3b_model.meshes, "renamed")
+        writer.add_materials(c3b_model.materials)
+        writer.add_nodes(c3b_model.nodes)
+        writer.add_animation(c3b_model.animation, "Take 001")
+        diff = diff_parsers(C3bParser(c3b_bytes),
+            C3bParser(writer.to_bytes()))
+        assert not diff.is_equal()
+        assert diff.section_counts() == {"equal": 4}
+        assert _changes(diff) == [
+            ("header", "header", "changed", ("minor_version",)),
+            ("section", "MESHES/0", "changed", ("id",))]
+
+    def test_added_and_removed_sections(self, tmp_path, c3b_bytes):
+        a_path = tmp_path / "a.c3b"
+        a_path.write_bytes(c3b_bytes)
+        b_path = tmp_path / "b.c3b"
+
+        # The same document without its animation section.
+        parser = C3bParser(c3b_bytes)
+        writer = C3bWriter()
+        writer.add_meshes(parser.read_meshes(0))
+        writer.add_materials(parser.read_materials(0))
+        writer.add_nodes(parser.read_nodes(0))
+        writer.to_file(str(b_path))
+
+        diff = diff_files(str(a_path), str(b_path))
+        assert _statuses(diff)[-1] == ("ANIMATIONS", "removed")
+        assert _changes(diff) == [
+            ("animation", "Take 001", "removed", ()),
+            ("channel", "Take 001/child_bone", "removed", ()),
+            ("channel", "Take 001/root_bone", "removed", ())]
+
+        diff = diff_files(str(b_path), str(a_path))
+        assert _statuses(diff)[-1] == ("ANIMATIONS", "added")
+        assert diff.to_dict()["changes"][0] == {"kind": "animation",
+            "id": "Take 001", "change": "added", "fields": []}
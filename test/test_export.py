@@ -0,0 +1,126 @@
+import array
+import ast
+import json
+import os
+import struct
+import zipfile
+import pytest
+from meru.c3b import C3bError
+from meru.export import (FLAT_FORMAT, export_bytes, export_file, export_tree,
+npy_header)
+
+
+def _read_npy(_bytes):
+    # Just enough of the .npy format to check what the exporter writes.
+    assert _bytes[:8] == b"\x93NUMPY\x01\x00"
+    header_length = struct.unpack("<H", _bytes[8:10])[0]
+    assert (10 + header_length) % 64 == 0
+    header = ast.literal_eval(_bytes[10:10 + header_length].decode("latin1"))
+    assert header["fortran_order"] is False
+    typecode = {"<f4": "f", "<u2": "H", "<i4": "i", "|u1": "B"}[
+        header["descr"]]
+    values = array.array(typecode, _bytes[10 + header_length:])
+    return list(header["shape"]), list(values)
+
+
+def _read_flat(directory, description):
+    typecode = {"<f4": "f", "<u2": "H", "<i4": "i", "|u1": "B"}[
+        description["dtype"]]
+    with open(os.path.join(directory, description["file"]), "rb") as _file:
+        return list(array.array(typecode, _file.read()))
+
+
+class TestNpyHeader:
+    def test_shapes(self):
+        assert b"'shape': (3,)" in npy_header("f", [3])
+        assert b"'shape': (2, 4, 4)" in npy_header("f", [2, 4, 4])
+        assert len(npy_header("H", [100000000])) % 64 == 0
+
+
+class TestExport:
+    def test_npz(self, tmp_path, c3b_bytes):
+        path = str(tmp_path / "model.npz")
+        manifest = export_bytes("model.c3b", c3b_bytes, path)
+        with zipfile.ZipFile(path) as archive:
+            assert json.loads(archive.read("manifest.json")) == manifest
+            arrays = {name[:-4]: _read_npy(archive.read(name))
+                for name in archive.namelist() if name.endswith(".npy")}
+        assert sorted(arrays) == sorted(manifest["arrays"])
+
+        vertex_array = manifest["meshes"][0]["vertex_arrays"][0]
+        assert vertex_array["vertex_count"] == 4
+        positions = arrays[vertex_array["attributes"][0]["array"]]
+        assert positions == ([4, 3], [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0,
+            2.0, 0.0, 0.0, 2.0, 0.0])
+        weights = arrays[vertex_array["attributes"][3]["array"]]
+        assert weights[0] == [4, 4]
+        assert weights[1][4:8] == [1.0, 0.0, 0.0, 0.0]
+        meshes = manifest["meshes"][0]["meshes"]
+        assert [mesh["id"] for mesh in meshes] == ["lower", "upper"]
+        assert arrays[meshes[1]["indices"]] == ([3], [0, 2, 3])
+
+        nodes = manifest["nodes"][0]
+        assert nodes["ids"] == ["root_bone", "child_bone", "body"]
+        assert arrays[nodes["parents"]] == ([3], [-1, 0, -1])
+        shape, transforms = arrays[nodes["transforms"]]
+        assert shape == [3, 4, 4]
+        assert transforms[16 + 13] == 1.0
+        part = nodes["parts"][0]
+        assert part["bones"] == ["root_bone", "child_bone"]
+        shape, matrices = arrays[part["bind_matrices"]]
+        assert shape == [2, 4, 4]
+        assert matrices[16 + 13] == -1.0
+
+        animation = manifest["animations"][0]
+        assert animation["id"] == "Take 001"
+        root, child = animation["channels"]
+        assert root["bone"] == "root_bone"
+        assert arrays[root["times"]] == ([2], [0.0, 1.0])
+        assert arrays[root["flags"]] == ([2], [7, 4])
+        assert arrays[root["rotation"]] == ([1, 4], [0.0, 0.0, 0.0, 1.0])
+        assert arrays[root["translation"]] == ([2, 3],
+            [0.0, 0.0, 0.0, 2.0, 0.0, 0.0])
+        assert arrays[child["scale"]] == ([0, 3], [])
+
+    def test_flat(self, tmp_path, c3b_bytes):
+        source = tmp_path / "model.c3b"
+        source.write_bytes(c3b_bytes)
+        directory = str(tmp_path / "model")
+        manifest = export_file(str(source), directory, FLAT_FORMAT)
+        with open(os.path.join(directory, "manifest.json")) as _file:
+            assert json.load(_file) == manifest
+        meshes = manifest["meshes"][0]["meshes"]
+        assert _read_flat(directory,
+            manifest["arrays"][meshes[0]["indices"]]) == [0, 1, 2]
+        assert _read_flat(directory,
+            manifest["arrays"]["nodes0/parents"]) == [-1, 0, -1]
+
+    def test_not_c3b(self, tmp_path):
+        with pytest.raises(C3bError):
+            export_bytes("junk", b"junk", str(tmp_path / "junk.npz"))
+
+    @pytest.mark.parametrize("_format", ["npz", "flat"])
+    def test_tree(self, tmp_path, c3b_bytes, _format):
+        source_dir = tmp_path / "source"
+        (source_dir / "sub").mkdir(parents=True)
+        (source_dir / "a.c3b").write_bytes(c3b_bytes)
+        (source_dir / "sub" / "b.c3b").write_bytes(c3b_bytes)
+        (source_dir / "bad.c3b").write_bytes(b"junk")
+        output_dir = tmp_path / "output"
+
+        result = export_tree(str(source_dir), str(output_dir), _format,
+            workers=2)
+        assert sorted(result.added) == ["a.c3b", os.path.join("sub",
+            "b.c3b")]
+        assert list(result.failed) == ["bad.c3b"]
+        output = "a.npz" if _format == "npz" else os.path.join("a",
+            "manifest.json")
+        assert (output_dir / output).exists()
+
+        (source_dir / "a.c3b").unlink()
+        result = export_tree(str(source_dir), str(output_dir), _format)
+        assert result.removed == ["a.c3b"]
+        assert not (output_dir / output).exists()
+        if _format == "flat":
+            assert not any(files for path, dirs, files in
+                os.walk(output_dir / "a"))
@@ -0,0 +1,142 @@
+import math
+import pytest
+from meru.c3b import C3bMesh, C3bVertexArray, C3bVertexAttribute
+from meru.frames import (AREA_WEIGHTING, ANGLE_WEIGHTING, attribute_columns,
+generate_frames, generate_normals, generate_tangents, set_attribute_columns)
+
+
+def _mesh(vertices, indices, uvs=True):
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION")]
+    if uvs:
+        vertex_array.attributes.append(
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD"))
+    for vertex in vertices:
+        vertex_array.values.extend(vertex if uvs else vertex[:3])
+    mesh = C3bMesh("mesh", vertex_array)
+    mesh.indices = list(indices)
+    return mesh
+
+
+def _quad(mirrored=False):
+    u = [1.0, 0.0] if mirrored else [0.0, 1.0]
+    return _mesh([
+        [0.0, 0.0, 0.0, u[0], 0.0], [1.0, 0.0, 0.0, u[1], 0.0],
+        [0.0, 1.0, 0.0, u[0], 1.0], [1.0, 1.0, 0.0, u[1], 1.0]],
+        [0, 1, 2, 1, 3, 2])
+
+
+def _rows(columns):
+    return [tuple(round(value, 6) for value in row) for row in zip(*columns)]
+
+
+def _corner():
+    # Three faces of a cube meeting at the origin, the one in the xy plane
+    # pulled out to twice the area.
+    return _mesh([
+        [0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 2.0, 0.0], [0.0, 1.0, 0.0],
+        [0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [0.0, 1.0, 1.0]],
+        [0, 2, 1, 0, 3, 2, 0, 1, 5, 0, 5, 4, 0, 4, 6, 0, 6, 3], uvs=False)
+
+
+class TestNormals:
+    def test_flat_quad(self):
+        mesh = _quad()
+        for weighting in [AREA_WEIGHTING, ANGLE_WEIGHTING]:
+            normals = generate_normals(mesh.vertex_array, [mesh], weighting)
+            assert _rows(normals) == [(0.0, 0.0, 1.0)] * 4
+
+    def test_weighting(self):
+        mesh = _corner()
+        area = _rows(generate_normals(mesh.vertex_array, [mesh],
+            AREA_WEIGHTING))[0]
+        angle = _rows(generate_normals(mesh.vertex_array, [mesh],
+            ANGLE_WEIGHTING))[0]
+
+        # Every face has an angle of 90 degrees at the corner.
+        third = round(1 / math.sqrt(3), 6)
+        assert angle == (-third, -third, -third)
+        assert area[2] < -third
+        assert -third < area[0] == area[1] < 0.0
+
+    def test_welds_seams(self):
+        # The right edge of the quad is split, as it would be along a uv
+        # seam, and gets the same normal on both sides.
+        mesh = _mesh([
+            [0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0],
+            [1.0, 1.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0],
+            [2.0, 0.0, 1.0], [2.0, 1.0, 1.0]],
+            [0, 1, 2, 1, 3, 2, 4, 6, 5, 6, 7, 5], uvs=False)
+        welded = _rows(generate_normals(mesh.vertex_array, [mesh]))
+        assert welded[1] == welded[4]
+        assert welded[3] == welded[5]
+        split = _rows(generate_normals(mesh.vertex_array, [mesh],
+            weld=False))
+        assert split[1] == (0.0, 0.0, 1.0)
+        assert split[1] != split[4]
+
+    def test_unknown_weighting(self):
+        mesh = _quad()
+        with pytest.raises(ValueError):
+            generate_normals(mesh.vertex_array, [mesh], "volume")
+
+
+class TestTangents:
+    def test_follow_uvs(self):
+        mesh = _quad()
+        normals = generate_normals(mesh.vertex_array, [mesh])
+        tangents, binormals = generate_tangents(mesh.vertex_array, [mesh],
+            normals)
+        assert _rows(tangents) == [(1.0, 0.0, 0.0)] * 4
+        assert _rows(binormals) == [(0.0, 1.0, 0.0)] * 4
+
+    def test_mirrored_uvs(self):
+        mesh = _quad(mirrored=True)
+        normals = generate_normals(mesh.vertex_array, [mesh])
+        tangents, binormals = generate_tangents(mesh.vertex_array, [mesh],
+            normals)
+        assert _rows(tangents) == [(-1.0, 0.0, 0.0)] * 4
+        assert _rows(binormals) == [(0.0, 1.0, 0.0)] * 4
+
+
+class TestFrames:
+    def test_set_attribute_columns(self):
+        mesh = _quad()
+        vertex_array = mesh.vertex_array
+        set_attribute_columns(vertex_array, "VERTEX_ATTRIB_NORMAL",
+            [[0.0] * 4, [1.0] * 4, [2.0] * 4])
+        assert vertex_array.values_per_vertex() == 8
+        assert vertex_array.values[5:8] == [0.0, 1.0, 2.0]
+        assert attribute_columns(vertex_array, "VERTEX_ATTRIB_TEX_COORD") \
+            == [[0.0, 1.0, 0.0, 1.0], [0.0, 0.0, 1.0, 1.0]]
+
+        set_attribute_columns(vertex_array, "VERTEX_ATTRIB_NORMAL",
+            [[3.0] * 4, [4.0] * 4, [5.0] * 4])
+        assert vertex_array.values_per_vertex() == 8
+        assert vertex_array.values[13:16] == [3.0, 4.0, 5.0]
+        with pytest.raises(ValueError):
+            set_attribute_columns(vertex_array, "VERTEX_ATTRIB_NORMAL",
+                [[0.0] * 4, [0.0] * 4])
+
+    def test_generate_frames(self):
+        mesh = _quad()
+        (vertex_array, names), = generate_frames([mesh])
+        assert names == ["VERTEX_ATTRIB_NORMAL", "VERTEX_ATTRIB_TANGENT",
+            "VERTEX_ATTRIB_BINORMAL"]
+        assert vertex_array.values_per_vertex() == 14
+        assert generate_frames([mesh]) == [(vertex_array, [])]
+
+        # Replacing keeps the layout.
+        set_attribute_columns(vertex_array, "VERTEX_ATTRIB_NORMAL",
+            [[0.0] * 4, [0.0] * 4, [-1.0] * 4])
+        (_, names), = generate_frames([mesh], tangents=False, replace=True)
+        assert names == ["VERTEX_ATTRIB_NORMAL"]
+        assert vertex_array.values_per_vertex() == 14
+        assert _rows(attribute_columns(vertex_array,
+            "VERTEX_ATTRIB_NORMAL")) == [(0.0, 0.0, 1.0)] * 4
+
+    def test_without_uvs(self):
+        mesh = _corner()
+        (_, names), = generate_frames([mesh])
+        assert names == ["VERTEX_ATTRIB_NORMAL"]
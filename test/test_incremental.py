@@ -0,0 +1,117 @@
+import json
+import os
+import struct
+import meru.incremental
+from meru.incremental import MeruBuilder, MeruManifest, MANIFEST_NAME
+
+
+_header = b"C3B\0" + struct.pack("<bbI", 0, 9, 0)
+
+
+def _write(path, _bytes):
+    with open(str(path), "wb") as _file:
+        _file.write(_bytes)
+
+
+class _Recorder:
+    def __init__(self):
+        self.processed = []
+
+    def __call__(self, source_path, _bytes, output_dir, rel_path):
+        self.processed.append(rel_path)
+        output = rel_path + ".out"
+        with open(os.path.join(output_dir, output), "wb") as _file:
+            _file.write(_bytes)
+        return [output]
+
+
+class TestMeruBuilder:
+    def setup_method(self):
+        self.recorder = _Recorder()
+
+    def _builder(self, tmp_path):
+        (tmp_path / "out").mkdir(exist_ok=True)
+        return MeruBuilder(str(tmp_path / "src"), str(tmp_path / "out"),
+            process=self.recorder)
+
+    def test_initial_build(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        _write(tmp_path / "src" / "b.c3b", _header)
+        result = self._builder(tmp_path).build()
+        assert sorted(result.added) == ["a.c3b", "b.c3b"]
+        assert (tmp_path / "out" / "a.c3b.out").exists()
+        assert (tmp_path / "out" / MANIFEST_NAME).exists()
+
+    def test_noop_rebuild(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        self._builder(tmp_path).build()
+        result = self._builder(tmp_path).build()
+        assert not result.has_changes()
+        assert result.unchanged == 1
+        assert self.recorder.processed == ["a.c3b"]
+
+    def test_changed_and_removed(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        _write(tmp_path / "src" / "b.c3b", _header)
+        builder = self._builder(tmp_path)
+        builder.build()
+
+        _write(tmp_path / "src" / "a.c3b", _header + b"\0")
+        os.remove(str(tmp_path / "src" / "b.c3b"))
+        result = builder.build()
+        assert result.changed == ["a.c3b"]
+        assert result.removed == ["b.c3b"]
+        assert not (tmp_path / "out" / "b.c3b.out").exists()
+
+    def test_changed_file_is_hashed_once(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        builder = self._builder(tmp_path)
+        builder.build()
+
+        hashed = []
+        content_digest = meru.incremental.content_digest
+        monkeypatch.setattr(meru.incremental, "content_digest",
+            lambda _bytes: hashed.append(_bytes) or content_digest(_bytes))
+        _write(tmp_path / "src" / "a.c3b", _header + b"\0")
+        _write(tmp_path / "src" / "b.c3b", _header)
+        result = builder.build()
+        assert result.changed == ["a.c3b"]
+        assert result.added == ["b.c3b"]
+        assert len(hashed) == 2
+        assert builder.manifest.entries["a.c3b"].digest == \
+            content_digest(_header + b"\0")
+
+    def test_touched_file_is_not_reprocessed(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        builder = self._builder(tmp_path)
+        builder.build()
+        stat = os.stat(str(tmp_path / "src" / "a.c3b"))
+        os.utime(str(tmp_path / "src" / "a.c3b"),
+            ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        result = builder.build()
+        assert not result.has_changes()
+        assert self.recorder.processed == ["a.c3b"]
+
+    def test_failure_is_recorded(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", b"garbage")
+        (tmp_path / "out").mkdir()
+        builder = MeruBuilder(str(tmp_path / "src"), str(tmp_path / "out"))
+        result = builder.build()
+        assert list(result.failed) == ["a.c3b"]
+        assert not builder.build().has_changes()
+
+    def test_default_process_writes_report(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        _write(tmp_path / "src" / "a.c3b", _header)
+        builder = MeruBuilder(str(tmp_path / "src"), str(tmp_path / "out"))
+        builder.build()
+        with open(str(tmp_path / "out" / "a.c3b.json")) as _file:
+            assert json.load(_file)["header"]["version"] == "0.9"
+        manifest = MeruManifest.load(builder.manifest_path)
+        assert manifest.entries["a.c3b"].outputs == ["a.c3b.json"]
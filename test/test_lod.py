@@ -0,0 +1,161 @@
+import math
+from meru.c3b import (C3bMesh, C3bParser, C3bVertexArray, C3bVertexAttribute,
+C3bWriter)
+from meru.lod import MeruDecimator, generate_lods, lod_writers, write_lods
+
+
+def _sheet(side, height=None, skinned=False):
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes = [
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_NORMAL")]
+    if skinned:
+        vertex_array.attributes += [
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_WEIGHT"),
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_INDEX")]
+    for y in range(side + 1):
+        for x in range(side + 1):
+            z = height(x, y) if height is not None else 0.0
+            vertex_array.values.extend([float(x), float(y), z,
+                0.0, 0.0, 1.0])
+            if skinned:
+                weight = x / side
+                vertex_array.values.extend([1.0 - weight, weight, 0.0, 1.0])
+    mesh = C3bMesh("sheet", vertex_array)
+    for y in range(side):
+        for x in range(side):
+            a = y * (side + 1) + x
+            b = a + 1
+            c = a + side + 1
+            d = c + 1
+            mesh.indices.extend([a, b, c, b, d, c])
+    mesh.aabb = [0.0, 0.0, 0.0, float(side), float(side), 0.0]
+    return mesh
+
+
+def _vertices(vertex_array):
+    stride = vertex_array.values_per_vertex()
+    values = vertex_array.values
+    return [tuple(values[i:i + stride]) for i in range(0, len(values),
+        stride)]
+
+
+def _normals(mesh):
+    positions = mesh.vertex_array.get_attribute_vertices(
+        "VERTEX_ATTRIB_POSITION")
+    normals = []
+    for i in range(0, len(mesh.indices), 3):
+        a, b, c = [positions[index] for index in mesh.indices[i:i + 3]]
+        u = [b[axis] - a[axis] for axis in range(3)]
+        v = [c[axis] - a[axis] for axis in range(3)]
+        normals.append((u[1] * v[2] - u[2] * v[1],
+            u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]))
+    return normals
+
+
+class TestDecimator:
+    def test_flat_sheet(self):
+        mesh = _sheet(10)
+        decimator = MeruDecimator(mesh.vertex_array, [mesh])
+        assert decimator.decimate(20) <= 20
+        vertex_array, meshes = decimator.result()
+        assert len(meshes[0].indices) // 3 == decimator.triangle_count
+        assert decimator.max_error < 1e-6
+
+        # Border planes keep the outline and nothing folds over.
+        assert meshes[0].aabb == [0.0, 0.0, 0.0, 10.0, 10.0, 0.0]
+        assert all(normal[2] > 0.0 for normal in _normals(meshes[0]))
+
+    def test_keeps_source_vertices(self):
+        # Half-edge collapses never invent vertices, so skinning data of
+        # the remaining ones stays valid.
+        mesh = _sheet(8, lambda x, y: math.sin(x) * math.cos(y),
+            skinned=True)
+        decimator = MeruDecimator(mesh.vertex_array, [mesh])
+        decimator.decimate(decimator.source_triangle_count // 4)
+        vertex_array, meshes = decimator.result()
+        assert set(_vertices(vertex_array)) <= \
+            set(_vertices(mesh.vertex_array))
+        assert vertex_array.vertex_count() == len(set(meshes[0].indices))
+
+    def test_seams_are_locked(self):
+        mesh = _sheet(6)
+        vertex_array = mesh.vertex_array
+
+        # Split the middle column into two vertices with equal positions.
+        stride = vertex_array.values_per_vertex()
+        seam = {}
+        for y in range(7):
+            vertex = y * 7 + 3
+            seam[vertex] = vertex_array.vertex_count()
+            vertex_array.values.extend(
+                vertex_array.values[vertex * stride:(vertex + 1) * stride])
+        for i in range(0, len(mesh.indices), 3):
+            triangle = mesh.indices[i:i + 3]
+            if max(index % 7 for index in triangle) > 3:
+                mesh.indices[i:i + 3] = [seam.get(index, index)
+                    for index in triangle]
+
+        decimator = MeruDecimator(vertex_array, [mesh])
+        decimator.decimate(0)
+        result, meshes = decimator.result()
+        positions = set(result.get_attribute_vertices(
+            "VERTEX_ATTRIB_POSITION"))
+        for y in range(7):
+            assert (3.0, float(y), 0.0) in positions
+
+    def test_progressive(self):
+        mesh = _sheet(10, lambda x, y: (x - 5) ** 2 * 0.1)
+        lods = generate_lods([mesh], [0.5, 0.25])
+        assert [lod.ratio for lod in lods] == [0.5, 0.25]
+        assert lods[0].source_triangle_count == 200
+        assert lods[0].triangle_count <= 100
+        assert lods[1].triangle_count <= 50
+        assert lods[0].max_error <= lods[1].max_error
+        assert lods[0].meshes[0].id == "sheet"
+
+
+class TestLodOutput:
+    def test_shared_vertex_arrays(self, c3b_model):
+        lods = generate_lods(c3b_model.meshes, [0.5])
+        lower, upper = lods[0].meshes
+        assert lower.id == "lower" and upper.id == "upper"
+        assert lower.vertex_array is upper.vertex_array
+
+    def test_writers(self, c3b_bytes):
+        parser = C3bParser(c3b_bytes)
+        writers = lod_writers(parser, [0.5])
+        assert len(writers) == 1
+        lods, writer = writers[0]
+        output = C3bParser(writer.to_bytes())
+        assert [mesh.id for mesh in output.read_meshes(0)] == \
+            ["lower", "upper"]
+        assert len(output.read_nodes(0)) == len(parser.read_nodes(0))
+        assert output.read_animations(0).get_bones() == \
+            parser.read_animations(0).get_bones()
+
+    def test_write_lods(self, tmp_path):
+        mesh = _sheet(10, lambda x, y: (x - 5) ** 2 * 0.1)
+        writer = C3bWriter()
+        writer.add_meshes([mesh])
+        path = tmp_path / "sheet.c3b"
+        path.write_bytes(writer.to_bytes())
+        outputs = write_lods(str(path), [0.5, 0.25])
+        assert [output for output, lods in outputs] == [
+            str(tmp_path / "sheet_lod1.c3b"), str(tmp_path / "sheet_lod2.c3b")]
+        triangle_counts = [len(C3bParser.from_file(output).read_meshes(0)[0]
+            .indices) // 3 for output, lods in outputs]
+        assert triangle_counts == [lods[0].triangle_count
+            for output, lods in outputs]
+        assert triangle_counts[0] <= 100 and triangle_counts[1] <= 50
+
+    def test_write_lods_creates_output_dir(self, tmp_path):
+        writer = C3bWriter()
+        writer.add_meshes([_sheet(4, lambda x, y: 0.0)])
+        path = tmp_path / "sheet.c3b"
+        path.write_bytes(writer.to_bytes())
+        output_dir = tmp_path / "lods" / "nested"
+        outputs = write_lods(str(path), [0.5], str(output_dir))
+        assert [output for output, lods in outputs] == [
+            str(output_dir / "sheet_lod1.c3b")]
+        assert (output_dir / "sheet_lod1.c3b").exists()
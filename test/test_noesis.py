@@ -0,0 +1,93 @@
+import struct
+import pytest
+import inc_noesis
+import meru_noesis
+from inc_noesis import noesis, rapi
+from meru.c3b import C3bVertexArray, C3bVertexAttribute
+
+
+class TestNoesisPlugin:
+    def setup_method(self):
+        noesis.reset()
+        rapi.reset()
+
+    def test_register(self):
+        meru_noesis.registerNoesisTypes()
+        assert noesis.called("register") == [("Cocos2d-x Binary", ".c3b")]
+
+    def test_check_type(self, c3b_bytes):
+        assert meru_noesis.c3b_check_type(c3b_bytes) == 1
+        assert meru_noesis.c3b_check_type(b"nope") == 0
+
+    def test_buffer_path(self, c3b_bytes, c3b_model):
+        models = []
+        assert meru_noesis.c3b_load_model(c3b_bytes, models) == 1
+        assert len(models) == 1
+        assert len(models[0].bones) == 2
+
+        positions = rapi.called("rpgBindPositionBufferOfs")
+        assert len(positions) == 2
+        vertices, data_type, stride, offset = positions[0]
+        assert data_type == noesis.RPGEODATA_FLOAT
+        assert (stride, offset) == (64, 0)
+        vertex_array = c3b_model.meshes[0].vertex_array
+        assert list(struct.unpack("<64f", vertices)) == vertex_array.values
+        assert rapi.called("rpgBindUV1BufferOfs")[0][3] == 24
+        assert rapi.called("rpgBindBoneWeightBufferOfs")[0][2:] == \
+            (64, 32, 4)
+
+        blend_indices = rapi.called("rpgBindBoneIndexBufferOfs")[0]
+        assert blend_indices[0] == bytes([0, 1, 0, 0] * 4)
+        assert blend_indices[1] == noesis.RPGEODATA_UBYTE
+
+        assert [args[0] for args in rapi.called("rpgSetName")] == \
+            ["lower", "upper"]
+        triangles = rapi.called("rpgCommitTriangles")
+        assert triangles[1][0] == struct.pack("<3H", 0, 2, 3)
+        assert triangles[1][2] == 3
+
+    def test_two_influences(self):
+        vertex_array = C3bVertexArray()
+        vertex_array.attributes = [
+            C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"),
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_WEIGHT"),
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_INDEX")]
+        vertex_array.values = [0.0, 0.0, 0.0, 0.75, 0.25, 3.0, 1.0,
+            1.0, 0.0, 0.0, 1.0, 0.0, 2.0, 0.0]
+        meru_noesis.c3b_bind_vertex_buffers(
+            meru_noesis.C3bVertexBuffers(vertex_array))
+        assert rapi.called("rpgBindBoneWeightBufferOfs")[0][2:] == \
+            (28, 12, 2)
+        blend_indices = rapi.called("rpgBindBoneIndexBufferOfs")[0]
+        assert blend_indices[0] == bytes([3, 1, 2, 0])
+        assert blend_indices[2:] == (2, 0, 2)
+
+    def test_object_path(self, c3b_bytes):
+        models = []
+        assert meru_noesis.c3b_load_model_objects(c3b_bytes, models) == 1
+        mesh = models[0].meshes[0]
+        assert isinstance(models[0], inc_noesis.NoeModel)
+        assert len(mesh.positions) == 4
+        assert mesh.weights[2].weights == pytest.approx((0.0, 1.0, 0.0, 0.0))
+
+    def test_bones_world_matrices(self, c3b_bytes):
+        models = []
+        meru_noesis.c3b_load_model(c3b_bytes, models)
+        root, child = models[0].bones
+        assert child.parentIndex == 0
+        assert child.parentName == "root_bone"
+        assert child.getMatrix().rows[3] == pytest.approx((0.0, 1.0, 0.0))
+
+    def test_anims(self, c3b_bytes):
+        models = []
+        meru_noesis.c3b_load_model(c3b_bytes, models)
+        anims = models[0].anims
+        assert [anim.name for anim in anims] == ["Take 001"]
+        anim = anims[0]
+        assert anim.numFrames == 31
+        assert len(anim.frameMats) == anim.numFrames * 2
+        assert anim.bones is models[0].bones
+        assert all(isinstance(mat, inc_noesis.NoeMat43)
+            for mat in anim.frameMats)
+        last_root = anim.frameMats[-2]
+        assert last_root.rows[3] == pytest.approx((2.0, 0.0, 0.0))
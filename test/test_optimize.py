@@ -0,0 +1,101 @@
+import random
+from meru.c3b import C3bMesh, C3bVertexArray, C3bVertexAttribute
+from meru.optimize import (compute_acmr, optimize_meshes,
+optimize_vertex_cache, optimize_vertex_fetch, weld_vertices)
+
+
+def _grid(size):
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes.append(
+        C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_POSITION"))
+    for y in range(size + 1):
+        for x in range(size + 1):
+            vertex_array.values.extend([float(x), float(y), 0.0])
+    triangles = []
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            b = a + 1
+            c = a + size + 1
+            d = c + 1
+            triangles.append((a, b, c))
+            triangles.append((b, d, c))
+    random.Random(1).shuffle(triangles)
+    mesh = C3bMesh("grid", vertex_array)
+    mesh.indices = [index for triangle in triangles for index in triangle]
+    mesh.aabb = [0.0, 0.0, 0.0, float(size), float(size), 0.0]
+    return vertex_array, mesh
+
+
+def _triangle_positions(mesh):
+    positions = mesh.vertex_array.get_attribute_vertices(
+        "VERTEX_ATTRIB_POSITION")
+    triangles = []
+    for i in range(0, len(mesh.indices), 3):
+        corners = [positions[index] for index in mesh.indices[i:i + 3]]
+        rotation = corners.index(min(corners))
+        triangles.append(tuple(corners[rotation:] + corners[:rotation]))
+    return sorted(triangles)
+
+
+class TestAcmr:
+    def test_acmr(self):
+        assert compute_acmr([0, 1, 2, 0, 2, 3]) == 2.0
+        assert compute_acmr([]) == 0.0
+
+    def test_fifo_eviction(self):
+        assert compute_acmr([0, 1, 2, 3, 4, 5, 0, 1, 2], cache_size=3) == 3.0
+
+
+class TestWeld:
+    def test_weld_merges_identical_vertices(self):
+        vertex_array = C3bVertexArray()
+        vertex_array.attributes.append(
+            C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD"))
+        vertex_array.values = [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 1.0]
+        mesh = C3bMesh("a", vertex_array)
+        mesh.indices = [0, 1, 3, 2, 1, 3]
+        welded, meshes = weld_vertices(vertex_array, [mesh])
+        assert welded.vertex_count() == 3
+        assert meshes[0].indices == [0, 1, 2, 0, 1, 2]
+        assert meshes[0].vertex_array is welded
+
+
+class TestVertexCache:
+    def test_improves_acmr_and_keeps_triangles(self):
+        vertex_array, mesh = _grid(16)
+        indices = optimize_vertex_cache(mesh.indices,
+            vertex_array.vertex_count())
+        assert compute_acmr(indices) < compute_acmr(mesh.indices)
+        assert sorted(tuple(sorted(indices[i:i + 3]))
+            for i in range(0, len(indices), 3)) == sorted(
+            tuple(sorted(mesh.indices[i:i + 3]))
+            for i in range(0, len(mesh.indices), 3))
+
+
+class TestVertexFetch:
+    def test_first_use_order(self):
+        vertex_array, mesh = _grid(2)
+        fetched, meshes = optimize_vertex_fetch(vertex_array, [mesh])
+        assert meshes[0].indices[:3] == [0, 1, 2]
+        assert _triangle_positions(meshes[0]) == _triangle_positions(mesh)
+
+
+class TestOptimizeMeshes:
+    def test_pipeline(self):
+        vertex_array, mesh = _grid(8)
+        # Duplicate every vertex so welding has work to do.
+        vertex_array.values = vertex_array.values * 2
+        other = C3bMesh("other", vertex_array)
+        other.indices = [index + 81 for index in mesh.indices]
+        results = optimize_meshes([mesh, other])
+        assert len(results) == 1
+        result = results[0]
+        assert [report.name for report in result.reports] == ["weld",
+            "vertex_cache", "vertex_fetch"]
+        assert result.reports[0].vertex_count_after == 81
+        assert result.reports[1].acmr_after < result.reports[1].acmr_before
+        assert result.vertex_array.vertex_count() == 81
+        for optimized in result.meshes:
+            assert _triangle_positions(optimized) == \
+                _triangle_positions(mesh)
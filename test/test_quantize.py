@@ -0,0 +1,89 @@
+import pytest
+from meru.c3b import C3bParser, C3bVertexArray, C3bVertexAttribute
+from meru.quantize import quantize_vertex_array
+
+
+def _tiled_uvs():
+    vertex_array = C3bVertexArray()
+    vertex_array.attributes.append(
+        C3bVertexAttribute(2, "GL_FLOAT", "VERTEX_ATTRIB_TEX_COORD"))
+    vertex_array.values = [-1.0, 0.25, 3.0, 0.5, 0.125, 1.0]
+    return vertex_array
+
+
+class TestTypedRead:
+    def test_integral_attributes_are_ints(self, c3b_model):
+        vertex_array = c3b_model.meshes[0].vertex_array
+        vertex_array.attributes[4].type = "GL_UNSIGNED_BYTE"
+        writer_bytes = c3b_model.to_bytes()
+        typed = C3bParser(writer_bytes).read_meshes(0)
+        column = typed[0].vertex_array.get_attribute_column(
+            "VERTEX_ATTRIB_BLEND_INDEX", 1)
+        assert column == [1, 1, 1, 1]
+        assert all(type(value) is int for value in column)
+        assert typed[0].vertex_array.get_blend_indices()[0].unpack() == \
+            (0, 1, 0, 0)
+        untyped = C3bParser(writer_bytes).read_meshes(0, typed=False)
+        assert type(untyped[0].vertex_array.values[-3]) is float
+
+    def test_float_attributes_stay_arrays(self, c3b_bytes):
+        vertex_array = C3bParser(c3b_bytes).read_meshes(0)[0].vertex_array
+        assert vertex_array.typed
+        assert vertex_array.values.typecode == "f"
+
+
+class TestQuantize:
+    def test_default_layout(self, c3b_model):
+        quantized = quantize_vertex_array(c3b_model.meshes[0].vertex_array)
+        formats = [attrib.format.name for attrib in quantized.attributes]
+        assert formats == ["float32", "snorm16", "unorm16", "unorm8",
+            "uint8"]
+        assert [attrib.offset for attrib in quantized.attributes] == \
+            [0, 12, 20, 24, 28]
+        assert quantized.stride == 32
+        assert quantized.size() == 4 * 32
+        assert quantized.size() < quantized.source_size
+
+    def test_error_bounds(self, c3b_model):
+        quantized = quantize_vertex_array(c3b_model.meshes[0].vertex_array,
+            {"VERTEX_ATTRIB_NORMAL": "snorm8"})
+        errors = quantized.errors()
+        assert errors["VERTEX_ATTRIB_POSITION"] == 0.0
+        assert errors["VERTEX_ATTRIB_NORMAL"] <= 0.5 / 127
+        assert errors["VERTEX_ATTRIB_TEX_COORD"] <= 0.5 / 65535
+        assert errors["VERTEX_ATTRIB_BLEND_WEIGHT"] <= 1.0 / 255
+        assert errors["VERTEX_ATTRIB_BLEND_INDEX"] == 0.0
+
+    def test_round_trip(self, c3b_model):
+        vertex_array = c3b_model.meshes[0].vertex_array
+        quantized = quantize_vertex_array(vertex_array)
+        restored = quantized.to_vertex_array()
+        assert [attrib.name for attrib in restored.attributes] == \
+            [attrib.name for attrib in vertex_array.attributes]
+        for value, restored_value in zip(vertex_array.values,
+        restored.values):
+            assert restored_value == pytest.approx(value, abs=1.0 / 255)
+
+    def test_weights_sum_to_one(self):
+        vertex_array = C3bVertexArray()
+        vertex_array.attributes.append(
+            C3bVertexAttribute(3, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_WEIGHT"))
+        vertex_array.values = [1.0 / 3, 1.0 / 3, 1.0 / 3]
+        restored = quantize_vertex_array(vertex_array).to_vertex_array()
+        assert sum(restored.values) == pytest.approx(1.0)
+
+    def test_uv_range_outside_unit(self):
+        quantized = quantize_vertex_array(_tiled_uvs())
+        assert quantized.errors()["VERTEX_ATTRIB_TEX_COORD"] <= 2.0 / 65535
+        restored = quantized.to_vertex_array()
+        assert restored.values[0] == pytest.approx(-1.0)
+        assert restored.values[2] == pytest.approx(3.0)
+
+    def test_wide_indices_are_widened(self):
+        vertex_array = C3bVertexArray()
+        vertex_array.attributes.append(
+            C3bVertexAttribute(1, "GL_FLOAT", "VERTEX_ATTRIB_BLEND_INDEX"))
+        vertex_array.values = [0.0, 300.0]
+        quantized = quantize_vertex_array(vertex_array)
+        assert quantized.attributes[0].format.name == "uint16"
+        assert quantized.to_vertex_array().values == [0.0, 300.0]
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import struct
+from meru.c3b import C3bType
+from meru.scan import (iter_files, scan, scan_file, write_csv, write_ndjson,
+MeruScanEntry)
+
+
+def _header_bytes(references, padding=64):
+    _bytes = b"C3B\0" + struct.pack("<bbI", 0, 9, len(references))
+    for _id, _type, offset in references:
+        encoded = _id.encode("utf-8")
+        _bytes += struct.pack("<I", len(encoded)) + encoded
+        _bytes += struct.pack("<II", _type, offset)
+    return _bytes + bytes(padding)
+
+
+def _write(path, _bytes):
+    with open(str(path), "wb") as _file:
+        _file.write(_bytes)
+    return str(path)
+
+
+class TestScanFile:
+    def test_valid(self, tmp_path):
+        path = _write(tmp_path / "a.c3b", _header_bytes([
+            ("", C3bType.MESHES, 30), ("", C3bType.MATERIALS, 40),
+            ("", C3bType.MESHES, 50)]))
+        entry = scan_file(path)
+        assert entry.valid
+        assert entry.version() == "0.9"
+        assert entry.reference_count == 3
+        assert entry.type_counts == {C3bType.MESHES: 2,
+            C3bType.MATERIALS: 1}
+
+    def test_invalid_signature(self, tmp_path):
+        path = _write(tmp_path / "a.c3b", b"\xff\xfe\x00")
+        entry = scan_file(path)
+        assert not entry.valid
+        assert entry.error == "not a c3b file"
+
+    def test_header_larger_than_read_size(self, tmp_path):
+        references = [("ref{0}".format(i), C3bType.NODES, 0)
+            for i in range(100)]
+        path = _write(tmp_path / "a.c3b", _header_bytes(references))
+        entry = scan_file(path, read_size=16)
+        assert entry.valid
+        assert entry.type_counts == {C3bType.NODES: 100}
+
+    def test_truncated_header(self, tmp_path):
+        path = _write(tmp_path / "a.c3b",
+            _header_bytes([("mesh", C3bType.MESHES, 0)], padding=0)[:-3])
+        entry = scan_file(path)
+        assert not entry.valid
+        assert entry.error is not None
+
+    def test_file_shrunk_after_open(self):
+        class ShrunkReader:
+            def open(self, source):
+                _bytes = _header_bytes([("mesh", C3bType.MESHES, 0)],
+                    padding=0)[:-3]
+                return io.BytesIO(_bytes), 1 << 16
+
+        entry = scan_file("a.c3b", read_size=16, reader=ShrunkReader())
+        assert not entry.valid
+        assert entry.error is not None
+
+    def test_invalid_header_is_not_reread(self, tmp_path):
+        path = _write(tmp_path / "a.c3b",
+            _header_bytes([("", 99, 0)], padding=1 << 20))
+
+        class CountingReader:
+            read_sizes = []
+
+            def open(self, source):
+                _file = open(source, "rb")
+                read = _file.read
+
+                def counting_read(size=-1):
+                    self.read_sizes.append(size)
+                    return read(size)
+
+                _file.read = counting_read
+                return _file, os.path.getsize(source)
+
+        reader = CountingReader()
+        entry = scan_file(path, read_size=64, reader=reader)
+        assert not entry.valid
+        assert entry.error == "Invalid reference type 99."
+        assert reader.read_sizes == [64]
+
+    def test_offset_past_end(self, tmp_path):
+        path = _write(tmp_path / "a.c3b",
+            _header_bytes([("", C3bType.MESHES, 4096)]))
+        assert not scan_file(path).valid
+
+
+class TestScan:
+    def test_walks_directories(self, tmp_path):
+        (tmp_path / "sub" / "deeper").mkdir(parents=True)
+        _write(tmp_path / "a.c3b", _header_bytes([]))
+        _write(tmp_path / "sub" / "b.C3B", _header_bytes([]))
+        _write(tmp_path / "sub" / "deeper" / "c.c3b", _header_bytes([]))
+        _write(tmp_path / "sub" / "notes.txt", b"")
+        paths = list(iter_files([str(tmp_path)]))
+        assert len(paths) == 3
+        entries = list(scan([str(tmp_path)], workers=2))
+        assert [entry.path for entry in entries] == paths
+        assert all(entry.valid for entry in entries)
+
+    def test_write_csv(self):
+        entry = MeruScanEntry("a.c3b")
+        entry.valid = True
+        entry.type_counts = {C3bType.MESHES: 2}
+        stream = io.StringIO()
+        assert write_csv([entry, MeruScanEntry("b.c3b")], stream) == 1
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 3
+        header = lines[0].split(",")
+        row = lines[1].split(",")
+        assert row[header.index("MESHES")] == "2"
+
+    def test_write_ndjson(self):
+        entry = MeruScanEntry("a.c3b")
+        entry.type_counts = {C3bType.NODES: 1}
+        stream = io.StringIO()
+        assert write_ndjson([entry], stream) == 1
+        assert json.loads(stream.getvalue())["types"] == {"NODES": 1}
@@ -0,0 +1,73 @@
+import os
+import threading
+import pytest
+from meru.client import MeruClient, MeruServerError, local_query
+from meru.serve import MeruDocumentCache, MeruServer
+
+
+@pytest.fixture
+def c3b_path(tmpdir, c3b_bytes):
+    path = tmpdir.join("model.c3b")
+    path.write_binary(c3b_bytes)
+    return str(path)
+
+
+@pytest.fixture
+def server(tmpdir):
+    server = MeruServer(str(tmpdir.join("meru.sock")))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+class TestMeruDocumentCache:
+    def test_reload_on_change(self, c3b_path, c3b_bytes):
+        cache = MeruDocumentCache()
+        first = cache.query("header", c3b_path)
+        assert cache.query("header", c3b_path) is first
+        assert cache.stats()["hits"] == 1
+
+        with open(c3b_path, "wb") as _file:
+            _file.write(c3b_bytes[:4] + b"\x00\x0a" + c3b_bytes[6:])
+        stat = os.stat(c3b_path)
+        os.utime(c3b_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert "\"0.10\"" in cache.query("header", c3b_path)
+        assert cache.stats()["reloads"] == 1
+
+    def test_evicts_least_recently_used(self, tmpdir, c3b_bytes):
+        paths = []
+        for i in range(3):
+            path = tmpdir.join("{0}.c3b".format(i))
+            path.write_binary(c3b_bytes)
+            paths.append(str(path))
+        cache = MeruDocumentCache(max_bytes=len(c3b_bytes) * 2 + 1000)
+        for path in paths:
+            cache.query("header", path)
+        assert len(cache) == 2
+        assert cache.stats()["bytes"] <= cache.max_bytes
+        cache.query("header", paths[1])
+        assert cache.stats()["misses"] == 3
+
+
+class TestMeruServer:
+    def test_queries(self, server, c3b_path):
+        with MeruClient(server.socket_path, fallback=False) as client:
+            assert client.request({"command": "ping"}) is True
+            for command in ["header", "meshes", "materials", "nodes",
+            "animations"]:
+                assert client.query(command, c3b_path) == \
+                    local_query(command, c3b_path)
+            with pytest.raises(MeruServerError):
+                client.query("header", c3b_path + ".missing")
+            assert client.request({"command": "stats"})["entries"] == 1
+
+    def test_fallback_without_server(self, tmpdir, c3b_path):
+        client = MeruClient(str(tmpdir.join("none.sock")))
+        assert not client.connected()
+        assert client.query("nodes", c3b_path)[0]["id"] == "root_bone"
+        client.fallback = False
+        with pytest.raises(MeruServerError):
+            client.query("nodes", c3b_path)
@@ -0,0 +1,181 @@
+import struct
+from multiprocessing import shared_memory
+import pytest
+import meru.shared
+from meru.binary import Endian
+from meru.c3b import C3bParser
+from meru.shared import (read_shared_animation, read_shared_document,
+read_shared_documents, MeruSharedArray, MeruSharedMemory)
+
+
+def _exists(name):
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    return True
+
+
+class TestSharedMemory:
+    def test_round_trip(self):
+        with MeruSharedMemory() as memory:
+            floats = memory.from_values("f", [1.0, 2.5, -3.0])
+            shorts = memory.from_values("H", [1, 2, 3])
+            assert floats.segment_name == shorts.segment_name
+            assert shorts.offset % 8 == 0
+            assert list(memory.view(floats)) == [1.0, 2.5, -3.0]
+            assert list(memory.view(shorts)) == [1, 2, 3]
+
+    def test_new_segments(self):
+        with MeruSharedMemory(segment_size=16) as memory:
+            small = memory.from_values("f", [1.0, 2.0])
+            large = memory.from_values("f", list(range(10)))
+            assert small.segment_name != large.segment_name
+            assert list(memory.view(large)) == list(range(10))
+            assert len(memory.owned()) == 2
+
+    def test_empty(self):
+        with MeruSharedMemory() as memory:
+            empty = memory.from_values("H", [])
+            assert empty.segment_name is None
+            assert list(memory.view(empty)) == []
+            assert memory.owned() == []
+
+    def test_swaps_byte_order(self):
+        with MeruSharedMemory() as memory:
+            descriptor = memory.from_bytes("f", 2,
+                struct.pack(">2f", 1.5, -2.0), Endian.BIG)
+            assert list(memory.view(descriptor)) == [1.5, -2.0]
+
+    def test_close_releases_views(self):
+        memory = MeruSharedMemory()
+        view = memory.view(memory.from_values("f", [1.0]))
+        name = memory.owned()[0]
+        memory.close()
+        with pytest.raises(ValueError):
+            view[0]
+        assert _exists(name)
+        memory.unlink()
+        assert not _exists(name)
+
+    def test_adopt(self):
+        creator = MeruSharedMemory()
+        descriptor = creator.from_values("f", [4.0, 5.0])
+        names = creator.disown()
+        creator.unlink()
+        assert _exists(names[0])
+
+        with MeruSharedMemory() as memory:
+            memory.adopt(names)
+            assert list(memory.view(descriptor)) == [4.0, 5.0]
+        assert not _exists(names[0])
+
+
+class TestSharedParsing:
+    def test_read_meshes(self, c3b_bytes):
+        parser = C3bParser(c3b_bytes)
+        expected = parser.read_meshes(0)
+        with MeruSharedMemory() as memory:
+            meshes = parser.read_meshes(0, memory=memory)
+            assert meshes[0].vertex_array is meshes[1].vertex_array
+            for mesh, expected_mesh in zip(meshes, expected):
+                assert list(memory.view(mesh.vertex_array.values)) == \
+                    list(expected_mesh.vertex_array.values)
+                assert list(memory.view(mesh.indices)) == \
+                    list(expected_mesh.indices)
+            with pytest.raises(ValueError):
+                parser.read_meshes(0, typed=True, memory=memory)
+
+    def test_read_big_endian_meshes(self, c3b_bytes, c3b_big_bytes):
+        expected = C3bParser(c3b_bytes).read_meshes(0)
+        parser = C3bParser(c3b_big_bytes, endianness=Endian.BIG)
+        with MeruSharedMemory() as memory:
+            meshes = parser.read_meshes(0, memory=memory)
+            for mesh, expected_mesh in zip(meshes, expected):
+                assert list(memory.view(mesh.vertex_array.values)) == \
+                    list(expected_mesh.vertex_array.values)
+                assert list(memory.view(mesh.indices)) == \
+                    list(expected_mesh.indices)
+
+    def test_read_animation(self, c3b_bytes):
+        parser = C3bParser(c3b_bytes)
+        expected = parser.read_animations(0)
+        with MeruSharedMemory() as memory:
+            animation = read_shared_animation(parser, 0, memory)
+            animation = animation.attach(memory).to_animation()
+            assert animation.id == expected.id
+            assert animation.get_bones() == expected.get_bones()
+            for bone_id in expected.get_bones():
+                for keyframe, expected_keyframe in zip(
+                animation.get_keyframes(bone_id),
+                expected.get_keyframes(bone_id)):
+                    assert keyframe.time == expected_keyframe.time
+                    for name in ["rotation", "scale", "translation"]:
+                        value = getattr(keyframe, name)
+                        expected_value = getattr(expected_keyframe, name)
+                        assert (value is None) == (expected_value is None)
+                        if value is not None:
+                            assert value.unpack() == expected_value.unpack()
+
+    def test_read_big_endian_animation_arrays(self, c3b_bytes,
+    c3b_big_bytes):
+        expected = C3bParser(c3b_bytes).read_animation_arrays(0)
+        parser = C3bParser(c3b_big_bytes, endianness=Endian.BIG)
+        with MeruSharedMemory() as memory:
+            _id, total_time, bones = parser.read_animation_arrays(0, memory)
+            assert (_id, total_time) == expected[:2]
+            for bone, expected_bone in zip(bones, expected[2]):
+                assert bone[0] == expected_bone[0]
+                for descriptor, values in zip(bone[1:], expected_bone[1:]):
+                    assert isinstance(descriptor, MeruSharedArray)
+                    assert list(memory.view(descriptor)) == list(values)
+
+    def test_failed_document_unlinks(self, tmp_path, c3b_bytes,
+    monkeypatch):
+        path = tmp_path / "a.c3b"
+        path.write_bytes(c3b_bytes)
+        created = []
+        allocate = MeruSharedMemory.allocate
+
+        def recording_allocate(memory, typecode, count):
+            descriptor = allocate(memory, typecode, count)
+            created.append(descriptor.segment_name)
+            return descriptor
+
+        def failing_animation(parser, index, memory):
+            raise RuntimeError("failed")
+
+        monkeypatch.setattr(MeruSharedMemory, "allocate", recording_allocate)
+        monkeypatch.setattr(meru.shared, "read_shared_animation",
+            failing_animation)
+        with pytest.raises(RuntimeError):
+            read_shared_document(str(path))
+        assert created
+        assert not any(_exists(name) for name in set(created))
+
+    def test_read_documents(self, tmp_path, c3b_bytes):
+        paths = []
+        for i in range(3):
+            path = tmp_path / "{0}.c3b".format(i)
+            path.write_bytes(c3b_bytes)
+            paths.append(str(path))
+        paths.append(str(tmp_path / "missing.c3b"))
+
+        results = list(read_shared_documents(paths, workers=2))
+        assert [path for path, _, _ in results] == paths
+        assert isinstance(results[-1][2], FileNotFoundError)
+
+        expected = C3bParser(c3b_bytes).read_meshes(0)
+        with MeruSharedMemory() as memory:
+            for path, document, error in results[:-1]:
+                document.attach(memory)
+                assert list(document.meshes[1].indices) == \
+                    list(expected[1].indices)
+                assert list(document.meshes[0].vertex_array.values) == \
+                    list(expected[0].vertex_array.values)
+                assert document.animations[0].to_animation().get_bones() \
+                    == ["root_bone", "child_bone"]
+            names = memory.owned()
+            assert names
+        assert not any(_exists(name) for name in names)